@@ -3,17 +3,46 @@ TEXT='text'
 BIBLIOGRAPHY='bibliography'
 LIST='list'
 
-availableWriters = {}
+from ioformats.registry import WriterRegistry
+
+# writers are only built (and their module imported) when first looked up
+availableWriters = WriterRegistry()
+availableWriters.register('console', 'ioformats.writers:ConsoleWriter')
+availableWriters.register('string', 'ioformats.inmemory:StringWriter')
+availableWriters.register('num-string', 'ioformats.inmemory:StringWriter', numbered=True)
+availableWriters.register('txt', 'ioformats.text:TextWriter')
+availableWriters.register('txt-multisheets', 'ioformats.text:TextWriter', multiSheetOutput=True)
+availableWriters.register('csv', 'ioformats.csvwriter:CSVwriter')
+availableWriters.register('tex', 'ioformats.tex:TeXWriter')
+availableWriters.register('latex-article', 'ioformats.tex:TeXWriter', multiSheetOutput=True)
+availableWriters.register('bbl', 'ioformats.tex:TeXWriter', True, '.', False, False, BIBLIOGRAPHY)
+availableWriters.register('xlsx', 'ioformats.xlsx:XlsxWriter')
+availableWriters.register('xlsx-edit', 'ioformats.xlsx:XlsxWriter', editMode=True, multiSheetOutput=True)
+availableWriters.register('xlsx-multisheets', 'ioformats.xlsx:XlsxWriter', multiSheetOutput=True)
+availableWriters.register('xlsx-stream', 'ioformats.xlsx:XlsxWriter', engine='stream')
+availableWriters.register('docx', 'ioformats.docxrw:DocxWriter')
+availableWriters.register('docx-multisheets', 'ioformats.docxrw:DocxWriter', multiSheetOutput=True)
 
 
 __all__ = [
     'writers',
     'availableWriters',
+    'asyncwriter',
+    'columnar',
+    'convert',
+    'csvreader',
     'csvwriter',
     'docxrw',
     'guiwriters',
     'inmemory',
+    'parallel',
+    'recorder',
+    'registry',
+    'sinks',
+    'stats',
     'tex',
     'text',
-    'xlsx'
+    'xlsx',
+    'xlsxpatch',
+    'xlsxstream'
 ]
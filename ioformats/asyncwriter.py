@@ -0,0 +1,70 @@
+import asyncio
+import functools
+
+from ioformats import availableWriters, TEXT
+from ioformats.writers import CHUNK_SIZE, AbstractWriter
+
+
+class AsyncWriter():
+    """ an awaitable facade over a writer, for use inside an event loop.
+    Each call is run in an executor, so that rendering and saving never block the loop, and calls
+    on a same AsyncWriter are run one at a time, in the order they were made. Several AsyncWriter
+    may thus render their documents concurrently on one loop."""
+    def __init__(self, writer, executor=None):
+        self.writer = availableWriters.create(writer) if isinstance(writer, str) else writer # type: AbstractWriter
+        self.executor = executor # None stands for the default executor of the loop
+        self._lock = None # created in the running loop
+
+    async def _call(self, method, *args, **kwargs):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock: # asyncio.Lock is fair, so calls are run in order
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(getattr(self.writer, method), *args, **kwargs))
+
+    def setOutputDir(self, outdir):
+        self.writer.setOutputDir(outdir)
+
+    async def open(self, target: str):
+        await self._call('open', target)
+
+    async def openSheet(self, sheetName: str, sheetType=TEXT, *args, **kwargs):
+        await self._call('openSheet', sheetName, sheetType, *args, **kwargs)
+
+    async def writeTitle(self, element, **kwargs):
+        await self._call('writeTitle', element, **kwargs)
+
+    async def append(self, element, **kwargs):
+        await self._call('append', element, **kwargs)
+
+    async def startNewLine(self):
+        await self._call('startNewLine')
+
+    async def writeln(self, iterable, **kwargs):
+        await self._call('writeln', iterable, **kwargs)
+
+    async def writerows(self, rows, chunk_size=CHUNK_SIZE, **kwargs):
+        """ write rows, an iterable or an async iterable, chunk_size rows per executor call"""
+        if not hasattr(rows, '__aiter__'):
+            await self._call('writerows', rows, chunk_size, **kwargs)
+            return
+        chunk = []
+        async for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                await self._call('_writeChunk', chunk, **kwargs)
+                chunk = []
+        if chunk:
+            await self._call('_writeChunk', chunk, **kwargs)
+
+    async def closeSheet(self):
+        await self._call('closeSheet')
+
+    async def close(self):
+        await self._call('close')
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
@@ -0,0 +1,451 @@
+""" Performance benchmarks for ioformats, printing their results as JSON.
+
+usage: python -m ioformats.benchmarks [benchmark ...] [--rows N ...] [--cols N] [--writers NAME ...] [--output FILE]
+
+Keep the JSON output of each release to catch performance regressions between releases.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from itertools import islice
+
+from ioformats import availableWriters, TABLE, TEXT, BIBLIOGRAPHY
+from ioformats.filerw import FileWriter
+from ioformats.fixtures import ChainedXlsxWriter, SyntheticTable, insert_template, prepare_template
+from ioformats.xlsx import XlsxWriter
+
+ROOTDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCALES = (10000, 100000, 1000000) # default number of rows
+WIDE_COLS = 100 # number of columns of wide tables
+WRITERS = ('txt', 'csv', 'tex', 'bbl', 'xlsx', 'xlsx-stream', 'xlsx-edit', 'docx') # default writers, all registered file writers if empty
+ROW_LIMITS = {'docx': 10000} # larger scales are skipped for these writers, unless --no-limits
+INSERT_LIMIT = 5000 # rows inserted by the insert benchmark, unless --no-limits: each row inserted alone sorts all cells
+
+
+def cold_run(code: str, repeat=5):
+    """ best wall time, in seconds, of a fresh python process running code"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=ROOTDIR, check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_import(args):
+    """ cold start of a process getting a 'txt' writer through availableWriters, compared with
+    importing every writer module, as was needed when they registered themselves on import"""
+    cases = {
+        'python': "pass",
+        'lazy-registry': "import ioformats; ioformats.availableWriters['txt']",
+        'eager-import': "import ioformats.text, ioformats.csvwriter, ioformats.tex, ioformats.xlsx, ioformats.docxrw",
+    }
+    result = {name: {'seconds': cold_run(code, args.repeat)} for name, code in cases.items()}
+    probe = "import sys, ioformats; ioformats.availableWriters['csv']; print('openpyxl' in sys.modules, 'docx' in sys.modules)"
+    loaded = subprocess.run([sys.executable, '-c', probe], cwd=ROOTDIR, check=True, capture_output=True, text=True).stdout.split()
+    result['lazy-registry']['imports openpyxl'], result['lazy-registry']['imports docx'] = (v == 'True' for v in loaded)
+    return result
+
+
+def prepare_edit(outdir: str, rows: int, cols: int):
+    """ create the workbook edited by render_edit"""
+    from ioformats.tests import gen_tables
+    writer = availableWriters.create('xlsx-multisheets')
+    writer.setOutputDir(outdir)
+    writer.open('bench')
+    gen_tables(writer, 1, SyntheticTable(rows, cols), True)
+    writer.close()
+
+
+def render_edit(writer, outdir: str, rows: int, cols: int, bulk: bool):
+    """ overwrite the table created by prepare_edit, except its title line"""
+    from ioformats.tests import BASETABLENAME
+    writer.setOutputDir(outdir)
+    writer.open(os.path.join(outdir, 'bench.xlsx'))
+    writer.openSheet(BASETABLENAME + '1', TABLE, numbered=True)
+    writer.setLineNumber(2) # first line after the title, lines of xlsx sheets starting at 1
+    data = SyntheticTable(rows, cols)
+    if bulk:
+        writer.writerows(data[i] for i in range(1, len(data)))
+    else:
+        for i in range(1, len(data)):
+            writer.writeln(data[i])
+    writer.closeSheet()
+    writer.close()
+
+
+def render(writer, outdir: str, rows: int, cols: int, bulk: bool):
+    """ write into outdir every kind of sheet supported by writer, scaled to rows lines"""
+    from ioformats.tests import gen_publist, gen_tables, gen_text, gen_sheet, PUBLIST
+    if getattr(writer, 'editMode', False):
+        render_edit(writer, outdir, rows, cols, bulk)
+        return
+    writer.setOutputDir(outdir)
+    writer.open('bench')
+    for kind in writer.getSupportedTypes():
+        if kind == BIBLIOGRAPHY:
+            gen_publist(writer, True, publist=PUBLIST * (rows // len(PUBLIST)))
+        elif kind == TABLE:
+            gen_tables(writer, 1, SyntheticTable(rows, cols), bulk)
+        elif kind == TEXT:
+            gen_text(writer, sections=max(1, rows // 10))
+        else:
+            gen_sheet(writer, kind, 'bench', data=SyntheticTable(rows, cols), bulk=bulk)
+    writer.close()
+
+
+def measure(name: str, rows: int, cols: int, bulk: bool, memory=True):
+    """ wall time, peak memory and output size of rendering with a new writer registered as name"""
+    outdir = tempfile.mkdtemp(prefix='ioformats-bench-')
+    edit = getattr(availableWriters[name], 'editMode', False)
+    try:
+        if edit:
+            prepare_edit(outdir, rows, cols)
+        start = time.perf_counter()
+        render(availableWriters.create(name), outdir, rows, cols, bulk)
+        result = {'seconds': time.perf_counter() - start}
+        result['output_bytes'] = sum(os.path.getsize(os.path.join(outdir, f)) for f in os.listdir(outdir))
+        if memory: # in a second run, as tracing slows everything down
+            shutil.rmtree(outdir)
+            os.makedirs(outdir)
+            if edit:
+                prepare_edit(outdir, rows, cols)
+            tracemalloc.start()
+            try:
+                render(availableWriters.create(name), outdir, rows, cols, bulk)
+                result['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        return result
+    finally:
+        shutil.rmtree(outdir, ignore_errors=True)
+
+
+def bench_writers(args):
+    """ each writer at each scale, plus wide tables, through both writeln and writerows"""
+    names = args.writers or [n for n in availableWriters if isinstance(availableWriters[n], FileWriter)]
+    shapes = [(rows, args.cols) for rows in args.rows] + [(min(args.rows), args.wide)]
+    results = []
+    for name in names:
+        for rows, cols in shapes:
+            if rows > ROW_LIMITS.get(name, rows) and not args.no_limits:
+                continue
+            for bulk in (False, True):
+                result = {'writer': name, 'rows': rows, 'cols': cols, 'method': 'writerows' if bulk else 'writeln'}
+                result.update(measure(name, rows, cols, bulk, not args.no_memory))
+                print(json.dumps(result), file=sys.stderr) # progress, as large scales take a while
+                results.append(result)
+    return results
+
+
+def bench_convert(args):
+    """ converting an xlsx table into csv and tex: peak memory should not depend on the number of rows"""
+    from ioformats.convert import convert
+    from ioformats.tests import gen_tables
+    results = []
+    for rows in args.rows:
+        outdir = tempfile.mkdtemp(prefix='ioformats-bench-')
+        try:
+            writer = availableWriters.create('xlsx-multisheets')
+            writer.setOutputDir(outdir)
+            writer.open('source')
+            gen_tables(writer, 1, SyntheticTable(rows, args.cols), True)
+            writer.close()
+            for target in ('csv', 'tex'):
+                result = {'source': 'xlsx', 'target': target, 'rows': rows, 'cols': args.cols}
+                tracemalloc.start()
+                start = time.perf_counter()
+                try:
+                    convert(os.path.join(outdir, 'source.xlsx'), target_writer=target, outputDir=outdir)
+                    result['seconds'] = time.perf_counter() - start
+                    result['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+                finally:
+                    tracemalloc.stop()
+                print(json.dumps(result), file=sys.stderr)
+                results.append(result)
+        finally:
+            shutil.rmtree(outdir, ignore_errors=True)
+    return results
+
+
+class PrintEmitter():
+    """ text written with print() into a text file, as TextWriter did before buffering it with an Emitter"""
+    def __init__(self, stream, encoding='utf-8', bufferSize=None, newline=None):
+        self.file = io.TextIOWrapper(stream, encoding=encoding, newline=newline)
+
+    def write(self, *fragments):
+        print(*fragments, file=self.file, sep='', end='')
+
+    def detach(self):
+        self.file.flush()
+        return self.file.detach()
+
+
+def bench_emitter(args):
+    """ text writers emitting through a buffered Emitter, compared with print() calls, for tables written
+    with writeln, the path making the most calls"""
+    from ioformats.tests import gen_tables
+    results = []
+    for name in ('txt', 'csv', 'tex'):
+        for rows in args.rows:
+            for emitter in ('print', 'buffered'):
+                outdir = tempfile.mkdtemp(prefix='ioformats-bench-')
+                try:
+                    writer = availableWriters.create(name)
+                    if emitter == 'print':
+                        writer.emitter = PrintEmitter
+                    best = float('inf')
+                    for _ in range(max(1, args.repeat // 2)):
+                        start = time.perf_counter()
+                        writer.setOutputDir(outdir)
+                        writer.open('bench')
+                        gen_tables(writer, 1, SyntheticTable(rows, args.cols), False)
+                        writer.close()
+                        best = min(best, time.perf_counter() - start)
+                finally:
+                    shutil.rmtree(outdir, ignore_errors=True)
+                result = {'writer': name, 'rows': rows, 'cols': args.cols, 'emitter': emitter, 'seconds': best}
+                print(json.dumps(result), file=sys.stderr)
+                results.append(result)
+    return results
+
+
+def bench_csv(args):
+    """ the csv writer, compared with a text writer separating values with ';' as it did before relying on
+    the csv module, through both writeln and writerows"""
+    from ioformats.tests import gen_tables
+    results = []
+    for rows in args.rows:
+        start = time.perf_counter()
+        for row in SyntheticTable(rows, args.cols): # generating rows, included in the time of writers
+            pass
+        results.append({'writer': None, 'rows': rows, 'cols': args.cols, 'seconds': time.perf_counter() - start})
+        for implementation in ('text', 'csv'):
+            for bulk in (False, True):
+                outdir = tempfile.mkdtemp(prefix='ioformats-bench-')
+                try:
+                    if implementation == 'text':
+                        writer = availableWriters.create('txt', sep=';', extension='.csv')
+                    else:
+                        writer = availableWriters.create('csv')
+                    best = float('inf')
+                    for _ in range(max(1, args.repeat // 2)):
+                        start = time.perf_counter()
+                        writer.setOutputDir(outdir)
+                        writer.open('bench')
+                        gen_tables(writer, 1, SyntheticTable(rows, args.cols), bulk)
+                        writer.close()
+                        best = min(best, time.perf_counter() - start)
+                finally:
+                    shutil.rmtree(outdir, ignore_errors=True)
+                result = {'writer': implementation, 'rows': rows, 'cols': args.cols,
+                          'method': 'writerows' if bulk else 'writeln', 'seconds': best, 'rows_per_second': rows / best}
+                print(json.dumps(result), file=sys.stderr)
+                results.append(result)
+    return results
+
+
+def bench_inmemory(args):
+    """ memory held by tables of rows*cols cells: as lists of rows, as stored by the 'string' writer from rows or
+    from columns, and as the string it returns"""
+    results = []
+    for rows in args.rows:
+        data = SyntheticTable(rows, args.cols)
+        for store in ('rows', 'writer', 'columns'):
+            tracemalloc.start()
+            start = time.perf_counter()
+            try:
+                if store == 'rows':
+                    kept = [data[i] for i in range(1, len(data))]
+                else:
+                    kept = availableWriters.create('string')
+                    kept.open('bench')
+                    kept.openSheet('bench', TABLE)
+                    if store == 'writer':
+                        kept.writerows(data[i] for i in range(1, len(data)))
+                    else:
+                        kept.writecolumns({c: [data.cell(i, c) for i in range(1, len(data))] for c in range(args.cols)})
+                seconds = time.perf_counter() - start
+                current, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            result = {'store': store, 'rows': rows, 'cols': args.cols, 'seconds': seconds, 'memory_bytes': current,
+                      'peak_memory_bytes': peak}
+            if store == 'writer':
+                start = time.perf_counter()
+                result['string_bytes'] = len(kept.to_string().encode('utf-8'))
+                result['to_string_seconds'] = time.perf_counter() - start
+            del kept
+            print(json.dumps(result), file=sys.stderr)
+            results.append(result)
+    return results
+
+
+def bench_insert(args):
+    """ rows inserted in edit mode into a template with formats, locked cells and formulas: as they are now, in blocks
+    of rows using column templates, and as they were before, one row at a time, each cell copying the cell above.
+    cells_seconds excludes the time openpyxl spends moving cells down, which grows with the size of the sheet"""
+    results = []
+    for rows in args.rows:
+        outdir = tempfile.mkdtemp(prefix='ioformats-bench-')
+        try:
+            filename = os.path.join(outdir, 'template.xlsx')
+            prepare_template(filename)
+            for implementation, factory in (('chained', ChainedXlsxWriter), ('blocks', XlsxWriter)):
+                if implementation == 'chained' and rows > INSERT_LIMIT and not args.no_limits:
+                    continue
+                best, cells = float('inf'), float('inf')
+                for _ in range(max(1, args.repeat // 2)):
+                    writer = factory(editMode=True, multiSheetOutput=True)
+                    timings = {'insert_rows': 0}
+                    start = time.perf_counter()
+                    insert_template(writer, filename, rows, timings)
+                    seconds = time.perf_counter() - start
+                    best = min(best, seconds)
+                    cells = min(cells, seconds - timings['insert_rows'])
+                result = {'writer': implementation, 'rows': rows, 'seconds': best, 'rows_per_second': rows / best,
+                          'cells_seconds': cells, 'cells_per_second': rows * 8 / cells}
+                print(json.dumps(result), file=sys.stderr)
+                results.append(result)
+        finally:
+            shutil.rmtree(outdir, ignore_errors=True)
+    return results
+
+
+def bench_xlsxread(args):
+    """ a sheet read into columns by xlsx.DictReader in read-only mode: from dicts, and from batches of columns,
+    either lists or NumPy arrays if available"""
+    from ioformats import columnar
+    from ioformats.tests import gen_tables, BASETABLENAME
+    from ioformats.xlsx import DictReader
+    results = []
+    for rows in args.rows:
+        outdir = tempfile.mkdtemp(prefix='ioformats-bench-')
+        try:
+            writer = availableWriters.create('xlsx-stream')
+            writer.setOutputDir(outdir)
+            writer.open('bench')
+            gen_tables(writer, 1, SyntheticTable(rows, args.cols), True)
+            writer.close()
+            filename = os.path.join(outdir, 'bench-' + BASETABLENAME + '1.xlsx')
+            methods = ['dicts', 'batches'] + (['arrays'] if columnar.getNumpy() is not None else [])
+            for method in methods:
+                reader = DictReader(filename, read_only=True)
+                if not args.no_memory:
+                    tracemalloc.start()
+                start = time.perf_counter()
+                if method == 'dicts':
+                    columns = {name: [] for name in reader.fieldnames}
+                    for d in reader:
+                        for name, value in d.items():
+                            columns[name].append(value)
+                else:
+                    batches = list(reader.read_batches(arrays=method == 'arrays'))
+                seconds = time.perf_counter() - start
+                result = {'method': method, 'rows': rows, 'cols': args.cols, 'seconds': seconds, 'rows_per_second': rows / seconds}
+                if not args.no_memory:
+                    result['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                reader.close()
+                print(json.dumps(result), file=sys.stderr)
+                results.append(result)
+        finally:
+            shutil.rmtree(outdir, ignore_errors=True)
+    return results
+
+
+def bench_xlsxsave(args):
+    """ a small sheet edited in a workbook of two large ones, saved whole by openpyxl and saved partially, copying
+    the large sheets as they are. Only the time and memory of saving are measured"""
+    from ioformats.tests import gen_sheet, gen_tables
+    results = []
+    for rows in args.rows:
+        outdir = tempfile.mkdtemp(prefix='ioformats-bench-')
+        try:
+            writer = XlsxWriter(multiSheetOutput=True, engine='stream', sharedStrings=True)
+            writer.setOutputDir(outdir)
+            writer.open('template')
+            gen_tables(writer, 2, SyntheticTable(rows, args.cols), True)
+            gen_sheet(writer, TABLE, 'summary', data=SyntheticTable(10, args.cols), bulk=True)
+            writer.close()
+            filename = os.path.join(outdir, 'template.xlsx')
+            source = os.path.join(outdir, 'source.xlsx')
+            shutil.copyfile(filename, source)
+            for partial in (False, True):
+                shutil.copyfile(source, filename)
+                writer = XlsxWriter(editMode=True, multiSheetOutput=True, partialSave=partial)
+                writer.setOutputDir(outdir)
+                writer.open(filename)
+                writer.openSheet(writer.doc.sheetnames[-1], TABLE)
+                writer.setLineNumber(2)
+                writer.writerows(islice(SyntheticTable(10, args.cols), 1, None), insertMode=True)
+                writer.closeSheet()
+                if not args.no_memory:
+                    tracemalloc.start()
+                start = time.perf_counter()
+                writer.close()
+                seconds = time.perf_counter() - start
+                result = {'save': 'partial' if partial else 'whole', 'rows': rows, 'cols': args.cols, 'seconds': seconds,
+                          'size': os.path.getsize(filename)}
+                if not args.no_memory:
+                    result['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                print(json.dumps(result), file=sys.stderr)
+                results.append(result)
+        finally:
+            shutil.rmtree(outdir, ignore_errors=True)
+    return results
+
+
+BENCHMARKS = {
+    'import': bench_import,
+    'writers': bench_writers,
+    'convert': bench_convert,
+    'emitter': bench_emitter,
+    'csv': bench_csv,
+    'inmemory': bench_inmemory,
+    'insert': bench_insert,
+    'xlsxread': bench_xlsxread,
+    'xlsxsave': bench_xlsxsave,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m ioformats.benchmarks', description=__doc__.split('\n')[1])
+    parser.add_argument('benchmarks', nargs='*', help='benchmarks to run among '+', '.join(BENCHMARKS)+'; default all')
+    parser.add_argument('--rows', type=int, nargs='+', default=list(SCALES), help='table sizes, in rows')
+    parser.add_argument('--cols', type=int, default=5, help='number of columns of tables')
+    parser.add_argument('--wide', type=int, default=WIDE_COLS, help='number of columns of the wide table')
+    parser.add_argument('--writers', nargs='+', default=list(WRITERS), help='names in availableWriters')
+    parser.add_argument('--repeat', type=int, default=5, help='runs of timing benchmarks, the best one is kept')
+    parser.add_argument('--no-memory', action='store_true', help='do not measure peak memory')
+    parser.add_argument('--no-limits', action='store_true', help='run all scales, even for the slowest writers')
+    parser.add_argument('--output', help='JSON file to write results into, default stdout')
+    args = parser.parse_args(argv)
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error('unknown benchmark '+name)
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'results': {name: BENCHMARKS[name](args) for name in (args.benchmarks or BENCHMARKS)},
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
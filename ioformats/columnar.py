@@ -0,0 +1,106 @@
+""" Helpers for writing tables given as columns, either lists or NumPy arrays.
+NumPy is optional: without it, columns are formatted one value at a time. It is only imported when needed,
+see getNumpy, so that writers given lists only do not pay for importing it."""
+from datetime import datetime
+from numbers import Number
+
+_NOT_IMPORTED = object()
+numpy = _NOT_IMPORTED # the numpy module once imported by getNumpy, None if it is not installed
+
+_COARSE_UNITS = ('Y', 'M', 'W', 'D') # datetime64 units printed as dates only
+
+
+def getNumpy():
+    """ the numpy module, imported on first call, or None if it is not installed"""
+    global numpy
+    if numpy is _NOT_IMPORTED:
+        try:
+            import numpy as module
+        except ImportError:
+            module = None
+        numpy = module
+    return numpy
+
+
+def isArray(column):
+    # NumPy is not imported for columns which cannot be arrays, whose type is not one of its types
+    return type(column).__module__.startswith('numpy') and getNumpy() is not None and isinstance(column, numpy.ndarray)
+
+
+def toList(column):
+    """ the values of column as a list of python objects, datetime64 values becoming datetime or date"""
+    if isArray(column):
+        if column.dtype.kind == 'M' and numpy.datetime_data(column.dtype)[0] not in _COARSE_UNITS:
+            column = column.astype('datetime64[us]') # finer units are converted into ints by tolist()
+        return column.tolist()
+    return list(column)
+
+
+def toArray(values):
+    """ values, a list of python objects, as a NumPy array of the dtype holding them all: int64, float64, bool,
+    datetime64[us] or str if they all are of one of these types (ints and floats making float64), else object"""
+    getNumpy()
+    types = set(map(type, values))
+    if not types or types == {int}:
+        dtype = 'int64'
+    elif types <= {int, float}:
+        dtype = 'float64'
+    elif types == {bool}:
+        dtype = 'bool'
+    elif types == {datetime}:
+        dtype = 'datetime64[us]'
+    elif types == {str}:
+        dtype = str
+    else:
+        dtype = object
+    try:
+        return numpy.array(values, dtype=dtype)
+    except OverflowError: # ints beyond 64 bits
+        return numpy.array(values, dtype=object)
+
+
+def _formatArray(column, format):
+    kind = column.dtype.kind
+    if kind == 'M':
+        if format is not None: # strftime format
+            return numpy.array([d.strftime(format) for d in toList(column)])
+        if numpy.datetime_data(column.dtype)[0] in _COARSE_UNITS:
+            return numpy.datetime_as_string(column)
+        return numpy.char.replace(numpy.datetime_as_string(column, unit='s'), 'T', ' ') # as str(datetime)
+    if format is not None and kind in 'iufb':
+        return numpy.char.mod(format, column)
+    if format is not None and kind == 'O':
+        return numpy.array([formatValue(v, format) for v in column])
+    return column.astype(str)
+
+
+def formatValue(value, format=None):
+    """ value formatted with format, a strftime one for dates or a printf-like one for numbers"""
+    if format is None:
+        return str(value)
+    if hasattr(value, 'strftime'):
+        return value.strftime(format)
+    if isinstance(value, Number):
+        return format % value
+    return str(value)
+
+
+def formatColumn(column, format=None, translation=None):
+    """ return the values of column as a list of strings, converted as str() would unless a format is
+    given: a printf-like format (e.g. '%.2f') for numbers or a strftime one for dates.
+    Strings are then translated with translation, a str.translate table (e.g. for escaping characters)"""
+    if isArray(column):
+        strings = _formatArray(column, format)
+        if translation is not None:
+            width = strings.dtype.itemsize // 4 # 4 bytes per unicode character
+            # a character may be translated into several ones: widen strings, which would be truncated otherwise
+            longest = max((len(v) for v in translation.values() if isinstance(v, str)), default=1)
+            strings = numpy.char.translate(strings.astype('U' + str(max(1, width * longest))), translation)
+        return strings.tolist()
+    if format is None:
+        strings = [str(v) for v in column]
+    else:
+        strings = [formatValue(v, format) for v in column]
+    if translation is not None:
+        strings = [s.translate(translation) for s in strings]
+    return strings
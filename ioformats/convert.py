@@ -0,0 +1,120 @@
+""" Streaming conversion of tables from one format to another, e.g. from Excel to LaTeX.
+
+usage: python -m ioformats.convert SOURCE WRITER [options]
+"""
+import argparse
+import csv
+import logging
+import os
+import sys
+
+from ioformats import availableWriters, TABLE
+from ioformats.sinks import COMPRESSIONS, FileSink, StreamSink
+from ioformats.writers import CHUNK_SIZE, AbstractWriter
+
+
+def readXlsx(source, sheet_index=0, sheet_name=None, **kwargs):
+    from ioformats.xlsx import iterRows
+    return iterRows(source, sheet_index, sheet_name)
+
+
+def readCsv(source, delimiter=';', encoding='utf-8', **kwargs):
+    with open(source, newline='', encoding=encoding) as f:
+        yield from csv.reader(f, delimiter=delimiter)
+
+
+def readTeX(source, encoding='utf-8', **kwargs):
+    from ioformats.tex import TeXTableReader
+    with open(source, encoding=encoding) as f:
+        yield from TeXTableReader(f)
+
+
+# source format -> function(source, **options) lazily yielding the rows of a table
+availableReaders = {
+    'xlsx': readXlsx,
+    'csv': readCsv,
+    'tex': readTeX,
+}
+
+
+def getFormat(source: str):
+    """ guess the format of source from its file extension"""
+    return os.path.splitext(source)[1].lstrip('.').lower()
+
+
+def convert(source: str, source_format: str = None, target_writer='csv', target: str = None, sheetName: str = None,
+            title=True, chunk_size=CHUNK_SIZE, outputDir: str = None, **options):
+    """ stream the table read from source into a sheet of target_writer, either a writer or a name in
+    availableWriters. Rows are read lazily and written chunk_size at a time through the bulk path of
+    the writer, so that the whole table is never held in memory (unless the writer itself does).
+    target and sheetName default to the base name of source. If title, the first row is written as a title line.
+    options are passed to the reader, e.g. sheet_index or sheet_name for xlsx, delimiter for csv.
+    Return the number of rows written."""
+    source_format = source_format or getFormat(source)
+    if source_format not in availableReaders:
+        raise ValueError('No reader for format '+str(source_format)+'; available: '+', '.join(availableReaders))
+    writer = availableWriters.create(target_writer) if isinstance(target_writer, str) else target_writer # type: AbstractWriter
+    basename = os.path.basename(os.path.splitext(source)[0])
+    rows = iter(availableReaders[source_format](source, **options))
+    if outputDir is not None:
+        writer.setOutputDir(outputDir)
+    writer.open(target or basename)
+    writer.openSheet(sheetName or basename, TABLE)
+    count = 0
+    if title:
+        first = next(rows, None)
+        if first is not None:
+            writer.writeTitle(first)
+            count += 1
+    counted = _Counter(rows)
+    writer.writerows(counted, chunk_size)
+    writer.closeSheet()
+    writer.close()
+    logging.info('Converted '+str(count + counted.count)+' rows from '+source)
+    return count + counted.count
+
+
+class _Counter():
+    """ count the rows going through an iterator"""
+    def __init__(self, rows):
+        self.rows = rows
+        self.count = 0
+
+    def __iter__(self):
+        for row in self.rows:
+            self.count += 1
+            yield row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m ioformats.convert', description='Convert a table from one format to another.')
+    parser.add_argument('source', help='file to read the table from')
+    parser.add_argument('writer', help='name of the target writer, among '+', '.join(availableWriters))
+    parser.add_argument('-f', '--format', help='format of source, among '+', '.join(availableReaders)+'; default from its extension')
+    parser.add_argument('-o', '--output-dir', default='.', help='directory to write into')
+    parser.add_argument('-t', '--target', help='name of the target document, default from source')
+    parser.add_argument('-s', '--sheet', help='name of the target sheet, default from source')
+    parser.add_argument('--sheet-name', help='xlsx sheet to read, default the first one')
+    parser.add_argument('--delimiter', default=';', help='csv delimiter, default ;')
+    parser.add_argument('--no-title', action='store_true', help='the first row is not a title line')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='rows written at once')
+    parser.add_argument('--stdout', action='store_true', help='write to the standard output rather than into files')
+    parser.add_argument('-z', '--compress', choices=list(COMPRESSIONS), help='compress the output')
+    parser.add_argument('-i', '--incremental', action='store_true', help='do not rewrite files whose content is unchanged')
+    args = parser.parse_args(argv)
+    options = {'delimiter': args.delimiter}
+    if args.sheet_name is not None:
+        options['sheet_name'] = args.sheet_name
+    writer = availableWriters.create(args.writer)
+    if args.stdout:
+        writer.setSink(StreamSink(sys.stdout, args.compress))
+    elif args.compress:
+        writer.setSink(FileSink(args.compress))
+    if args.incremental and not args.stdout:
+        writer.setIncremental()
+    convert(args.source, args.format, writer, args.target, args.sheet, not args.no_title, args.chunk_size,
+            args.output_dir, **options)
+
+
+if __name__ == '__main__':
+    main()
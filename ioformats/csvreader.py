@@ -0,0 +1,239 @@
+""" Streaming reader of csv files into typed values, with the same interface as xlsx.DictReader.
+
+Types are inferred per column from a sample of the first rows, then locked: the remaining values of a column are
+converted by a single function (e.g. int), the type of a value being guessed again only if it does not convert.
+"""
+import csv
+import logging
+import re
+from datetime import datetime
+
+from ioformats.columnar import getNumpy
+from ioformats.filerw import normalize
+from ioformats.writers import CHUNK_SIZE
+
+SAMPLE_SIZE = 100 # rows read to infer the types of columns
+
+_INT = re.compile(r'[-+]?[0-9]+\Z')
+_FLOAT = re.compile(r'[-+]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][-+]?[0-9]+)?\Z') # ints too, a column may mix both
+_ISODATE = re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2}([ T][0-9]{2}:[0-9]{2}(:[0-9]{2}(\.[0-9]+)?)?)?\Z')
+_DATE = re.compile(r'[0-9]{2}/[0-9]{2}/([0-9]{2}|[0-9]{4})\Z')
+_BOOL = re.compile(r'(true|false)\Z', re.IGNORECASE)
+
+
+def parseDate(s):
+    """ a datetime from an ISO date (2019-01-01, possibly with a time) or a day first one (01/01/2019 or 01/01/19)"""
+    if '/' in s:
+        return datetime.strptime(s, '%d/%m/%Y' if len(s) == 10 else '%d/%m/%y')
+    return datetime.fromisoformat(s)
+
+
+def parseBool(s):
+    if s.lower() == 'true':
+        return True
+    if s.lower() == 'false':
+        return False
+    raise ValueError('not a boolean: '+s)
+
+
+# types in the order they are tried, with the pattern recognizing them and the function converting them
+TYPES = (
+    ('int', _INT, int),
+    ('float', _FLOAT, float),
+    ('datetime', None, parseDate),
+    ('bool', _BOOL, parseBool),
+)
+CONVERTERS = {name: convert for name, _, convert in TYPES}
+DTYPES = {'int': 'int64', 'float': 'float64', 'datetime': 'datetime64[us]', 'bool': 'bool'}
+
+
+def _match(pattern, s):
+    if pattern is not None:
+        return pattern.match(s) is not None
+    return _ISODATE.match(s) is not None or _DATE.match(s) is not None
+
+
+def guess_type(s: str):
+    """ s converted into an int, float, datetime or bool if it looks like one, else s itself"""
+    for name, pattern, convert in TYPES:
+        if _match(pattern, s):
+            try:
+                return convert(s)
+            except ValueError:
+                return s
+    return s
+
+
+def infer_type(values):
+    """ the name of the narrowest type in TYPES all the non empty values match, or 'str'"""
+    values = [v for v in values if v != '']
+    if not values:
+        return 'str'
+    for name, pattern, convert in TYPES:
+        if all(_match(pattern, v) for v in values):
+            return name
+    return 'str'
+
+
+def _convertValue(convert, value):
+    """ value converted with convert, or guessed if it does not convert; blanks stay ''"""
+    if value == '':
+        return ''
+    try:
+        return convert(value)
+    except ValueError:
+        return guess_type(value)
+
+
+class DictReader(object):
+    """ read a csv file as dicts of typed values, like xlsx.DictReader does for Excel sheets.
+    f is a filename or a text file opened with newline=''; fmtparams (e.g. quotechar) are passed to csv.reader.
+    types maps fieldnames onto type names ('int', 'float', 'datetime', 'bool' or 'str'), inferred from the
+    first sample_size rows unless given. Blank values are '' whatever the type of their column."""
+    def __init__(self, f, title_line=1, fieldnames=None, normalize_fieldnames=False, restkey=None, restval=None,
+                 delimiter=';', types=None, sample_size=SAMPLE_SIZE, encoding='utf-8', **fmtparams):
+        self._fieldnames = fieldnames   # list of keys for the dict
+        self.normalize_fieldnames = normalize_fieldnames # whether field names should be normalized (converted to ascii)
+        self.restkey  = restkey         # key to catch long rows
+        self.restval  = restval         # default value for short rows
+        self.title_line = title_line    # location of the title line
+        self.sample_size = sample_size
+        self._file = open(f, newline='', encoding=encoding) if isinstance(f, str) else None
+        self.reader   = csv.reader(self._file or f, delimiter=delimiter, **fmtparams)
+        self.line_num = 0
+        self._types = types
+        self._converters = None
+        self._sample = [] # rows read for inferring types, not returned yet
+        self._iterator = None # over the remaining rows, as lists of strings
+
+    def __iter__(self):
+        return self
+
+    @property
+    def fieldnames(self):
+        if self._fieldnames is None:
+            for l in range(1,self.title_line):
+                next(self.reader) # skip all lines before the title
+                self.line_num += 1
+            try:
+                title = next(self.reader)
+                self._fieldnames = list(map(normalize,title)) if self.normalize_fieldnames else title
+                logging.info("csv Dictreader: "+str(self._fieldnames))
+                self.line_num += 1
+            except StopIteration:
+                pass
+        return self._fieldnames
+
+    @fieldnames.setter
+    def fieldnames(self, value):
+        self._fieldnames = value
+
+    @property
+    def types(self):
+        """ the type name of each field, inferred from a sample of rows if not given"""
+        if self._converters is None:
+            self._inferTypes()
+        return self._types
+
+    def _inferTypes(self):
+        fieldnames = self.fieldnames or []
+        for row in self.reader:
+            if row:
+                self._sample.append(row)
+                if len(self._sample) >= self.sample_size:
+                    break
+        types = dict(self._types or {})
+        for i, name in enumerate(fieldnames):
+            if name not in types:
+                types[name] = infer_type(row[i] for row in self._sample if i < len(row))
+        self._types = types
+        self._converters = [CONVERTERS.get(types[name]) for name in fieldnames]
+        logging.info("csv Dictreader types: "+str(types))
+
+    def _rows(self):
+        """ the remaining non blank rows, as lists of strings"""
+        if self._converters is None:
+            self._inferTypes()
+        sample, self._sample = self._sample, []
+        for row in sample:
+            self.line_num += 1
+            yield row
+        for row in self.reader:
+            self.line_num += 1
+            if row:
+                yield row
+
+    def _convert(self, row):
+        return [v if convert is None else _convertValue(convert, v) for convert, v in zip(self._converters, row)] + row[len(self._converters):]
+
+    def __next__(self):
+        row = self._convert(next(self._rowIterator()))
+        d = dict(zip(self.fieldnames, row))
+        lf = len(self.fieldnames)
+        lr = len(row)
+
+        if lf < lr:
+            d[self.restkey] = row[lf:]
+        elif lf > lr:
+            for key in self.fieldnames[lr:]:
+                d[key] = self.restval
+
+        return d
+
+    def _rowIterator(self):
+        if self._iterator is None:
+            self._iterator = self._rows()
+        return self._iterator
+
+    def read_batches(self, batch_size=CHUNK_SIZE, arrays=False):
+        """ yield the remaining rows batch_size at a time, as dicts mapping each field onto the list of its values.
+        Values are converted a column at a time, and if arrays (requires NumPy) columns whose values all
+        converted into their type are NumPy arrays of the matching dtype, the others being arrays of objects.
+        Short rows are padded with restval; values beyond fieldnames are gathered under restkey, as a list for each
+        row (empty for rows without such values), if any row of the batch has some."""
+        if arrays and getNumpy() is None:
+            raise ImportError('arrays=True requires numpy')
+        iterator = self._rowIterator()
+        fieldnames = self.fieldnames
+        types = self.types
+        width = len(fieldnames)
+        while True:
+            rows = [row for _, row in zip(range(batch_size), iterator)]
+            if not rows:
+                return
+            columns = [[] for _ in fieldnames]
+            rest = []
+            for row in rows:
+                if len(row) < width:
+                    row = row + [self.restval] * (width - len(row))
+                for column, v in zip(columns, row):
+                    column.append(v)
+                rest.append(row[width:])
+            batch = {}
+            for name, convert, column in zip(fieldnames, self._converters, columns):
+                batch[name] = self._convertColumn(convert, column, types[name] if arrays else None)
+            if any(rest):
+                batch[self.restkey] = rest
+            yield batch
+
+    def _convertColumn(self, convert, column, type):
+        """ column converted with convert, at once unless a value does not convert; as an array if type is given"""
+        exact = True
+        if convert is not None:
+            try:
+                column = list(map(convert, column))
+            except (ValueError, TypeError, AttributeError): # blanks, restval or values of another type
+                column = [v if not isinstance(v, str) else _convertValue(convert, v) for v in column]
+                exact = False
+        if type is None:
+            return column
+        numpy = getNumpy()
+        if exact and type in DTYPES:
+            return numpy.array(column, dtype=DTYPES[type])
+        if type == 'str' and all(isinstance(v, str) for v in column):
+            return numpy.array(column, dtype=str)
+        return numpy.array(column, dtype=object)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
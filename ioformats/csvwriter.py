@@ -1,11 +1,86 @@
-from ioformats import availableWriters,TABLE
+import csv
+import os
+
+from ioformats import TABLE
+from ioformats.columnar import toList
 from ioformats.text import TextWriter
 
 
 class CSVwriter(TextWriter):
-    def __init__(self, numbered=False, outputDir='.',multiSheetOutput=False,editMode=False,extension='.csv',sep=';'):
+    """ a writer of csv files through the csv module, which quotes values as needed by the dialect.
+    Rows are written by the C implementation of the csv module, whole chunks at a time by writerows.
+    Values appended with append() are gathered into a row written by the next startNewLine()."""
+    def __init__(self, numbered=False, outputDir='.',multiSheetOutput=False,editMode=False,extension='.csv',sep=';',
+                 dialect='excel', quoting=csv.QUOTE_MINIMAL, lineterminator=os.linesep, **fmtparams):
         super().__init__(numbered,outputDir,multiSheetOutput,editMode,extension,TABLE)
         self.sep = sep
+        self.dialect = dialect
+        self.quoting = quoting
+        self.lineterminator = lineterminator
+        self.fmtparams = fmtparams # other formatting parameters of csv.writer, e.g. quotechar or escapechar
+        self.csv = None
+        self.row = [] # values appended since the last line
+
+    def _openText(self, filename):
+        # newlines are not translated: line terminators are those of the dialect, even in quoted values
+        emitter = self.emitter(self.openStream(filename), 'utf-8', self.bufferSize, '\n')
+        self.csv = csv.writer(emitter, self.dialect, delimiter=self.sep, quoting=self.quoting,
+                              lineterminator=self.lineterminator, **self.fmtparams)
+        return emitter
+
+    def writeTitle(self, arg, **kwargs):
+        if self.isRotating():
+            self._setTitle(arg)
+        self.writeln(arg, **kwargs)
+
+    def append(self, element, **kwargs):
+        self.row.append(element)
+
+    def startNewLine(self):
+        self._writeRow(self.row)
+        self.row = []
+
+    def writeln(self, iterable, **kwargs):
+        if isinstance(iterable, str):
+            iterable = [iterable]
+        if self.row:
+            iterable = self.row + list(iterable)
+            self.row = []
+        self._writeRow(iterable)
+
+    def _writeRow(self, row):
+        if self.isRotating():
+            self._room()
+            self.csv.writerow(row)
+            self._consume(1)
+        else:
+            self.csv.writerow(row)
+
+    def _writeHeader(self, title):
+        self.csv.writerow(title)
+
+    def closeSheet(self):
+        if self.row:
+            self.startNewLine()
+        super().closeSheet()
+
+    def _writeChunk(self, chunk, **kwargs):
+        if self.row:
+            self.writeln(chunk[0])
+            chunk = chunk[1:]
+        if self.isRotating():
+            self._writeRotated(self._writeRows, chunk)
+        else:
+            self.csv.writerows(chunk)
+
+    def _writeRows(self, rows):
+        self.csv.writerows(rows) # the csv writer of the current part
 
+    def formatColumn(self, column, format=None):
+        """ the values of column, as strings only if a format is given so that numbers stay numbers for quoting"""
+        if format is None:
+            return toList(column)
+        return super().formatColumn(column, format)
 
-availableWriters['csv'] = CSVwriter()
+    def _writeFormattedChunk(self, chunk, **kwargs):
+        self._writeChunk(chunk, **kwargs)
@@ -6,7 +6,7 @@ from docx.enum.dml import MSO_THEME_COLOR_INDEX
 from numbers import Number
 from ioformats.filerw import FileWriter
 from ioformats.writers import SkipWriter
-from ioformats import availableWriters,TEXT,TABLE,BIBLIOGRAPHY,LIST
+from ioformats import TEXT,TABLE,BIBLIOGRAPHY,LIST
 
 ENDTAG = '.END-OF-GENERATED-TEXT'
 
@@ -20,7 +20,7 @@ class DocxWriter(FileWriter):
         return docx.Document(name)
     
     def _savedoc(self,filename):
-        self.doc.save(filename)
+        self._saveStream(filename, self.doc.save)
 
     def openSheet(self,sheetname,sheetType=TEXT,*args,**kwargs):
         super().openSheet(sheetname,sheetType,*args,**kwargs)
@@ -98,6 +98,9 @@ class DocxWriter(FileWriter):
     def writeln(self,iterable,** kwargs):
         self.subwriter.writeln(iterable, ** kwargs)
 
+    def _writeChunk(self,chunk,** kwargs):
+        self.subwriter._writeChunk(chunk, ** kwargs)
+
 
 def _add_hyperlink(paragraph, text, url):
     # This gets access to the document.xml.rels file and gets a new relation id value
@@ -239,6 +242,27 @@ class TableSubwriter():
         iter = self._setupTable(iterable)
         self._writeNewRow(iter,** kwargs)
 
+    def _writeChunk(self,chunk,** kwargs):
+        """ same as writeln on each row, but fetching the cells of a new row only once"""
+        if self.oldtable is not None: # edit mode needs a cell by cell lookup into the old table
+            for row in chunk:
+                self.writeln(row,** kwargs)
+            return
+        for row in chunk:
+            row = self._setupTable(row)
+            self.startNewLine()
+            line = self.getLine()
+            cells = self.currentrow.cells
+            for element in row:
+                cell = cells[self.col] # IndexError for rows wider than the table, as in writeln
+                par = cell.paragraphs[0]
+                if line > 0 and isinstance(element, Number):
+                    par.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+                run = par.add_run(str(element))
+                for style,value in kwargs.items():
+                    setattr(run, style, value)
+                self.col += 1
+
 
 class TextSubwriter():
     def __init__(self,parent=None):
@@ -295,6 +319,10 @@ class TextSubwriter():
             e = elem if first else ' '+str(elem)
             first = False
             self._addRunLike(e, **kwargs)
+
+    def _writeChunk(self,chunk,** kwargs):
+        for row in chunk:
+            self.writeln(row,** kwargs)
             
     def startNewLine(self):
         if self.parent.editMode:
@@ -354,10 +382,6 @@ class BiblioSubwriter(TextSubwriter):
             self._addRunLike(element,**kwargs)
 
 
-availableWriters['docx'] = DocxWriter()
-availableWriters['docx-multisheets'] = DocxWriter(multiSheetOutput=True)
-
-
 class ListSubwriter(TextSubwriter):
     def __init__(self,parent=None):
         super().__init__(parent)
@@ -1,9 +1,17 @@
+import json
 import logging
 import unicodedata
 import os
 import re
+import shutil
+import tempfile
+from ioformats import TABLE
+from ioformats.sinks import Sink, FileSink, FactorySink, IncrementalSink, SPOOL_SIZE
 from ioformats.writers import AbstractWriter
 
+PART_FORMAT = '-part%04d' # suffix of the files of the parts of a sheet after the first one
+PARTS_SUFFIX = '-parts.json' # suffix of the manifest listing the parts of rotated sheets
+
 _pattern = re.compile("[^A-Za-z0-9_ ]+")
 
 
@@ -22,14 +30,68 @@ class FileWriter(AbstractWriter):
         self.editMode = editMode
         self.extension = extension
         self.doc = None
+
+        self.sink = FileSink() # where files are written, see ioformats.sinks
+        self.maxRows = None # rows of each part of a sheet, title included, see setRotation
+        self.maxBytes = None # bytes of each part of a sheet, see setRotation
+        self.rowCap = None # rows a sheet can hold in this format, longer ones being continued into new parts anyway
+        self.parts = {} # sheetName -> names of its parts, when rotating or capped by rowCap
+        self.part = 1 # number of the current part
+        self._partRows = 0 # rows written into the current part
+        self._roomLeft = 0 # rows which may be written into the current part before checking its size again
+        self._title = None # title line of the current TABLE sheet, repeated at the beginning of each part
     
     def setOutputDir(self,outdir):
         self._outputDir = outdir
         os.makedirs(outdir, exist_ok=True)
 
+    def setSink(self, sink):
+        """ write files into sink, either a Sink or a factory returning a binary stream for each filename"""
+        self.sink = sink if isinstance(sink, Sink) else FactorySink(sink)
+
+    def setIncremental(self, incremental=True):
+        """ in incremental mode, files whose content did not change since they were last written are not
+        rewritten, see sinks.IncrementalSink. Only files on the local disk, written by the default sink, may be
+        written incrementally: raise ValueError if another sink was set"""
+        if incremental == self.isIncremental():
+            return
+        if type(self.sink) not in (FileSink, IncrementalSink):
+            raise ValueError('Only files written by a FileSink can be written incrementally, not by '+repr(self.sink))
+        compression = self.sink.compression
+        self.sink = IncrementalSink(compression) if incremental else FileSink(compression)
+
+    def isIncremental(self):
+        return isinstance(self.sink, IncrementalSink)
+
+    def openStream(self, filename):
+        """ return a binary stream to write filename into, to be closed with closeStream"""
+        if not isinstance(self.sink, Sink): # a factory set as an attribute, e.g. through availableWriters.create
+            self.setSink(self.sink)
+        return self.sink.open(filename)
+
+    def closeStream(self, stream):
+        self.sink.close(stream)
+
+    def _saveStream(self, filename, save):
+        """ call save(file) to save a document into filename through the sink. As zip based documents need
+        a seekable file, they are spooled first when the stream of the sink is not (e.g. a pipe or a compressed stream)"""
+        stream = self.openStream(filename)
+        try:
+            if self.sink.isSeekable(stream):
+                save(stream)
+            else:
+                with tempfile.SpooledTemporaryFile(SPOOL_SIZE) as spool:
+                    save(spool)
+                    spool.seek(0)
+                    shutil.copyfileobj(spool, stream)
+        finally:
+            self.closeStream(stream)
+
     def getSheetFilename(self):
-        """ return filename, appended with normalized name of sheetName if !=None"""
-        return self._outputDir+"/"+self.target+'-'+normalize(self.sheetName)+self.extension
+        """ return filename, appended with normalized name of sheetName if !=None, and with the number of
+        the current part after the first one"""
+        suffix = PART_FORMAT % self.part if self.part > 1 else ''
+        return self._outputDir+"/"+self.target+'-'+normalize(self.sheetName)+suffix+self.extension
 
     def getFilename(self):
         """ return filename for saving"""
@@ -39,6 +101,114 @@ class FileWriter(AbstractWriter):
         """ return basename, without dir prefix and without file extension"""
         return os.path.basename(os.path.splitext(filename)[0])
 
+    def setRotation(self, maxRows=None, maxBytes=None):
+        """ split sheets into parts of at most maxRows rows and/or about maxBytes bytes, rolling over to a new part
+        while streaming when the current one is full. The title line of TABLE sheets is repeated at the beginning
+        of each part. Parts are listed in self.parts, and saved into a manifest when a sheet has several parts."""
+        self.maxRows = maxRows
+        self.maxBytes = maxBytes
+
+    def isRotating(self):
+        return (self.maxRows is not None or self.maxBytes is not None) and not self.editMode
+
+    def supportsRotation(self):
+        """ return None if the current settings allow rotation, otherwise why they do not"""
+        return type(self).__name__+' does not support rotation'
+
+    def getPartName(self):
+        """ name of the current part, recorded in self.parts"""
+        return os.path.basename(self.getSheetFilename())
+
+    def getPartSize(self):
+        """ bytes written into the current part, needed for rotating by size"""
+        return None
+
+    def _startParts(self):
+        self.part = 1
+        self._partRows = 0
+        self._roomLeft = 0
+        self._title = None
+        if self.isRotating():
+            reason = self.supportsRotation()
+            if reason is not None:
+                raise ValueError(reason)
+            self.parts[self.sheetName] = [self.getPartName()]
+        elif self.rowCap is not None and not self.editMode:
+            self.parts[self.sheetName] = [self.getPartName()]
+
+    def _setTitle(self, title):
+        """ record title as the line repeated at the beginning of each part, if it is the first line of a TABLE sheet"""
+        if self.sheetType == TABLE and self.part == 1 and self._partRows == 0:
+            self._title = [title] if isinstance(title, str) else list(title)
+
+    def _room(self):
+        """ return how many rows may be written into the current part, after rolling over to a new part if it is full.
+        For rotating by size, it is estimated from the average size of the rows already written, so that parts
+        may exceed maxBytes by about a row."""
+        if self._roomLeft <= 0:
+            self._roomLeft = self._estimateRoom()
+            if self._roomLeft <= 0:
+                self._rollOver()
+                self._roomLeft = max(1, self._estimateRoom())
+        return self._roomLeft
+
+    def _estimateRoom(self):
+        room = self.maxRows - self._partRows if self.maxRows is not None else 1 << 62
+        if self.rowCap is not None:
+            room = min(room, self.rowCap - self._partRows)
+        if self.maxBytes is not None:
+            size = self.getPartSize()
+            if size >= self.maxBytes:
+                return 0
+            if self._partRows > 0 and size > 0: # half of the estimate, for rows longer than the previous ones
+                room = min(room, max(1, int((self.maxBytes - size) * self._partRows / size / 2)))
+            else:
+                room = min(room, 1)
+        return room
+
+    def _consume(self, rows):
+        """ account for rows written into the current part"""
+        self._partRows += rows
+        self._roomLeft -= rows
+
+    def _writeRotated(self, write, rows, **kwargs):
+        """ call write on slices of rows, each fitting into the current part, rolling over to new parts in between"""
+        while len(rows) > 0:
+            room = self._room()
+            write(rows[:room], **kwargs)
+            self._consume(min(room, len(rows)))
+            rows = rows[room:]
+
+    def _rollOver(self):
+        """ close the current part and open the next one, beginning with the title line if any"""
+        self._closePart()
+        self.part += 1
+        self._openPart()
+        self.parts[self.sheetName].append(self.getPartName())
+        self._partRows = 0
+        self._roomLeft = 0
+        if self._title is not None:
+            self._writeHeader(self._title)
+            self._consume(1)
+
+    def _closePart(self):
+        pass
+
+    def _openPart(self):
+        pass
+
+    def _writeHeader(self, title):
+        pass
+
+    def _saveParts(self):
+        """ save the manifest of the parts of sheets, if any sheet has several parts"""
+        if any(len(parts) > 1 for parts in self.parts.values()):
+            stream = self.openStream(self._outputDir+"/"+self.target+PARTS_SUFFIX)
+            try:
+                stream.write(json.dumps(self.parts, indent=1).encode('utf-8'))
+            finally:
+                self.closeStream(stream)
+
     def _getopendoc(self,name=None):
         pass
     
@@ -47,6 +217,7 @@ class FileWriter(AbstractWriter):
 
     def open(self, filename):
         super().open(self.getBasename(filename))
+        self.parts = {}
         if not os.path.exists(filename):
             if self.editMode:
                 logging.warning('Switching to editMode=False because cannot find file for editing '+filename)
@@ -56,6 +227,10 @@ class FileWriter(AbstractWriter):
         else:
             self.doc = self._getopendoc() # create a new instance of a document 
     
+    def openSheet(self, *args, **kwargs):
+        super().openSheet(*args, **kwargs)
+        self._startParts()
+
     def closeSheet(self):
         if not (self.editMode or self.multiSheetOutput):
             self._savedoc(self.getSheetFilename())
@@ -65,4 +240,6 @@ class FileWriter(AbstractWriter):
     def close(self):
         if self.editMode or self.multiSheetOutput:
             self._savedoc(self.getFilename())
+        if self.parts:
+            self._saveParts()
 
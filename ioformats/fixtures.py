@@ -0,0 +1,105 @@
+""" Fixtures shared by the tests and the benchmarks of ioformats."""
+import time
+from collections.abc import Sequence
+from datetime import datetime, timedelta
+
+from ioformats import TABLE
+from ioformats.xlsx import Translator, XlsxWriter
+
+
+class SyntheticTable(Sequence):
+    """ a table of rows+1 lines (including its title line) and cols columns, whose lines are generated
+    on demand, cycling through the same types as tests.TEST_DATA: str, str, int, float, datetime"""
+    def __init__(self, rows: int, cols: int = 5):
+        self.rows = rows
+        self.cols = cols
+        self.start = datetime(2020, 1, 1)
+
+    def __len__(self):
+        return self.rows + 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        if i == 0:
+            return ['Column ' + str(c) for c in range(self.cols)]
+        return [self.cell(i, c) for c in range(self.cols)]
+
+    def cell(self, i, c):
+        kind = c % 5
+        if kind == 0:
+            return 'Line ' + str(i)
+        elif kind == 1:
+            return ('foo', '%èé&à_$', '')[(i + c) % 3]
+        elif kind == 2:
+            return i * (c + 1) - 1000
+        elif kind == 3:
+            return i / (c + 1.5)
+        return self.start + timedelta(days=i % 3650)
+
+
+class ChainedXlsxWriter(XlsxWriter):
+    """ an xlsx writer inserting rows as it did before caching column templates and inserting blocks of rows:
+    each row is inserted on its own, each of its cells copying the style of the cell above and translating its
+    formula with a new Translator"""
+    def _writeln(self,iterable,insertMode=False):
+        line = self.getCurrentLine()
+        self.col = 1
+        if insertMode:
+            self.currentSheet.insert_rows(line)
+        for v in iterable:
+            self.append(v,insertMode=insertMode)
+
+    def append(self,element,insertMode=False,** kwargs):
+        line = self.getCurrentLine()
+        cell = self.currentSheet.cell(row=line,column=self.col)
+        if insertMode: #copy previous line's cell value
+            above = self.currentSheet.cell(row=line-1,column=self.col)
+            cell._style = above._style
+            cell.number_format = above.number_format
+            if element == '' and type(above.value) is str and above.value.startswith('='): # need to translate formula
+                cell.value = Translator(above.value, origin=above.coordinate).translate_formula(cell.coordinate)
+        if element != '' and not cell.protection.locked:
+            cell.value = element
+        self.col += 1
+
+
+def prepare_template(filename: str):
+    """ create a workbook with a formatted line of formulas, under which rows are inserted by insert_template"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Protection
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'template'
+    ws.append(['Label', 'Date', 'Quantity', 'Price', 'Total', 'Cumulated', 'Share', 'Checked'])
+    ws.append(['first', datetime(2020, 1, 1), 1, 2.5, '=C2*D2', '=SUM($E$2:E2)', '=E2/$F$2', 'yes'])
+    formats = ('@', 'yyyy-mm-dd', '0', '#,##0.00 €', '#,##0.00 €', '#,##0.00 €', '0.0%', '@')
+    for cell, format in zip(ws[2], formats):
+        cell.number_format = format
+        cell.font = Font(bold=cell.column > 4)
+        cell.protection = Protection(locked=cell.column in (5, 6, 7, 8))
+    ws.append(['total', '', '=SUM(C2:C2)', '', '=SUM(E2:E2)'])
+    ws.merge_cells('A3:B3')
+    wb.save(filename)
+
+
+def insert_template(writer, filename: str, rows: int, timings=None):
+    """ insert rows under the formatted line of the workbook created by prepare_template, formulas being left blank.
+    If given, timings['insert_rows'] is incremented by the time spent by openpyxl moving cells down"""
+    writer.open(filename)
+    writer.openSheet('template', TABLE, numbered=True)
+    writer.setLineNumber(3)
+    if timings is not None:
+        insert_rows = writer.currentSheet.insert_rows
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            insert_rows(*args, **kwargs)
+            timings['insert_rows'] += time.perf_counter() - start
+        writer.currentSheet.insert_rows = timed
+    start = datetime(2020, 1, 1)
+    for i in range(rows):
+        writer.writeln(['row ' + str(i), start + timedelta(days=i), i, 0.5 * i, '', '', '', 'no'], insertMode=True)
+    writer.closeSheet()
+    return writer
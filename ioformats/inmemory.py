@@ -1,29 +1,261 @@
-from ioformats.writers import AbstractWriter
-from ioformats import availableWriters,TEXT,TABLE,BIBLIOGRAPHY
+""" An in-memory writer, keeping one compact object per sheet: typed columns for TABLE sheets and lines
+for the other ones, turned into strings only when asked for."""
+from array import array
+from sys import intern
+
+from ioformats.columnar import isArray, toList
+from ioformats.writers import AbstractWriter, CHUNK_SIZE
+from ioformats import TEXT,TABLE
+
+_TYPECODES = {int: 'q', float: 'd'} # types of values stored in arrays, with their typecode
+_DTYPES = {'q': 'int64', 'd': 'float64'}
+
+
+class Column():
+    """ the values of a column of a table: in an array while they are all ints (fitting 64 bits) or all floats,
+    otherwise in a list whose strings are interned, so that repeated strings are stored once"""
+    def __init__(self, length=0):
+        self.values = [''] * length # blank cells of the rows preceding the column
+        self.type = None # type of all values, when in an array
+
+    def __len__(self):
+        return len(self.values)
+
+    def _toList(self):
+        self.values = self.values.tolist()
+        self.type = None
+
+    def append(self, value):
+        if self.type is None:
+            if not self.values and type(value) in _TYPECODES:
+                self.values = array(_TYPECODES[type(value)])
+                self.type = type(value)
+                self.append(value)
+            else:
+                self.values.append(intern(value) if type(value) is str else value)
+        elif type(value) is self.type:
+            try:
+                self.values.append(value)
+            except OverflowError:
+                self._toList()
+                self.values.append(value)
+        else:
+            self._toList()
+            self.append(value)
+
+    def extend(self, values):
+        """ append values, a list or a NumPy array"""
+        if isArray(values):
+            if self._extendArray(values):
+                return
+            values = toList(values)
+        if not values:
+            return
+        t = type(values[0])
+        if t in _TYPECODES and (self.type is t or (self.type is None and not self.values)) and len(set(map(type, values))) == 1:
+            try:
+                new = array(_TYPECODES[t], values)
+                if self.type is None:
+                    self.values = new
+                    self.type = t
+                else:
+                    self.values += new
+                return
+            except OverflowError:
+                pass
+        if self.type is not None:
+            self._toList()
+        self.values.extend([intern(v) if type(v) is str else v for v in values])
+
+    def _extendArray(self, values):
+        """ append a NumPy array of numbers as raw bytes if they fit in this column, returning whether they did"""
+        kind = values.dtype.kind
+        if kind == 'i' or (kind == 'u' and values.dtype.itemsize < 8):
+            t = int
+        elif kind == 'f':
+            t = float
+        else:
+            return False
+        if self.type is None and not self.values:
+            self.values = array(_TYPECODES[t])
+            self.type = t
+        elif self.type is not t:
+            return False
+        self.values.frombytes(values.astype(_DTYPES[_TYPECODES[t]]).tobytes())
+        return True
+
+
+class TableSheet():
+    """ a TABLE sheet, stored as columns. Rows shorter than others are padded with blank cells ''"""
+    def __init__(self, name: str):
+        self.name = name
+        self.header = None # title line
+        self.columns = [] # Column objects
+        self.length = 0 # number of rows, title excepted
+        self.pending = [] # cells appended since the last row
+
+    def _widen(self, width):
+        while len(self.columns) < width:
+            self.columns.append(Column(self.length))
+
+    def addRow(self, row):
+        row = list(row)
+        self._widen(len(row))
+        for column, value in zip(self.columns, row):
+            column.append(value)
+        for column in self.columns[len(row):]:
+            column.append('')
+        self.length += 1
+
+    def addRows(self, rows):
+        widths = set(map(len, rows))
+        if len(widths) != 1:
+            for row in rows:
+                self.addRow(row)
+            return
+        width = widths.pop()
+        self._widen(width)
+        for column, values in zip(self.columns, zip(*rows)):
+            column.extend(list(values))
+        for column in self.columns[width:]:
+            column.extend([''] * len(rows))
+        self.length += len(rows)
+
+    def addColumns(self, columns):
+        """ add rows given as equal-length columns (lists or NumPy arrays)"""
+        if not columns:
+            return
+        count = len(columns[0])
+        self._widen(len(columns))
+        for column, values in zip(self.columns, columns):
+            column.extend(values)
+        for column in self.columns[len(columns):]:
+            column.extend([''] * count)
+        self.length += count
+
+    def rows(self):
+        """ an iterator over rows, as tuples, the title line excepted"""
+        return zip(*[c.values for c in self.columns])
+
+    def getColumns(self):
+        """ the values of each column, as an array or a list"""
+        return [c.values for c in self.columns]
+
+    def to_string(self, sep=' '):
+        lines = [] if self.header is None else [sep.join(map(str, self.header))]
+        lines += [sep.join(map(str, row)) for row in self.rows()]
+        return '\n'.join(lines) + '\n' if lines else ''
+
+
+class TextSheet():
+    """ a TEXT, LIST or BIBLIOGRAPHY sheet, stored as a list of lines"""
+    def __init__(self, name: str):
+        self.name = name
+        self.lines = []
+        self.pending = [] # fragments of the current line
+
+    def newLine(self):
+        self.lines.append(''.join(self.pending))
+        self.pending = []
+
+    def rows(self):
+        return iter(self.lines)
+
+    def to_string(self, sep=' '):
+        lines = self.lines + [''.join(self.pending)] if self.pending else self.lines
+        return '\n'.join(lines) + '\n' if lines else ''
+
 
-    
 class StringWriter(AbstractWriter):
-    def __init__(self,numbered=False):
+    """ a writer keeping sheets in memory, by sheet name in self.sheets, as TableSheet or TextSheet objects"""
+    def __init__(self,numbered=False,sep=' '):
         super().__init__(numbered)
-        self.result = {}
+        self.sep = sep # separator of the cells of a row in strings
+        self.sheets = {}
 
-    def openSheet(self,sheetname,sheetType=TEXT):
-        super().openSheet(sheetname,sheetType)
-        self.result[sheetname] = ""
+    def open(self, target):
+        super().open(target)
+        self.sheets = {}
+
+    def openSheet(self,sheetname,sheetType=TEXT,*args,**kwargs):
+        super().openSheet(sheetname,sheetType,*args,**kwargs)
+        self.currentSheet = TableSheet(sheetname) if self.sheetType == TABLE else TextSheet(sheetname)
+        self.sheets[sheetname] = self.currentSheet
+
+    def _line(self, iterable):
+        if isinstance(iterable, str):
+            return self.getLinePrefix() + iterable
+        return self.getLinePrefix() + self.sep.join(str(x) for x in iterable)
 
     def writeTitle(self,element,** kwargs): # always=false,level=1,insertMode=False,style=None
-        self.writeln(element,** kwargs)
-        
+        if self.sheetType == TABLE and self.currentSheet.header is None and self.currentSheet.length == 0:
+            self.currentSheet.header = [element] if isinstance(element, str) else list(element)
+            self._incLineCount()
+        else:
+            self.writeln(element,** kwargs)
+
     def append(self,element,** kwargs):
-        self.result[sheetname] += str(element)
+        self.currentSheet.pending.append(element if self.sheetType == TABLE else str(element))
+
+    def startNewLine(self):
+        if self.sheetType == TABLE:
+            self.currentSheet.addRow(self.currentSheet.pending)
+            self.currentSheet.pending = []
+        else:
+            self.currentSheet.newLine()
+        super().startNewLine()
 
     def writeln(self,iterable,** kwargs):
-        line = self.getLinePrefix() + ' '.join(str(x) for x in iterable)
-        line += '\n'
-        self.result[sheetname] += line
-        super().writeln(iterable,** kwargs)
+        if self.sheetType == TABLE:
+            if self.currentSheet.pending:
+                iterable = self.currentSheet.pending + list(iterable)
+                self.currentSheet.pending = []
+            self.currentSheet.addRow([iterable] if isinstance(iterable, str) else iterable)
+        else:
+            self.currentSheet.pending.append(self._line(iterable))
+            self.currentSheet.newLine()
+        self._incLineCount()
+
+    def _writeChunk(self, chunk, **kwargs):
+        if self.sheetType != TABLE or self.currentSheet.pending:
+            super()._writeChunk(chunk, **kwargs)
+            return
+        self.currentSheet.addRows(chunk)
+        self._incLineCount(len(chunk))
+
+    def writecolumns(self, columns, header=True, formats=None, chunk_size=CHUNK_SIZE, **kwargs):
+        """ as AbstractWriter.writecolumns, but columns are stored as they are, without going through rows"""
+        if self.sheetType != TABLE:
+            raise ValueError('writecolumns is only meant for '+TABLE+' sheets, not '+str(self.sheetType))
+        names = list(columns)
+        lengths = set(len(columns[n]) for n in names)
+        if len(lengths) > 1:
+            raise ValueError('columns of different lengths: '+str(sorted(lengths)))
+        if header is True:
+            header = names
+        if header:
+            self.writeTitle(header)
+        formats = formats or {}
+        self.currentSheet.addColumns([columns[n] if formats.get(n) is None else self.formatColumn(columns[n], formats[n])
+                                      for n in names])
+        self._incLineCount(lengths.pop() if lengths else 0)
+
+    def closeSheet(self):
+        if self.currentSheet.pending:
+            self.startNewLine()
+        super().closeSheet()
+
+    def _getSheet(self, sheetName):
+        return self.currentSheet if sheetName is None else self.sheets[sheetName]
 
+    def to_string(self, sheetName=None):
+        """ the content of sheetName (by default the current or last sheet), joined once into a string"""
+        return self._getSheet(sheetName).to_string(self.sep)
 
+    def rows(self, sheetName=None):
+        """ an iterator over the rows of a TABLE sheet as tuples, or the lines of another sheet"""
+        return self._getSheet(sheetName).rows()
 
-#availableWriters['string'] = StringWriter()
-#availableWriters['num-string'] = StringWriter(numbered=True)
+    def columns(self, sheetName=None):
+        """ the columns of a TABLE sheet, each either an array or a list"""
+        return self._getSheet(sheetName).getColumns()
@@ -0,0 +1,101 @@
+""" Rendering independent sheets in parallel worker processes.
+
+When a writer saves each sheet into its own file (multiSheetOutput=False, editMode=False), sheets do not
+depend on each other, except through line numbering when a sheet does not reset its count: such a sheet
+is rendered after the previous sheet of the same type, in the same process, so that numbering is the same
+as when rendering sequentially.
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from ioformats import availableWriters, TABLE
+from ioformats.writers import CHUNK_SIZE
+
+
+class SheetJob():
+    """ a sheet to render: rows is either an iterable of rows or a callable returning one, which is then
+    only called in the worker process. Both must be picklable, e.g. a list or a module level function."""
+    def __init__(self, name: str, rows, sheetType=TABLE, title=None, numbered=False, resetCount=True, **kwargs):
+        self.name = name
+        self.rows = rows
+        self.sheetType = sheetType
+        self.title = title # written with writeTitle before rows, if not None
+        self.numbered = numbered
+        self.resetCount = resetCount
+        self.kwargs = kwargs # passed to openSheet
+
+
+class SheetResult():
+    """ the outcome of a SheetJob: the file it was saved into, its line count, or the error it raised"""
+    def __init__(self, name: str, filename: str = None, lines: int = -1, error: Exception = None):
+        self.name = name
+        self.filename = filename
+        self.lines = lines
+        self.error = error
+
+    def __repr__(self):
+        return 'SheetResult('+repr(self.name)+', '+repr(self.filename)+', '+str(self.lines)+', '+repr(self.error)+')'
+
+
+def getChains(jobs):
+    """ group jobs into lists of (index, job) to render sequentially: a job not resetting its line count
+    joins the chain of the previous job of the same sheet type"""
+    chains = []
+    last = {} # sheetType -> chain of the last job of this type
+    for index, job in enumerate(jobs):
+        chain = last.get(job.sheetType) if job.numbered and not job.resetCount else None
+        if chain is None:
+            chain = []
+            chains.append(chain)
+        chain.append((index, job))
+        last[job.sheetType] = chain
+    return chains
+
+
+def renderChain(writerName: str, attributes: dict, outputDir: str, target: str, chain, chunk_size=CHUNK_SIZE):
+    """ render a chain of jobs with a new writer, returning a list of (index, SheetResult)"""
+    writer = availableWriters.create(writerName, **attributes)
+    writer.setOutputDir(outputDir)
+    writer.open(target)
+    results = []
+    for index, job in chain:
+        try:
+            writer.openSheet(job.name, job.sheetType, job.numbered, job.resetCount, **job.kwargs)
+            if job.title is not None:
+                writer.writeTitle(job.title)
+            writer.writerows(job.rows() if callable(job.rows) else job.rows, chunk_size)
+            result = SheetResult(job.name, writer.getSheetFilename(), writer.getCurrentLine())
+            writer.closeSheet()
+        except Exception as e:
+            logging.error('Cannot render sheet '+job.name+': '+repr(e))
+            result = SheetResult(job.name, error=e)
+            try: # leave the writer ready for the next sheet of the chain
+                writer.closeSheet()
+            except Exception:
+                pass
+        results.append((index, result))
+    writer.close()
+    return results
+
+
+def renderSheets(writerName: str, target: str, jobs, outputDir='.', processes=None, chunk_size=CHUNK_SIZE, **attributes):
+    """ render each SheetJob of jobs into its own file with a writer registered as writerName, created in
+    worker processes with the given attributes. processes defaults to the number of CPUs.
+    Return a SheetResult per job, in the order of jobs; errors are reported there rather than raised."""
+    probe = availableWriters.create(writerName, **attributes)
+    if getattr(probe, 'multiSheetOutput', True) or getattr(probe, 'editMode', False):
+        raise ValueError(writerName+' does not save each sheet into its own file')
+    jobs = list(jobs)
+    results = [None] * len(jobs)
+    chains = getChains(jobs)
+    with ProcessPoolExecutor(processes) as pool:
+        futures = [(chain, pool.submit(renderChain, writerName, attributes, outputDir, target, chain, chunk_size))
+                   for chain in chains]
+        for chain, future in futures:
+            try:
+                for index, result in future.result():
+                    results[index] = result
+            except Exception as e: # the worker itself failed, e.g. unpicklable job or crashed process
+                for index, job in chain:
+                    results[index] = SheetResult(job.name, error=e)
+    return results
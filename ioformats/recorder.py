@@ -0,0 +1,180 @@
+""" Recording the calls made to a writer into a compact log, to be replayed into any number of other writers.
+
+A log starts with MAGIC, followed by frames: a 4 bytes little-endian length, then a pickle of (method, args, kwargs).
+Consecutive writeln calls sharing the same kwargs are recorded as a single frame, up to CHUNK_SIZE rows.
+Logs are read through mmap when they are files, and may be replayed into several writers in parallel processes.
+"""
+import io
+import logging
+import mmap
+import pickle
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+from ioformats import availableWriters, TEXT
+from ioformats.writers import AbstractWriter, CHUNK_SIZE, _materialize
+
+MAGIC = b'IOFLOG\x01\n'
+ROWS = 'writeln*' # method of the frames of several writeln calls
+_LENGTH = struct.Struct('<I')
+
+
+class RecordingWriter(AbstractWriter):
+    """ a writer recording the calls made to it into log, a filename or a binary stream (a BytesIO by default,
+    whose content is returned by getLog()). Every argument must be picklable."""
+    def __init__(self, log=None, numbered=False, chunk_size=CHUNK_SIZE):
+        self.stream = None # binary stream of the log, once open
+        super().__init__(numbered)
+        self.log = log
+        self.chunk_size = chunk_size
+        self._rows = [] # rows of pending writeln calls
+        self._rowsKwargs = None # their kwargs
+
+    def _record(self, method, *args, **kwargs):
+        if self._rows:
+            self._flushRows()
+        self._writeFrame((method, args, kwargs))
+
+    def _writeFrame(self, call):
+        data = pickle.dumps(call, pickle.HIGHEST_PROTOCOL)
+        self.stream.write(_LENGTH.pack(len(data)))
+        self.stream.write(data)
+
+    def _flushRows(self):
+        rows, self._rows = self._rows, []
+        self._writeFrame((ROWS, (rows,), self._rowsKwargs))
+
+    def getLog(self):
+        """ the bytes recorded so far into an in-memory log"""
+        if self._rows:
+            self._flushRows()
+        return self.stream.getvalue()
+
+    def open(self, target: str):
+        super().open(target)
+        if self.log is None:
+            self.log = io.BytesIO()
+        self.stream = open(self.log, 'wb') if isinstance(self.log, str) else self.log
+        self.stream.write(MAGIC)
+        self._record('open', target)
+
+    def openSheet(self, sheetName: str, sheetType=TEXT, *args, **kwargs):
+        super().openSheet(sheetName, sheetType, *args, **kwargs)
+        self._record('openSheet', sheetName, sheetType, *args, **kwargs)
+
+    def setLineNumber(self, value: int, * types):
+        super().setLineNumber(value, * types)
+        if self.stream is not None:
+            self._record('setLineNumber', value, * types)
+
+    def writeTitle(self, element, **kwargs):
+        self._record('writeTitle', element, **kwargs)
+        self._incLineCount()
+
+    def append(self, element, **kwargs):
+        self._record('append', element, **kwargs)
+
+    def startNewLine(self):
+        self._record('startNewLine')
+        self._incLineCount()
+
+    def writeln(self, iterable, **kwargs):
+        if self._rows and kwargs != self._rowsKwargs or len(self._rows) >= self.chunk_size:
+            self._flushRows()
+        self._rows.append(_materialize(iterable)) # pickled when the frame is full, rows may change meanwhile
+        self._rowsKwargs = kwargs
+        self._incLineCount()
+
+    def writerows(self, rows, chunk_size=CHUNK_SIZE, **kwargs):
+        for row in rows:
+            self.writeln(row, **kwargs)
+
+    def _writeChunk(self, chunk, **kwargs):
+        for row in chunk:
+            self.writeln(row, **kwargs)
+
+    def writecolumns(self, columns, header=True, formats=None, chunk_size=CHUNK_SIZE, **kwargs):
+        """ recorded as such, so that columns are formatted by the writers they are replayed into"""
+        self._record('writecolumns', columns, header, formats, chunk_size, **kwargs)
+
+    def closeSheet(self):
+        self._record('closeSheet')
+        super().closeSheet()
+
+    def close(self):
+        self._record('close')
+        self.stream.flush()
+        if isinstance(self.log, str):
+            self.stream.close()
+
+
+def _frames(buffer):
+    """ yield the calls of the log in buffer, a bytes-like object, as (method, args, kwargs)"""
+    view = memoryview(buffer)
+    if bytes(view[:len(MAGIC)]) != MAGIC:
+        raise ValueError('not an ioformats log')
+    position = len(MAGIC)
+    size = len(view)
+    while position < size:
+        length, = _LENGTH.unpack_from(view, position)
+        position += _LENGTH.size
+        yield pickle.loads(view[position:position + length])
+        position += length
+    view.release()
+
+
+def readLog(log):
+    """ yield the calls recorded in log, either a filename (read through mmap), bytes, or a binary stream"""
+    if isinstance(log, (bytes, bytearray, memoryview)):
+        yield from _frames(log)
+    elif isinstance(log, str):
+        with open(log, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            yield from _frames(m)
+    else:
+        if log.read(len(MAGIC)) != MAGIC:
+            raise ValueError('not an ioformats log')
+        while True:
+            header = log.read(_LENGTH.size)
+            if not header:
+                return
+            length, = _LENGTH.unpack(header)
+            yield pickle.loads(log.read(length))
+
+
+def replay(log, writer: AbstractWriter, target: str = None):
+    """ make the calls recorded in log on writer, either a writer or a name in availableWriters.
+    If given, target replaces the one the log was opened with. Rows are replayed through writerows, and columns
+    through writecolumns, so that writers write them in bulk. Return the writer."""
+    if isinstance(writer, str):
+        writer = availableWriters.create(writer)
+    for method, args, kwargs in readLog(log):
+        if method == ROWS:
+            writer.writerows(args[0], **kwargs)
+        else:
+            if method == 'open' and target is not None:
+                args = (target,)
+            getattr(writer, method)(*args, **kwargs)
+    return writer
+
+
+def _replayInto(log, writerName: str, outputDir: str, target: str, attributes: dict):
+    writer = availableWriters.create(writerName, **attributes)
+    writer.setOutputDir(outputDir)
+    replay(log, writer, target)
+
+
+def replayAll(log, writerNames, outputDir='.', target: str = None, processes=None, **attributes):
+    """ replay log, a filename or bytes, into a new writer for each name of writerNames, each in its own process.
+    Return the exception raised by each replay, or None if it succeeded, in the order of writerNames."""
+    writerNames = list(writerNames)
+    with ProcessPoolExecutor(processes) as pool:
+        futures = [pool.submit(_replayInto, log, name, outputDir, target, attributes) for name in writerNames]
+        errors = []
+        for name, future in zip(writerNames, futures):
+            try:
+                future.result()
+                errors.append(None)
+            except Exception as e:
+                logging.error('Cannot replay into '+name+': '+repr(e))
+                errors.append(e)
+    return errors
@@ -0,0 +1,163 @@
+import copy
+import importlib
+import logging
+import threading
+from collections.abc import Mapping
+from contextlib import contextmanager
+
+ENTRY_POINT_GROUP = 'ioformats.writers' # entry point group where third-party packages may register writers
+
+
+def resolve(spec):
+    """ return the object designated by a 'module:attribute' string, importing module if needed"""
+    module, _, attr = spec.partition(':')
+    result = importlib.import_module(module)
+    for name in attr.split('.'):
+        result = getattr(result, name)
+    return result
+
+
+class WriterRegistry(Mapping):
+    """ map writer names onto writer factories. A factory may be given as a 'module:attribute' string,
+    in which case module is only imported the first time the name is looked up: getting a 'csv' writer
+    never imports openpyxl nor python-docx."""
+    def __init__(self, group=ENTRY_POINT_GROUP):
+        self.group = group
+        self._factories = {} # name -> [factory or 'module:attribute', args, kwargs]
+        self._instances = {} # name -> shared writer, built on first lookup
+        self._entryPointsLoaded = group is None
+
+    def register(self, name: str, factory, * args, ** kwargs):
+        """ register factory(*args, **kwargs) as the way to build writer name"""
+        self._factories[name] = [factory, args, kwargs]
+        self._instances.pop(name, None)
+
+    def __setitem__(self, name: str, writer):
+        """ register an already built writer"""
+        self._factories[name] = [None, (), {}]
+        self._instances[name] = writer
+
+    def __delitem__(self, name: str):
+        del self._factories[name]
+        self._instances.pop(name, None)
+
+    def getFactory(self, name: str):
+        """ return the factory registered for name, importing its module if not done yet"""
+        entry = self._getEntry(name)
+        if isinstance(entry[0], str):
+            entry[0] = resolve(entry[0])
+        return entry[0]
+
+    def __getitem__(self, name: str):
+        """ return the writer shared by all users of name, building it on first lookup"""
+        writer = self._instances.get(name)
+        if writer is None:
+            factory = self.getFactory(name)
+            _, args, kwargs = self._factories[name]
+            writer = self._instances[name] = factory(* args, ** kwargs)
+        return writer
+
+    def create(self, name: str, ** attributes):
+        """ return a new writer built by the factory registered for name, with the given attributes set.
+        Unlike the shared writer returned by registry[name], it may be used concurrently with other ones."""
+        factory = self.getFactory(name)
+        if factory is None: # registered as an instance: copy it, it has not been opened yet
+            writer = copy.deepcopy(self._instances[name])
+        else:
+            _, args, kwargs = self._factories[name]
+            writer = factory(* args, ** kwargs)
+        for att, value in attributes.items():
+            setattr(writer, att, value)
+        return writer
+
+    def __contains__(self, name):
+        return name in self._factories or (self._loadEntryPoints() and name in self._factories)
+
+    def __iter__(self):
+        self._loadEntryPoints()
+        return iter(list(self._factories))
+
+    def __len__(self):
+        self._loadEntryPoints()
+        return len(self._factories)
+
+    def _getEntry(self, name):
+        if name not in self._factories:
+            self._loadEntryPoints()
+        return self._factories[name]
+
+    def _loadEntryPoints(self):
+        """ register writers advertised by installed packages; return True if new ones were found"""
+        if self._entryPointsLoaded:
+            return False
+        self._entryPointsLoaded = True
+        from importlib.metadata import entry_points
+        eps = entry_points()
+        if hasattr(eps, 'select'):
+            eps = eps.select(group=self.group)
+        else: # python < 3.10
+            eps = eps.get(self.group, ())
+        return self._registerEntryPoints(eps)
+
+    def _registerEntryPoints(self, eps):
+        found = False
+        for ep in eps:
+            if ep.name in self._factories:
+                logging.warning('Ignoring entry point '+ep.name+' = '+ep.value+': name already registered')
+            else: # ep.value is in the 'module:attribute' form, ie imported on first lookup too
+                self.register(ep.name, ep.value.split('[')[0].strip())
+                found = True
+        return found
+
+
+class WriterPool():
+    """ a per-thread pool of reusable writers: a writer released by a thread is only handed back to
+    this same thread, so that no locking is needed and writers are never shared between threads"""
+    def __init__(self, registry: WriterRegistry = None, maxIdle=4):
+        if registry is None:
+            from ioformats import availableWriters
+            registry = availableWriters
+        self.registry = registry
+        self.maxIdle = maxIdle # max number of idle writers kept per name and per thread
+        self._local = threading.local()
+
+    def _idle(self, name):
+        pools = getattr(self._local, 'pools', None)
+        if pools is None:
+            pools = self._local.pools = {}
+        return pools.setdefault(name, [])
+
+    def acquire(self, name: str, ** attributes):
+        """ return an idle writer of this thread if any, else a new one, with the given attributes set"""
+        idle = self._idle(name)
+        if not idle:
+            writer = self.registry.create(name)
+            writer._poolState = {}
+        else:
+            writer = idle.pop()
+        # remember what to restore on release: open() may also turn off editMode
+        state = writer._poolState
+        for att in ('editMode', * attributes):
+            if hasattr(writer, att) and att not in state:
+                state[att] = getattr(writer, att)
+        for att, value in attributes.items():
+            setattr(writer, att, value)
+        return writer
+
+    def release(self, name: str, writer):
+        """ give back a writer, which must have been closed, for reuse by the current thread"""
+        for att, value in writer._poolState.items():
+            setattr(writer, att, value)
+        writer._poolState = {}
+        idle = self._idle(name)
+        if len(idle) < self.maxIdle:
+            idle.append(writer)
+
+    @contextmanager
+    def writer(self, name: str, ** attributes):
+        """ with pool.writer('xlsx') as w: ... acquire a writer, releasing it at the end of the block"""
+        writer = self.acquire(name, ** attributes)
+        try:
+            yield writer
+        finally:
+            self.release(name, writer)
@@ -0,0 +1,225 @@
+""" Output sinks: where a FileWriter writes the bytes of the files it produces.
+
+By default files go to the local disk, but they may as well be written into in-memory buffers (BufferSink),
+an already open stream, file descriptor or pipe such as stdout (StreamSink), or streams returned by any
+factory called with the name of each file (FactorySink), which also makes one-file-per-sheet output work
+with sinks. Every sink may compress what it writes with gzip, bz2 or lzma.
+IncrementalSink only rewrites the files whose content changed since the previous run.
+"""
+import bz2
+import gzip
+import hashlib
+import io
+import json
+import logging
+import lzma
+import os
+import shutil
+import sys
+import tempfile
+import zipfile
+
+MANIFEST = '.ioformats-manifest.json' # digests of the files written by IncrementalSink, in their directory
+SPOOL_SIZE = 1 << 24 # bytes of a file kept in memory before spooling it to disk
+ZIP_VOLATILE = ('docProps/core.xml',) # zip members holding the time of saving
+COMPRESSIONS = {
+    'gzip': '.gz',
+    'bz2': '.bz2',
+    'lzma': '.xz',
+}
+
+
+def compress(stream, compression: str):
+    """ a binary stream compressing what is written into stream, which stays open when it is closed"""
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=stream, mode='wb')
+    if compression == 'bz2':
+        return bz2.BZ2File(stream, 'wb')
+    if compression == 'lzma':
+        return lzma.LZMAFile(stream, 'wb')
+    raise ValueError('Unknown compression '+str(compression)+'; available: '+', '.join(COMPRESSIONS))
+
+
+def _tell(stream):
+    try:
+        return stream.tell()
+    except (AttributeError, OSError): # e.g. a pipe
+        return None
+
+
+class Sink():
+    """ an abstract sink: open(filename) returns a binary stream to write the file named filename into,
+    which must be given back to close(stream) once complete. sizes records the number of bytes written
+    into each file, when the underlying stream can tell it."""
+    def __init__(self, compression: str = None):
+        if compression is not None and compression not in COMPRESSIONS:
+            raise ValueError('Unknown compression '+str(compression)+'; available: '+', '.join(COMPRESSIONS))
+        self.compression = compression
+        self.sizes = {} # filename -> bytes
+        self._opened = {} # id(stream) -> (stream, filename, raw stream under the compressed one, its start position)
+
+    def _open(self, filename):
+        """ return the raw binary stream to write filename into"""
+        raise NotImplementedError
+
+    def _close(self, raw, filename):
+        """ release the raw stream of filename, once complete"""
+        raw.flush()
+
+    def open(self, filename: str):
+        raw = self._open(filename)
+        start = _tell(raw) # before the compressor writes its header
+        stream = raw if self.compression is None else compress(raw, self.compression)
+        self._opened[id(stream)] = (stream, filename, raw, start)
+        return stream
+
+    def close(self, stream):
+        _, filename, raw, start = self._opened.pop(id(stream))
+        if stream is not raw:
+            stream.close() # flush the compressor, leaving raw open
+        end = _tell(raw)
+        if start is not None and end is not None:
+            self.sizes[filename] = end - start
+        self._close(raw, filename)
+
+    def isSeekable(self, stream):
+        """ whether stream can be sought back into, as needed for saving zip based documents"""
+        return self.compression is None and stream.seekable()
+
+
+class FileSink(Sink):
+    """ files on the local disk, the default sink. Compressed files get the suffix of their compression."""
+    def _open(self, filename):
+        return open(self.getFilename(filename), 'wb')
+
+    def _close(self, raw, filename):
+        raw.close()
+
+    def getFilename(self, filename):
+        """ the name of the file actually written for filename"""
+        return filename if self.compression is None else filename + COMPRESSIONS[self.compression]
+
+
+class BufferSink(Sink):
+    """ in-memory files, kept in buffers as BytesIO objects, by normalized filename"""
+    def __init__(self, compression: str = None):
+        super().__init__(compression)
+        self.buffers = {} # filename -> BytesIO
+
+    def _open(self, filename):
+        buffer = self.buffers[os.path.normpath(filename)] = io.BytesIO()
+        return buffer
+
+    def getvalue(self, filename: str = None):
+        """ the bytes of filename, which may be omitted if a single file was written"""
+        if filename is None:
+            if len(self.buffers) != 1:
+                raise ValueError('A filename is needed when there are '+str(len(self.buffers))+' buffers')
+            filename = next(iter(self.buffers))
+        return self.buffers[os.path.normpath(filename)].getvalue()
+
+
+class StreamSink(Sink):
+    """ every file written one after the other into a single open stream, which is never closed: a binary
+    stream, a text stream with a binary buffer (e.g. sys.stdout), or a file descriptor (e.g. of a pipe)"""
+    def __init__(self, stream=None, compression: str = None):
+        super().__init__(compression)
+        if stream is None:
+            stream = sys.stdout
+        if isinstance(stream, int):
+            stream = open(stream, 'wb', closefd=False)
+        elif isinstance(stream, io.TextIOBase):
+            stream.flush()
+            stream = stream.buffer
+        self.stream = stream
+
+    def _open(self, filename):
+        return self.stream
+
+
+class FactorySink(Sink):
+    """ streams returned by factory(filename), closed once complete unless closing is False"""
+    def __init__(self, factory, compression: str = None, closing=True):
+        super().__init__(compression)
+        self.factory = factory
+        self.closing = closing
+
+    def _open(self, filename):
+        return self.factory(filename)
+
+    def _close(self, raw, filename):
+        raw.flush()
+        if self.closing:
+            raw.close()
+
+
+def digest(stream):
+    """ sha256 of the content of stream, a seekable binary stream read from its start. For a zip file (e.g.
+    xlsx, docx) this is the digest of its uncompressed members, but those holding the time of saving, so
+    that it does not depend on timestamps"""
+    h = hashlib.sha256()
+    stream.seek(0)
+    if zipfile.is_zipfile(stream):
+        with zipfile.ZipFile(stream) as archive:
+            for info in archive.infolist():
+                if info.filename not in ZIP_VOLATILE:
+                    h.update(info.filename.encode('utf-8') + b'\0')
+                    with archive.open(info) as member:
+                        for block in iter(lambda: member.read(1 << 16), b''):
+                            h.update(block)
+    else:
+        stream.seek(0) # moved by is_zipfile
+        for block in iter(lambda: stream.read(1 << 16), b''):
+            h.update(block)
+    stream.seek(0)
+    return h.hexdigest()
+
+
+class IncrementalSink(FileSink):
+    """ files on the local disk which are only written when their content differs from the previous
+    time they were written, according to the digests kept in a MANIFEST file in their directory.
+    Unchanged files are not touched, keeping their modification time. Files are spooled until complete,
+    in memory up to SPOOL_SIZE bytes. skipped holds the names of the files left untouched."""
+    def __init__(self, compression: str = None):
+        super().__init__(compression)
+        self.skipped = set()
+        self._manifests = {} # directory -> {basename: digest}
+
+    def getManifest(self, directory):
+        if directory not in self._manifests:
+            try:
+                with open(os.path.join(directory, MANIFEST), encoding='utf-8') as f:
+                    self._manifests[directory] = json.load(f)
+            except (OSError, ValueError):
+                self._manifests[directory] = {}
+        return self._manifests[directory]
+
+    def open(self, filename: str):
+        stream = tempfile.SpooledTemporaryFile(SPOOL_SIZE)
+        self._opened[id(stream)] = (stream, filename, stream, None)
+        return stream
+
+    def close(self, stream):
+        _, filename, _, _ = self._opened.pop(id(stream))
+        try:
+            directory, basename = os.path.split(os.path.normpath(filename))
+            manifest = self.getManifest(directory)
+            key = digest(stream)
+            target = self.getFilename(filename)
+            if manifest.get(basename) == key and os.path.isfile(target):
+                logging.info('Unchanged, not rewritten: '+target)
+                self.skipped.add(filename)
+                self.sizes[filename] = os.path.getsize(target)
+                return
+            self.skipped.discard(filename)
+            output = super().open(filename)
+            shutil.copyfileobj(stream, output)
+            super().close(output)
+            manifest[basename] = key
+            with open(os.path.join(directory, MANIFEST), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=1, sort_keys=True)
+        finally:
+            stream.close()
+
+    def isSeekable(self, stream):
+        return True
@@ -0,0 +1,148 @@
+import os
+import time
+from collections import Counter, defaultdict
+
+# instrumented methods, with the phase their time is accounted to
+PHASES = {
+    'open': 'open',
+    'openSheet': 'open',
+    'writeTitle': 'write',
+    'writeln': 'write',
+    'append': 'write',
+    'startNewLine': 'write',
+    'writerows': 'write',
+    'writecolumns': 'write',
+    '_writeChunk': 'write',
+    '_writeFormattedChunk': 'write',
+    'closeSheet': 'closeSheet',
+    'close': 'close',
+}
+COUNTED = ('writeTitle', 'writeln', 'append', 'writerows', 'writecolumns') # methods whose calls are counted
+CHUNKS = ('writecolumns', '_writeChunk', '_writeFormattedChunk') # bulk paths, counted unless called by another one
+
+
+class WriterStats():
+    """ statistics gathered by an instrumented writer: number of calls per method, rows written
+    per sheet, time spent per phase (open, write, closeSheet, save, close) and bytes per output file.
+    Time spent saving a document is only accounted to 'save', not to the closeSheet or close calling it.
+    Each hook is called as hook(event, name, value) with event one of:
+    'time' (phase, seconds) after each top level call, 'rows' (sheetName, rows) when a sheet is closed,
+    'bytes' (filename, size) when a file is saved."""
+    def __init__(self, * hooks):
+        self.calls = Counter() # method -> number of calls
+        self.rows = Counter() # sheetName -> rows written with writeln/writerows/writecolumns
+        self.seconds = defaultdict(float) # phase -> seconds
+        self.bytes = {} # filename -> size
+        self.hooks = list(hooks)
+        self._depth = 0 # >0 while inside an instrumented call
+        self._chunkDepth = 0 # >0 while inside a bulk path
+
+    def addHook(self, hook):
+        self.hooks.append(hook)
+
+    def emit(self, event, name, value):
+        for hook in self.hooks:
+            hook(event, name, value)
+
+    def getTotalRows(self):
+        return sum(self.rows.values())
+
+    def getRowsPerSecond(self):
+        """ rows written per second spent in the write phase"""
+        seconds = self.seconds['write']
+        return self.getTotalRows() / seconds if seconds > 0 else 0.0
+
+    def asDict(self):
+        return {
+            'calls': dict(self.calls),
+            'rows': dict(self.rows),
+            'seconds': dict(self.seconds),
+            'bytes': dict(self.bytes),
+            'rowsPerSecond': self.getRowsPerSecond(),
+        }
+
+
+def _chunkRows(method, args, kwargs):
+    """ rows written by a call of the bulk path method, which overrides may write without going through rows"""
+    if method == 'writecolumns':
+        columns = args[0] if args else kwargs['columns']
+        return len(next(iter(columns.values()))) if columns else 0
+    return len(args[0])
+
+
+def _instrumentCall(writer, stats, method, phase):
+    func = getattr(writer, method)
+    counted = method in COUNTED
+    chunk = method in CHUNKS
+    def call(* args, ** kwargs):
+        if chunk:
+            if stats._chunkDepth == 0: # not called back by another bulk path, e.g. a default one falling back on another
+                stats.rows[writer.sheetName] += _chunkRows(method, args, kwargs)
+            stats._chunkDepth += 1
+        try:
+            if stats._depth > 0: # called back by another instrumented method, e.g. writeTitle calling writeln
+                return func(* args, ** kwargs)
+            return _timeCall(writer, stats, method, phase, counted, func, args, kwargs)
+        finally:
+            if chunk:
+                stats._chunkDepth -= 1
+    return call
+
+
+def _timeCall(writer, stats, method, phase, counted, func, args, kwargs):
+    if counted:
+        stats.calls[method] += 1
+    if method == 'writeln':
+        stats.rows[writer.sheetName] += 1
+    elif method == 'closeSheet' and stats.hooks:
+        stats.emit('rows', writer.sheetName, stats.rows[writer.sheetName])
+    saved = stats.seconds['save']
+    stats._depth += 1
+    start = time.perf_counter()
+    try:
+        return func(* args, ** kwargs)
+    finally:
+        elapsed = time.perf_counter() - start - (stats.seconds['save'] - saved)
+        stats._depth -= 1
+        stats.seconds[phase] += elapsed
+        if stats.hooks:
+            stats.emit('time', phase, elapsed)
+
+
+def _instrumentSave(writer, stats):
+    func = writer._savedoc
+    def savedoc(filename, * args, ** kwargs):
+        start = time.perf_counter()
+        try:
+            return func(filename, * args, ** kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            stats.seconds['save'] += elapsed
+            size = getattr(writer, 'sink', None) and writer.sink.sizes.get(filename) # also known for files not on disk
+            filename = os.path.normpath(filename)
+            if size is not None:
+                stats.bytes[filename] = size
+            elif os.path.isfile(filename):
+                stats.bytes[filename] = os.path.getsize(filename)
+            if stats.hooks:
+                stats.emit('time', 'save', elapsed)
+                if filename in stats.bytes:
+                    stats.emit('bytes', filename, stats.bytes[filename])
+    return savedoc
+
+
+def instrument(writer, stats: WriterStats):
+    """ shadow the methods of writer with instrumented ones feeding stats. Methods are wrapped on this
+    instance only, so that writers which are not instrumented pay nothing."""
+    for method, phase in PHASES.items():
+        if hasattr(writer, method):
+            setattr(writer, method, _instrumentCall(writer, stats, method, phase))
+    if hasattr(writer, '_savedoc'):
+        writer._savedoc = _instrumentSave(writer, stats)
+    return stats
+
+
+def uninstrument(writer):
+    """ restore the methods of writer"""
+    for method in (* PHASES, '_savedoc'):
+        writer.__dict__.pop(method, None)
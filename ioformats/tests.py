@@ -7,11 +7,11 @@ from datetime import datetime
 
 from openpyxl import load_workbook
 
-from ioformats import TABLE,TEXT,BIBLIOGRAPHY,LIST
+from ioformats import availableWriters,columnar,TABLE,TEXT,BIBLIOGRAPHY,LIST
 from ioformats.docxrw import DocxWriter
 from ioformats.tex import TeXWriter, TeXTableReader
 from ioformats.text import TextWriter
-from ioformats.writers import AbstractWriter
+from ioformats.writers import AbstractWriter, MultiWriter
 from ioformats.xlsx import XlsxWriter
 
 TEST_DATA = [
@@ -22,6 +22,7 @@ TEST_DATA = [
 ]
 
 outdir = tempfile.gettempdir() + "/TestWriterMethods/"
+BENCHMARK_SIZES = ['--rows', '3', '--cols', '3', '--wide', '4', '--repeat', '1'] # the benchmarks are only smoke-tested here
 
 class PublicationStub:
     def __init__(self, **kwargs):
@@ -40,6 +41,9 @@ class PublicationStub:
             writer.append(p+', ')
         writer.append(str(self.kw.get('year'))+'.')
 
+    def getHalId(self):
+        return self.kw.get('key')
+
     def __iter__(self):
         for v in self.kw.values():
             yield v
@@ -50,27 +54,30 @@ PUBLIST = [
     PublicationStub(key='DD20',authors='M. Dupont and P. Durand',title='Dummy Publication',publisher='Nobody',year=2020)
 ]
 
-def gen_publist(writer: AbstractWriter, numbered=False, resetCount=True):
+def gen_publist(writer: AbstractWriter, numbered=False, resetCount=True, publist=PUBLIST):
     writer.openSheet("publications", BIBLIOGRAPHY, numbered, resetCount)
-    for pub in PUBLIST:
+    for pub in publist:
         writer.writeln(pub)
     writer.closeSheet()
 
-def gen_sheet(writer: AbstractWriter, sheetType: str, label: str, numbered=False, resetCount=True, **kargs):
+def gen_sheet(writer: AbstractWriter, sheetType: str, label: str, numbered=False, resetCount=True, data=TEST_DATA, bulk=False, **kargs):
     writer.openSheet('test_'+sheetType+label,sheetType,numbered,resetCount,**kargs)
-    writer.writeTitle(TEST_DATA[0])
-    for i in range(1, len(TEST_DATA)):
-        writer.writeln(TEST_DATA[i])
+    writer.writeTitle(data[0])
+    if bulk:
+        writer.writerows(data[i] for i in range(1, len(data)))
+    else:
+        for i in range(1, len(data)):
+            writer.writeln(data[i])
     writer.closeSheet()
 
-def gen_tables(writer: AbstractWriter, sheets: int = 1):
+def gen_tables(writer: AbstractWriter, sheets: int = 1, data=TEST_DATA, bulk=False):
     for i in range(1,sheets+1):
-        gen_sheet(writer,TABLE, str(i))
+        gen_sheet(writer,TABLE, str(i), data=data, bulk=bulk)
 
-def gen_text(writer: AbstractWriter, numbered=False, resetCount=True, **kargs):
+def gen_text(writer: AbstractWriter, numbered=False, resetCount=True, sections=2, **kargs):
     writer.openSheet('test_'+TEXT,TEXT,numbered,resetCount,**kargs)
     writer.writeTitle('Test title level 1',level=1)
-    for i in range(1,3):
+    for i in range(1,sections+1):
         writer.writeTitle(('Test title', 'level 2'), level=2)
         for j in range(1,3):
             writer.writeln('Lorem ipsum lorem ipsum '+str(i)+ '.'+str(j))
@@ -135,6 +142,87 @@ class Test_CSV(TestWriterMethods):
                 #self.assertEqual(TEST_DATA[line],row)
                 line += 1
 
+    def test_round_trip(self):
+        from ioformats.csvwriter import CSVwriter
+        data = [['a;b', 'say "hi"', 'two\nlines', 42, -0.5, None, ''], ['x', 'y', 'z', 1, 2.0, 'end', ' ']]
+        expected = [[str(v) if v is not None else '' for v in row] for row in data]
+        for bulk in (False, True):
+            w = CSVwriter()
+            w.setOutputDir(outdir)
+            w.open('roundtrip')
+            w.openSheet('sheet', TABLE)
+            w.append('appended')
+            w.append(';')
+            w.startNewLine()
+            if bulk:
+                w.writerows(data)
+            else:
+                for row in data:
+                    w.writeln(row)
+            w.closeSheet()
+            w.close()
+            with open(outdir + 'roundtrip-sheet.csv', newline='', encoding='utf-8') as f:
+                self.assertEqual([['appended', ';']] + expected, list(csv.reader(f, delimiter=';')))
+
+    def test_quoting(self):
+        w = availableWriters.create('csv', sep=',', quoting=csv.QUOTE_NONNUMERIC, lineterminator='\n')
+        w.setOutputDir(outdir)
+        w.open('quoting')
+        w.openSheet('sheet', TABLE)
+        w.writecolumns({'name': ['a', 'b'], 'value': [1, 2.5]}, header=False)
+        w.closeSheet()
+        w.close()
+        with open(outdir + 'quoting-sheet.csv', encoding='utf-8') as f:
+            self.assertEqual('"a",1\n"b",2.5\n', f.read())
+
+class Test_csvreader(TestWriterMethods):
+    def write(self, data):
+        from ioformats.csvwriter import CSVwriter
+        w = CSVwriter()
+        w.setOutputDir(outdir)
+        w.open('typed')
+        w.openSheet('sheet', TABLE)
+        w.writerows(data)
+        w.closeSheet()
+        w.close()
+        return outdir + 'typed-sheet.csv'
+
+    def test_typed(self):
+        from ioformats.csvreader import DictReader
+        r = DictReader(self.write(TEST_DATA))
+        self.assertEqual({'Test Table': 'str', 'String': 'str', 'Int': 'int', 'Float': 'float', 'Date': 'datetime'}, r.types)
+        self.assertEqual([dict(zip(TEST_DATA[0], row)) for row in TEST_DATA[1:]], list(r))
+        r.close()
+
+    def test_fallback(self):
+        from ioformats.csvreader import DictReader
+        data = [['a', 'b', 'c'], [1, 'true', '01/02/2020'], ['x', 'False', '2020-02-01'], [2.5, 'yes', 3], [4]]
+        r = DictReader(self.write(data), sample_size=1, restval='?')
+        self.assertEqual({'a': 'int', 'b': 'bool', 'c': 'datetime'}, r.types)
+        self.assertEqual([[1, True, datetime(2020, 2, 1)], ['x', False, datetime(2020, 2, 1)], [2.5, 'yes', 3], [4, '?', '?']],
+                         [list(d.values()) for d in r])
+        r.close()
+
+    def test_batches(self):
+        from ioformats.csvreader import DictReader
+        data = [['i', 'f', 's']] + [[i, i / 2, 'v' + str(i)] for i in range(5)] + [[5, '', 's', 'extra']]
+        r = DictReader(self.write(data), sample_size=2, restkey='rest')
+        batches = list(r.read_batches(3))
+        self.assertEqual([0, 1, 2], batches[0]['i'])
+        self.assertEqual([1.5, 2.0, ''], batches[1]['f'])
+        self.assertEqual([[], [], ['extra']], batches[1]['rest']) # one per row
+        self.assertNotIn('rest', batches[0])
+        r.close()
+        if columnar.getNumpy() is not None:
+            r = DictReader(self.write(data), restkey='rest')
+            batches = list(r.read_batches(3, arrays=True))
+            self.assertEqual('int64', batches[0]['i'].dtype)
+            self.assertEqual('float64', batches[0]['f'].dtype)
+            self.assertEqual(object, batches[1]['f'].dtype)
+            self.assertEqual(['v3', 'v4', 's'], batches[1]['s'].tolist())
+            r.close()
+
+
 class Test_xlsx(TestWriterMethods):
     def test_single_sheet_writer(self):
         w = XlsxWriter()
@@ -155,6 +243,365 @@ class Test_xlsx(TestWriterMethods):
                 self.assertEqual(TEST_DATA[line],list(elem if elem is not None else '' for elem in row))
                 line += 1
 
+class Test_xlsxstream(TestWriterMethods):
+    def test_tables(self):
+        for shared in (False, True):
+            w = availableWriters.create('xlsx-stream', sharedStrings=shared)
+            run_writer(w, 'xlsx-stream')
+            for i in (1, 2):
+                Test_xlsx.check_table(self, outdir+'xlsx-stream-'+BASETABLENAME+str(i)+'.xlsx', BASETABLENAME+str(i))
+            w = XlsxWriter(multiSheetOutput=True, engine='stream', sharedStrings=shared)
+            run_writer(w, 'xlsx-stream-multisheets')
+            Test_xlsx.check_table(self, outdir+'xlsx-stream-multisheets.xlsx', BASETABLENAME+'1', BASETABLENAME+'2')
+
+    def test_types(self):
+        from datetime import date, time
+        w = XlsxWriter(multiSheetOutput=True, engine='stream')
+        w.setOutputDir(outdir)
+        w.open('xlsx-stream-types')
+        w.openSheet('types', TABLE)
+        row = [True, 2 ** 40, 1e-7, date(1900, 1, 1), datetime(2020, 2, 29, 12, 30, 15), time(6, 0), '<&> "x"', None, '']
+        w.writeln(row)
+        w.closeSheet()
+        w.close()
+        ws = load_workbook(outdir+'xlsx-stream-types.xlsx')['types']
+        cells = next(ws.iter_rows())
+        self.assertEqual([True, 2 ** 40, 1e-7, datetime(1900, 1, 1), datetime(2020, 2, 29, 12, 30, 15), time(6, 0), '<&> "x"'],
+                         [c.value for c in cells[:7]])
+        self.assertEqual(['yyyy-mm-dd', 'yyyy-mm-dd h:mm:ss', 'h:mm:ss'], [c.number_format for c in cells[3:6]])
+        self.assertEqual(7, ws.max_column)
+
+    def test_numbers(self):
+        from decimal import Decimal
+        w = XlsxWriter(multiSheetOutput=True, engine='stream')
+        w.setOutputDir(outdir)
+        w.open('xlsx-stream-numbers')
+        w.openSheet('numbers', TABLE)
+        w.writeln([float('nan'), float('inf'), Decimal('1.10'), Decimal('NaN'), 1])
+        if columnar.getNumpy() is not None:
+            np = columnar.getNumpy()
+            w.writecolumns({'int': np.array([1, 2]), 'bool': np.array([True, False]), 'float': np.array([0.5, np.nan])})
+        w.closeSheet()
+        w.close()
+        rows = [[v if v is not None else '' for v in row] for row in load_workbook(outdir+'xlsx-stream-numbers.xlsx')['numbers'].values]
+        self.assertEqual(['', '', 1.1, '', 1], rows[0][:5]) # blank cells
+        if columnar.getNumpy() is not None:
+            self.assertEqual([['int', 'bool', 'float'], [1, True, 0.5], [2, False, '']], [row[:3] for row in rows[1:]])
+
+    def test_titles(self):
+        w = XlsxWriter(multiSheetOutput=True, engine='stream')
+        w.setOutputDir(outdir)
+        w.open('xlsx-stream-titles')
+        for title in ('bad/name?', 'x' * 32):
+            with self.assertRaises(ValueError):
+                w.openSheet(title, TABLE)
+        for i in range(2):
+            w.openSheet('Same', TABLE)
+            w.writeln([i])
+            w.closeSheet()
+        w.close()
+        self.assertEqual(['Same', 'Same1'], load_workbook(outdir+'xlsx-stream-titles.xlsx').sheetnames)
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            XlsxWriter(editMode=True, engine='stream')
+        with self.assertRaises(ValueError):
+            XlsxWriter(engine='xlsxwriter')
+        w = availableWriters.create('xlsx-stream')
+        w.setOutputDir(outdir)
+        w.open('xlsx-stream-errors')
+        w.openSheet('errors', TABLE)
+        with self.assertRaises(ValueError):
+            w.writeln(['bell\a'])
+
+
+class Test_insert(TestWriterMethods):
+    def test_templates(self):
+        from ioformats.fixtures import ChainedXlsxWriter, insert_template, prepare_template
+        filename = outdir + 'template.xlsx'
+        sheets = []
+        for factory in (ChainedXlsxWriter, XlsxWriter):
+            prepare_template(filename)
+            w = insert_template(factory(editMode=True, multiSheetOutput=True), filename, 30)
+            sheets.append(w.currentSheet)
+        chained, cached = sheets
+        self.assertEqual(33, cached.max_row)
+        for row, expected in zip(cached.iter_rows(), chained.iter_rows()):
+            self.assertEqual([c.value for c in expected], [c.value for c in row])
+            self.assertEqual([(c.number_format, c.font.b, c.protection.locked) for c in expected],
+                             [(c.number_format, c.font.b, c.protection.locked) for c in row])
+        self.assertEqual([str(r) for r in chained.merged_cells.ranges], [str(r) for r in cached.merged_cells.ranges])
+        self.assertEqual('=SUM($E$2:E31)', cached['F31'].value)
+        self.assertEqual('', cached['H31'].value) # locked: not overwritten
+        self.assertEqual('row 29', cached['A32'].value)
+
+    def test_shorter_rows(self):
+        from ioformats.fixtures import ChainedXlsxWriter, prepare_template
+        filename = outdir + 'template.xlsx'
+        values = []
+        for factory in (ChainedXlsxWriter, XlsxWriter):
+            prepare_template(filename)
+            w = factory(editMode=True, multiSheetOutput=True)
+            w.open(filename)
+            w.openSheet('template', TABLE, numbered=True)
+            w.setLineNumber(3)
+            for row in (['a', '', 1, 2, ''], ['b', ''], ['c', '', 3, 4, '', '']):
+                w.writeln(row, insertMode=True)
+            w.setLineNumber(3)
+            w.writeln(['d', '', 5, 6, '=1', ''], insertMode=True)
+            w.closeSheet()
+            values.append([[c.value for c in row] for row in w.currentSheet.iter_rows()])
+        self.assertEqual(values[0], values[1])
+
+class Test_partialsave(TestWriterMethods):
+    def edit(self, partialSave, bold=False):
+        """ the members of a workbook whose shared strings are referenced from 3 sheets, before and after inserting
+        a row into the second one, and the rows of its sheets once edited"""
+        import zipfile
+        w = XlsxWriter(multiSheetOutput=True, engine='stream', sharedStrings=True)
+        w.setOutputDir(outdir)
+        w.open('partial')
+        gen_tables(w, 3)
+        w.close()
+        filename = outdir + 'partial.xlsx'
+        with zipfile.ZipFile(filename) as archive:
+            source = {name: archive.read(name) for name in archive.namelist()}
+        w = XlsxWriter(editMode=True, multiSheetOutput=True, partialSave=partialSave)
+        w.setOutputDir(outdir)
+        w.open(filename)
+        w.openSheet(BASETABLENAME + '2', TABLE)
+        w.setLineNumber(2)
+        w.writeln(['Line 0', 'bar', 7, 0.5, ''], insertMode=True)
+        if bold:
+            from openpyxl.styles import Font
+            w.currentSheet['A1'].font = Font(b=True)
+        w.closeSheet()
+        w.close()
+        with zipfile.ZipFile(filename) as archive:
+            members = {name: archive.read(name) for name in archive.namelist()}
+        wb = load_workbook(filename)
+        return source, members, {ws.title: [list(row) for row in ws.values] for ws in wb}
+
+    def test_members(self):
+        _, _, expected = self.edit(False)
+        source, members, sheets = self.edit(True)
+        self.assertEqual(expected, sheets)
+        self.assertEqual([None] * 5, sheets[BASETABLENAME + '2'][1]) # inserted, its cells being locked
+        self.assertEqual(len(TEST_DATA), len(sheets[BASETABLENAME + '1']))
+        self.assertEqual(list(source), list(members))
+        for name in members:
+            if name != 'xl/worksheets/sheet2.xml':
+                self.assertEqual(source[name], members[name], name)
+        self.assertNotEqual(source['xl/worksheets/sheet2.xml'], members['xl/worksheets/sheet2.xml'])
+
+    def test_new_styles(self):
+        _, _, expected = self.edit(False, bold=True)
+        with self.assertLogs(level='INFO') as logs:
+            source, members, sheets = self.edit(True, bold=True)
+        self.assertIn('new styles', logs.output[0])
+        self.assertEqual(expected, sheets)
+        self.assertNotEqual(source['xl/styles.xml'], members['xl/styles.xml'])
+
+    def styled(self, filename, renumbered=False):
+        """ save a workbook built by openpyxl, whose two sheets have custom number formats and styles. If renumbered,
+        its dates are first given the default format, left unused in the file: openpyxl renumbers the custom formats
+        when loading it, which makes partial saves fall back to whole ones"""
+        from openpyxl import Workbook
+        from openpyxl.styles import Alignment, Border, Font, PatternFill, Protection, Side
+        wb = Workbook()
+        for ws, title in zip((wb.active, wb.create_sheet()), ('prices', 'totals')):
+            ws.title = title
+            ws.append(['Label', 'Date', 'Price', 'Share'])
+            if renumbered:
+                ws.append(['first', datetime(2020, 1, 1)])
+            for col, value, format in zip(range(1, 5), ('first', datetime(2020, 1, 1), 2.5, 0.25),
+                                          ('@', 'dd/mm/yyyy hh:mm', '#,##0.000 "EUR"', '0.0%')):
+                cell = ws.cell(row=2, column=col)
+                cell.number_format = format
+                cell.font = Font(name='Courier New', i=True, color='FFFF0000')
+                cell.fill = PatternFill('solid', fgColor='FFFFFF00')
+                cell.border = Border(bottom=Side(style='thick'))
+                cell.alignment = Alignment(horizontal='right')
+                cell.protection = Protection(locked=False) # written by XlsxWriter in edit mode
+                cell.value = value
+        wb.save(filename)
+
+    def test_styles(self):
+        import zipfile
+        filename = outdir + 'styled.xlsx'
+        for renumbered in (False, True):
+            self.styled(filename, renumbered)
+            with zipfile.ZipFile(filename) as archive:
+                styles = archive.read('xl/styles.xml')
+            w = XlsxWriter(editMode=True, multiSheetOutput=True, partialSave=True)
+            w.setOutputDir(outdir)
+            w.open(filename)
+            w.openSheet('prices', TABLE)
+            w.setLineNumber(2)
+            w.writeln(['second', datetime(2021, 2, 3), 3.75, 0.5])
+            w.closeSheet()
+            w.close()
+            with zipfile.ZipFile(filename) as archive:
+                self.assertEqual(not renumbered, styles == archive.read('xl/styles.xml')) # patched or saved whole
+            wb = load_workbook(filename)
+            self.assertEqual(['second', datetime(2021, 2, 3), 3.75, 0.5], [c.value for c in wb['prices'][2]])
+            for title in ('prices', 'totals'):
+                cells = wb[title][2]
+                self.assertEqual(['@', 'dd/mm/yyyy hh:mm', '#,##0.000 "EUR"', '0.0%'], [c.number_format for c in cells])
+                for c in cells:
+                    self.assertEqual(('Courier New', True, 'FFFF0000'), (c.font.name, c.font.i, c.font.color.rgb))
+                    self.assertEqual(('solid', 'FFFFFF00'), (c.fill.fill_type, c.fill.fgColor.rgb))
+                    self.assertEqual(('thick', 'right'), (c.border.bottom.style, c.alignment.horizontal))
+
+    def test_unsupported_openpyxl(self):
+        from unittest import mock
+        from ioformats import xlsxpatch
+        filename = outdir + 'styled.xlsx'
+        self.styled(filename)
+        w = XlsxWriter(editMode=True, multiSheetOutput=True, partialSave=True)
+        w.setOutputDir(outdir)
+        w.open(filename)
+        w.openSheet('prices', TABLE)
+        w.setLineNumber(2)
+        w.writeln(['second'])
+        w.closeSheet()
+        with mock.patch.object(xlsxpatch, 'WorksheetWriter', None), self.assertLogs(level='INFO') as logs:
+            w.close()
+        self.assertIn('openpyxl', logs.output[0])
+        wb = load_workbook(filename)
+        self.assertEqual('second', wb['prices']['A2'].value)
+        self.assertEqual('0.0%', wb['totals']['D2'].number_format)
+
+class Test_xlsxreader(TestWriterMethods):
+    DATA = [[None if v == '' else v for v in row] for row in TEST_DATA] # blank cells are read as None
+
+    def write(self):
+        w = XlsxWriter(multiSheetOutput=True)
+        w.setOutputDir(outdir)
+        w.open('read')
+        gen_tables(w, 2)
+        w.close()
+        return outdir + 'read.xlsx'
+
+    def test_modes(self):
+        from ioformats.xlsx import DictReader
+        filename = self.write()
+        for read_only in (False, True):
+            r = DictReader(filename, read_only=read_only, sheet_name=BASETABLENAME + '2')
+            self.assertEqual([dict(zip(TEST_DATA[0], row)) for row in self.DATA[1:]], list(r))
+            r.close()
+
+    def test_projection(self):
+        from ioformats.xlsx import DictReader
+        filename = self.write()
+        for read_only in (False, True):
+            r = DictReader(filename, read_only=read_only, usecols=['Float', 0, 'Int'], rows='namedtuple')
+            rows = list(r)
+            self.assertEqual(['Float', 'Test Table', 'Int'], r.fieldnames)
+            self.assertEqual([(row[3], row[0], row[2]) for row in self.DATA[1:]], [tuple(row) for row in rows])
+            self.assertEqual([3.14, -0.14, 0], [row.Float for row in rows])
+            r.close()
+            r = DictReader(filename, read_only=read_only, usecols=['String'])
+            self.assertEqual([{'String': row[1]} for row in self.DATA[1:]], list(r))
+            r.close()
+            r = DictReader(filename, read_only=read_only, fieldnames=['a', 'b', 'c', 'd', 'e', 'f'],
+                           rows='tuple', restval='?')
+            self.assertEqual([tuple(row) + ('?',) for row in self.DATA], list(r))
+            r.close()
+
+
+    def test_batches(self):
+        from ioformats.xlsx import DictReader
+        w = XlsxWriter(multiSheetOutput=True)
+        w.setOutputDir(outdir)
+        w.open('batches')
+        w.openSheet('batches', TABLE)
+        w.writerows([['i', 'f', 'd', 's']] + [[i, i / 2, datetime(2020, 1, i + 1), 'v' + str(i)] for i in range(5)]
+                    + [[5, 1, datetime(2020, 1, 6), 'v5']])
+        w.closeSheet()
+        w.close()
+        filename = outdir + 'batches.xlsx'
+        for read_only in (False, True):
+            r = DictReader(filename, read_only=read_only)
+            batches = list(r.read_batches(4))
+            self.assertEqual([[0, 1, 2, 3], [4, 5]], [b['i'] for b in batches])
+            self.assertEqual(['v4', 'v5'], batches[1]['s'])
+            r.close()
+            # sheet rows are as wide as the widest one: only given fieldnames make them short or long
+            r = DictReader(filename, read_only=read_only, fieldnames=['i', 'f'], restkey='rest')
+            self.assertEqual([['d', 's'], [datetime(2020, 1, 1), 'v0']], next(r.read_batches(2))['rest'])
+            r.close()
+            r = DictReader(filename, read_only=read_only, fieldnames=['i', 'f', 'd', 's'], restkey='rest')
+            r.reader = iter([(0, 0.5), (1, 1.0, 'd', 's', 'x'), (2, 1.0, 'd', 's')]) # rows of several widths
+            batch = next(r.read_batches(3))
+            self.assertEqual([[], ['x'], []], batch['rest']) # one per row
+            self.assertEqual([None, 'd', 'd'], batch['d'])
+            r.close()
+        if columnar.getNumpy() is not None:
+            r = DictReader(filename, read_only=True, usecols=['i', 'f', 'd', 's'])
+            batches = list(r.read_batches(4, arrays=True))
+            self.assertEqual(['int64', 'float64', 'datetime64[us]', '<U2'], [str(batches[0][k].dtype) for k in 'ifds'])
+            self.assertEqual([2.0, 1.0], batches[1]['f'].tolist()) # ints and floats
+            r.close()
+            r = DictReader(filename, read_only=True, fieldnames=['i', 'f', 'd', 's', 'n'], restval=0)
+            batch = next(r.read_batches(10, arrays=True))
+            self.assertEqual((object, 'int64'), (batch['i'].dtype, batch['n'].dtype)) # the title line, then padding
+            r.close()
+
+
+    def test_parallel(self):
+        from ioformats.xlsx import DictReader, SheetsReader
+        w = XlsxWriter(multiSheetOutput=True)
+        w.setOutputDir(outdir)
+        w.open('sheets')
+        gen_tables(w, 3)
+        gen_sheet(w, TABLE, 'large', data=TEST_DATA[:1] + TEST_DATA[1:] * 1000)
+        w.close()
+        filename = outdir + 'sheets.xlsx'
+        expected = {}
+        for name in load_workbook(filename, read_only=True).sheetnames:
+            r = DictReader(filename, sheet_name=name, normalize_fieldnames=True)
+            expected[name] = list(r)
+            r.close()
+        with SheetsReader(filename, processes=2, batch_size=100, normalize_fieldnames=True) as sheets:
+            self.assertEqual(list(expected), list(sheets))
+            for name in reversed(list(expected)): # any order
+                self.assertEqual(expected[name], list(sheets[name]))
+            self.assertEqual(['Test_Table', 'String', 'Int', 'Float', 'Date'], sheets['test_tablelarge'].fieldnames)
+        with SheetsReader(filename, ['test_tablelarge', 'missing'], batches=True, batch_size=1000, usecols=['Int']) as sheets:
+            self.assertEqual([1000, 1000, 1000], [len(b['Int']) for b in sheets['test_tablelarge']])
+            with self.assertRaises(KeyError):
+                list(sheets['missing'])
+        with SheetsReader(filename, [BASETABLENAME + '1'], rows='namedtuple') as sheets:
+            self.assertEqual([42, 666666666666, -1], [row.Int for row in sheets[BASETABLENAME + '1']])
+
+    def test_stopped_worker(self):
+        import queue
+        from concurrent.futures import CancelledError, Future
+        from unittest import mock
+        from ioformats import xlsx
+        def iterator(messages, result=None, error=None, cancelled=False):
+            future = Future()
+            if cancelled:
+                future.cancel()
+            elif error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+            q = queue.Queue()
+            for message in messages:
+                q.put(message)
+            return xlsx.SheetIterator('sheet', q, future)
+        with mock.patch.object(xlsx, 'POLL_SECONDS', 0.01):
+            self.assertEqual([['a', 1]], list(iterator([('fieldnames', ['A', 'B']), ('data', [['a', 1]]), ('end', None)])))
+            with self.assertRaises(CancelledError):
+                iterator([], cancelled=True).fieldnames
+            with self.assertRaises(MemoryError):
+                list(iterator([('fieldnames', ['A'])], error=MemoryError()))
+            with self.assertRaises(RuntimeError):
+                list(iterator([('fieldnames', ['A']), ('data', [['a']])]))
+
+
 class Test_docx(TestWriterMethods):
     def test_single_sheet_writer(self):
         w = DocxWriter()
@@ -213,6 +660,844 @@ class Test_tex(TestWriterMethods):
                 line += 1
 
 
+def gen_bulk_table(writer: AbstractWriter, label: str, bulk: bool, chunk_size=2):
+    writer.openSheet(BASETABLENAME+label, TABLE, True)
+    writer.writeTitle(TEST_DATA[0])
+    if bulk:
+        writer.writerows(iter(TEST_DATA[1:]), chunk_size)
+    else:
+        for row in TEST_DATA[1:]:
+            writer.writeln(row)
+    lines = writer.getCurrentLine()
+    writer.closeSheet()
+    return lines
+
+
+class Test_writerows(TestWriterMethods):
+    def check_same_output(self, factory, extension):
+        lines = []
+        for label, bulk in (('loop', False), ('bulk', True)):
+            w = factory()
+            w.setOutputDir(outdir)
+            w.open('writerows')
+            lines.append(gen_bulk_table(w, label, bulk))
+            w.close()
+        self.assertEqual(lines[0], lines[1])
+        return [outdir + 'writerows-' + BASETABLENAME + label + extension for label in ('loop', 'bulk')]
+
+    def check_same_text(self, factory, extension):
+        loop, bulk = self.check_same_output(factory, extension)
+        with open(loop, encoding='utf-8') as f1, open(bulk, encoding='utf-8') as f2:
+            self.assertEqual(f1.read().replace('loop', 'bulk'), f2.read())
+
+    def test_txt(self):
+        self.check_same_text(TextWriter, '.txt')
+
+    def test_csv(self):
+        from ioformats.csvwriter import CSVwriter
+        self.check_same_text(CSVwriter, '.csv')
+
+    def test_tex(self):
+        self.check_same_text(TeXWriter, '.tex')
+
+    def test_xlsx(self):
+        loop, bulk = self.check_same_output(XlsxWriter, '.xlsx')
+        self.assertEqual(list(load_workbook(loop).active.values), list(load_workbook(bulk).active.values))
+
+    def test_docx(self):
+        import docx
+        loop, bulk = self.check_same_output(DocxWriter, '.docx')
+        cells = [[c.text for c in docx.Document(f).tables[0]._cells] for f in (loop, bulk)]
+        self.assertEqual(cells[0], cells[1])
+
+    def test_docx_wide_rows(self):
+        for bulk in (False, True):
+            w = DocxWriter()
+            w.setOutputDir(outdir)
+            w.open('wide-' + str(bulk))
+            w.openSheet(BASETABLENAME + '1', TABLE)
+            w.writeTitle(TEST_DATA[0])
+            with self.assertRaises(IndexError):
+                if bulk:
+                    w.writerows([TEST_DATA[1], TEST_DATA[2] + ['extra']])
+                else:
+                    w.writeln(TEST_DATA[2] + ['extra'])
+
+
+class FailingWriter(AbstractWriter):
+    def __init__(self):
+        super().__init__(False)
+
+    def writeln(self, iterable, **kwargs):
+        raise ValueError('cannot write '+str(iterable))
+
+
+class Test_multi(TestWriterMethods):
+    def run_multi(self, w):
+        w.setOutputDir(outdir)
+        w.open('multi')
+        w.openSheet(BASETABLENAME+'1', TABLE)
+        w.writeTitle(iter(TEST_DATA[0]))
+        w.writeln(iter(TEST_DATA[1]))
+        w.writerows(iter(TEST_DATA[2:]), 1)
+        w.closeSheet()
+        w.close()
+
+    def test_fan_out(self):
+        from ioformats.csvwriter import CSVwriter
+        w = MultiWriter(False, TextWriter(), XlsxWriter(), queueSize=1)
+        w.add(CSVwriter())
+        self.run_multi(w)
+        Test_txt.check_table(self, outdir + 'multi-' + BASETABLENAME + '1.txt')
+        Test_CSV.check_table(self, outdir + 'multi-' + BASETABLENAME + '1.csv')
+        Test_xlsx.check_table(self, outdir + 'multi-' + BASETABLENAME + '1.xlsx', BASETABLENAME + '1')
+
+    def test_columns(self):
+        w = MultiWriter(False, TextWriter(), XlsxWriter(multiSheetOutput=True))
+        w.setOutputDir(outdir)
+        w.open('multi-columns')
+        w.openSheet('columns', TABLE)
+        w.writecolumns({'name': ['a', 'b'], 'value': [1.25, 2.5]}, formats={'value': '%.1f'})
+        w.closeSheet()
+        w.close()
+        with open(outdir + 'multi-columns-columns.txt', encoding='utf-8') as f:
+            self.assertIn('1.2', f.read())
+        rows = list(load_workbook(outdir + 'multi-columns.xlsx')['columns'].values)
+        self.assertEqual([('name', 'value'), ('a', 1.25), ('b', 2.5)], rows) # typed, not formatted
+
+    def test_errors(self):
+        from ioformats.writers import MultiWriterError
+        failing = FailingWriter()
+        w = MultiWriter(False, failing, TextWriter())
+        with self.assertRaises(MultiWriterError) as cm:
+            self.run_multi(w)
+        self.assertEqual(1, len(cm.exception.errors))
+        self.assertIs(failing, cm.exception.errors[0][0])
+
+    def test_open_twice(self):
+        w = MultiWriter(False, TextWriter())
+        w.setOutputDir(outdir)
+        w.open('multi')
+        channels = list(w._channels)
+        with self.assertRaises(ValueError):
+            w.open('multi-again')
+        self.assertEqual(channels, w._channels)
+        w.close()
+        self.assertFalse(any(c.thread.is_alive() for c in channels))
+        self.run_multi(w) # open again once closed
+        Test_txt.check_table(self, outdir + 'multi-' + BASETABLENAME + '1.txt')
+        Test_txt.check_table(self, outdir + 'multi-' + BASETABLENAME + '1.txt')
+
+
+class Test_registry(unittest.TestCase):
+    def test_lazy_import(self):
+        import subprocess, sys
+        code = "import sys, ioformats; ioformats.availableWriters['txt']; ioformats.availableWriters['csv']; " \
+               "ioformats.availableWriters['tex']; print('openpyxl' in sys.modules, 'docx' in sys.modules, 'numpy' in sys.modules)"
+        out = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.dirname(__file__)),
+                             check=True, capture_output=True, text=True).stdout
+        self.assertEqual('False False False', out.strip())
+
+    def test_lookup(self):
+        from ioformats.csvwriter import CSVwriter
+        self.assertIsInstance(availableWriters['csv'], CSVwriter)
+        self.assertIs(availableWriters['csv'], availableWriters['csv'])
+        self.assertTrue(availableWriters['xlsx-edit'].editMode)
+        self.assertEqual([BIBLIOGRAPHY], list(availableWriters['bbl'].getSupportedTypes()))
+        self.assertIn('docx-multisheets', availableWriters)
+        with self.assertRaises(KeyError):
+            availableWriters['no-such-writer']
+
+    def test_entry_points(self):
+        from collections import namedtuple
+        from ioformats.registry import WriterRegistry
+        EntryPoint = namedtuple('EntryPoint', 'name value')
+        registry = WriterRegistry(None)
+        registry.register('txt', 'ioformats.text:TextWriter')
+        registry._registerEntryPoints([EntryPoint('plugin', 'ioformats.csvwriter:CSVwriter'),
+                                       EntryPoint('txt', 'ioformats.tex:TeXWriter')])
+        self.assertEqual(['txt', 'plugin'], list(registry))
+        self.assertIsInstance(registry['txt'], TextWriter)
+        self.assertEqual('.csv', registry['plugin'].extension)
+
+
+class Test_concurrency(TestWriterMethods):
+    THREADS = 16
+    JOBS = 4 # per thread
+
+    def render(self, w, label):
+        w.setOutputDir(outdir)
+        w.open(label)
+        gen_sheet(w, TABLE, '1')
+        w.close()
+
+    def stress(self, job):
+        from concurrent.futures import ThreadPoolExecutor
+        names = ('txt', 'csv', 'tex', 'xlsx')
+        labels = ['stress%s-%d' % (n, i) for n in names for i in range(self.THREADS * self.JOBS // len(names))]
+        with ThreadPoolExecutor(self.THREADS) as pool:
+            list(pool.map(lambda label: job(label[6:label.index('-')], label), labels))
+        checks = {'txt': Test_txt, 'csv': Test_CSV, 'tex': Test_tex, 'xlsx': Test_xlsx}
+        for label in labels:
+            name = label[6:label.index('-')]
+            checks[name].check_table(self, outdir + label + '-' + BASETABLENAME + '1.' + name, BASETABLENAME + '1')
+
+    def test_factory(self):
+        from ioformats.writers import getWriter
+        self.assertIsNot(getWriter('txt'), getWriter('txt'))
+        self.assertTrue(getWriter('txt', multiSheetOutput=True).multiSheetOutput)
+        self.stress(lambda name, label: self.render(getWriter(name), label))
+
+    def test_pool(self):
+        from ioformats.registry import WriterPool
+        pool = WriterPool()
+        def job(name, label):
+            with pool.writer(name) as w:
+                self.render(w, label)
+        self.stress(job)
+        with pool.writer('xlsx', editMode=True) as w:
+            self.assertTrue(w.editMode)
+        with pool.writer('xlsx') as w2:
+            self.assertIs(w, w2)
+            self.assertFalse(w2.editMode)
+
+
+    def test_wide_stream(self):
+        from concurrent.futures import ThreadPoolExecutor
+        width = 1000 # cell references of wide rows must not depend on the other threads
+        row = list(range(width))
+        def job(i):
+            w = XlsxWriter(multiSheetOutput=True, engine='stream')
+            w.setOutputDir(outdir)
+            w.open('wide-%d' % i)
+            w.openSheet('wide', TABLE)
+            w.writerows([row] * 3)
+            w.closeSheet()
+            w.close()
+        with ThreadPoolExecutor(self.THREADS) as pool:
+            list(pool.map(job, range(self.THREADS)))
+        for i in range(self.THREADS):
+            ws = load_workbook(outdir + 'wide-%d.xlsx' % i)['wide']
+            self.assertEqual([tuple(row)] * 3, list(ws.values))
+
+
+class Test_async(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        os.makedirs(outdir, exist_ok=True)
+
+    async def render(self, w, label):
+        async def rows():
+            for row in TEST_DATA[2:]:
+                yield row
+        w.setOutputDir(outdir)
+        async with w:
+            await w.open(label)
+            await w.openSheet(BASETABLENAME + '1', TABLE)
+            await w.writeTitle(TEST_DATA[0])
+            await w.writeln(TEST_DATA[1])
+            await w.writerows(rows(), 1)
+            await w.closeSheet()
+
+    async def test_concurrent_documents(self):
+        import asyncio
+        from ioformats.asyncwriter import AsyncWriter
+        names = ('txt', 'csv', 'tex', 'xlsx') * 3
+        labels = ['async%s-%d' % (n, i) for i, n in enumerate(names)]
+        await asyncio.gather(*(self.render(AsyncWriter(n), label) for n, label in zip(names, labels)))
+        checks = {'txt': Test_txt, 'csv': Test_CSV, 'tex': Test_tex, 'xlsx': Test_xlsx}
+        for name, label in zip(names, labels):
+            checks[name].check_table(self, outdir + label + '-' + BASETABLENAME + '1.' + name, BASETABLENAME + '1')
+
+
+class Test_stats(TestWriterMethods):
+    def test_text_stats(self):
+        events = []
+        w = TextWriter()
+        stats = w.enableStats(lambda *event: events.append(event))
+        run_writer(w, 'stats')
+        self.assertEqual(6, stats.calls['writeTitle'])
+        self.assertEqual(31, stats.calls['writeln'])
+        self.assertEqual(len(TEST_DATA) - 1, stats.rows[BASETABLENAME + '1'])
+        self.assertEqual(len(TEST_DATA) - 1, stats.rows[BASETABLENAME + '2'])
+        self.assertEqual({'open', 'write', 'closeSheet', 'save', 'close'}, set(stats.seconds))
+        filename = outdir + 'stats-' + BASETABLENAME + '1.txt'
+        self.assertEqual(os.path.getsize(filename), stats.bytes[filename])
+        self.assertIn(('rows', BASETABLENAME + '2', len(TEST_DATA) - 1), events)
+        self.assertIn(('bytes', filename, stats.bytes[filename]), events)
+        self.assertIs(stats, w.disableStats())
+        self.assertNotIn('writeln', vars(w))
+
+    def test_xlsx_stats(self):
+        w = XlsxWriter()
+        stats = w.enableStats()
+        w.setOutputDir(outdir)
+        w.open('stats')
+        gen_bulk_table(w, '1', True)
+        w.close()
+        self.assertEqual({'writeTitle': 1, 'writerows': 1}, dict(stats.calls))
+        self.assertEqual(len(TEST_DATA) - 1, stats.getTotalRows())
+        self.assertGreater(stats.bytes[outdir + 'stats-' + BASETABLENAME + '1.xlsx'], 0)
+
+    def test_columns_stats(self):
+        from ioformats.inmemory import StringWriter
+        from ioformats.writers import MultiWriter
+        columns = {title: [row[i] for row in TEST_DATA[1:]] for i, title in enumerate(TEST_DATA[0])}
+        for factory in (TextWriter, XlsxWriter, StringWriter, lambda: MultiWriter(StringWriter(), TextWriter())):
+            w = factory()
+            stats = w.enableStats()
+            w.setOutputDir(outdir)
+            w.open('stats-columns')
+            w.openSheet(BASETABLENAME + '1', TABLE)
+            w.writecolumns(columns, chunk_size=2)
+            w.writeln(TEST_DATA[1])
+            w.closeSheet()
+            w.close()
+            self.assertEqual(len(TEST_DATA), stats.rows[BASETABLENAME + '1'])
+            self.assertEqual(1, stats.calls['writecolumns'])
+
+
+class Test_columns(TestWriterMethods):
+    def columns(self, data):
+        return {title: [row[i] for row in data[1:]] for i, title in enumerate(data[0])}
+
+    def write(self, factory, label, data, columns=None, **kwargs):
+        w = factory()
+        w.setOutputDir(outdir)
+        w.open('columns')
+        w.openSheet(BASETABLENAME + label, TABLE)
+        if columns is None:
+            w.writeTitle(data[0])
+            for row in data[1:]:
+                w.writeln(row)
+        else:
+            w.writecolumns(columns, chunk_size=2, **kwargs)
+        w.closeSheet()
+        w.close()
+        return outdir + 'columns-' + BASETABLENAME + label
+
+    def check_text(self, factory, extension, data, columns, **kwargs):
+        with open(self.write(factory, 'rows', data) + extension, encoding='utf-8') as f:
+            expected = f.read().replace('rows', 'cols')
+        with open(self.write(factory, 'cols', data, columns, **kwargs) + extension, encoding='utf-8') as f:
+            self.assertEqual(expected, f.read())
+
+    def test_lists(self):
+        from ioformats.csvwriter import CSVwriter
+        for factory, extension in ((TextWriter, '.txt'), (CSVwriter, '.csv'), (TeXWriter, '.tex')):
+            self.check_text(factory, extension, TEST_DATA, self.columns(TEST_DATA))
+        Test_tex.check_table(self, self.write(TeXWriter, 'cols', TEST_DATA, self.columns(TEST_DATA)) + '.tex')
+        Test_xlsx.check_table(self, self.write(XlsxWriter, 'cols', TEST_DATA, self.columns(TEST_DATA)) + '.xlsx', BASETABLENAME + 'cols')
+
+    def test_formats(self):
+        data = [['Float', 'Date'], [3.14159, datetime(2020, 1, 2)], [2, datetime(2021, 3, 4)]]
+        expected = [['Float', 'Date'], ['3.14', '02/01/2020'], ['2.00', '04/03/2021']]
+        self.check_text(TextWriter, '.txt', expected, self.columns(data), formats={'Float': '%.2f', 'Date': '%d/%m/%Y'})
+
+    def test_errors(self):
+        w = TextWriter()
+        w.setOutputDir(outdir)
+        w.open('columns')
+        w.openSheet('errors', TEXT)
+        with self.assertRaises(ValueError):
+            w.writecolumns({'a': [1]})
+        w.closeSheet()
+        w.openSheet('errors', TABLE)
+        with self.assertRaises(ValueError):
+            w.writecolumns({'a': [1], 'b': [1, 2]})
+        w.closeSheet()
+        w.close()
+
+    @unittest.skipIf(columnar.getNumpy() is None, 'requires numpy')
+    def test_arrays(self):
+        import numpy
+        from ioformats.csvwriter import CSVwriter
+        arrays = {
+            'Test Table': numpy.array(['Line 1', 'Line 2', 'Line 3']),
+            'String': numpy.array(['foo', '%èé&à_$', '']),
+            'Int': numpy.array([42, 666666666666, -1]),
+            'Float': numpy.array([3.14, -0.14, 0.0]),
+            'Date': numpy.array(['2020-01-01T10:00', '2020-01-01', '2021-12-31'], dtype='datetime64[s]'),
+            'Day': numpy.array(['2020-01-01', '2020-01-02', '2021-12-31'], dtype='datetime64[D]'),
+            'Bool': numpy.array([True, False, True]),
+        }
+        data = [list(arrays)] + [list(row) for row in zip(* (columnar.toList(a) for a in arrays.values()))]
+        for factory, extension in ((TextWriter, '.txt'), (CSVwriter, '.csv'), (TeXWriter, '.tex')):
+            self.check_text(factory, extension, data, arrays)
+        filename = self.write(XlsxWriter, 'cols', data, arrays) + '.xlsx'
+        self.assertEqual(data[1][:5], list(list(load_workbook(filename).active.values)[1][:5]))
+
+    def test_without_numpy(self):
+        numpy, columnar.numpy = columnar.numpy, None
+        try:
+            self.check_text(TeXWriter, '.tex', TEST_DATA, self.columns(TEST_DATA))
+        finally:
+            columnar.numpy = numpy
+
+
+class Test_convert(TestWriterMethods):
+    def setUp(self):
+        super().setUp()
+        w = XlsxWriter(multiSheetOutput=True)
+        w.setOutputDir(outdir)
+        w.open('source')
+        gen_tables(w, 1)
+        w.close()
+
+    def test_xlsx_to_text(self):
+        from ioformats.convert import convert
+        source = outdir + 'source.xlsx'
+        self.assertEqual(len(TEST_DATA), convert(source, target_writer='csv', target='converted', outputDir=outdir, chunk_size=2))
+        Test_CSV.check_table(self, outdir + 'converted-source.csv')
+        convert(source, target_writer='tex', target='converted', sheetName='table', outputDir=outdir, sheet_name=BASETABLENAME + '1')
+        Test_tex.check_table(self, outdir + 'converted-table.tex')
+
+    def test_text_to_xlsx(self):
+        from ioformats.convert import convert, main
+        convert(outdir + 'source.xlsx', target_writer='tex', target='converted', sheetName='table', outputDir=outdir)
+        main([outdir + 'converted-table.tex', 'xlsx-multisheets', '-o', outdir, '-t', 'back', '-s', BASETABLENAME + '1'])
+        Test_xlsx.check_table(self, outdir + 'back.xlsx', BASETABLENAME + '1')
+
+
+class Test_sinks(TestWriterMethods):
+    def test_buffers(self):
+        import io
+        from ioformats.sinks import BufferSink
+        w = availableWriters.create('csv', sink=BufferSink())
+        w.setOutputDir(outdir)
+        w.open('buffered')
+        gen_tables(w, 2)
+        w.close()
+        self.assertEqual({os.path.normpath(outdir + 'buffered-' + BASETABLENAME + str(i) + '.csv') for i in (1, 2)}, set(w.sink.buffers))
+        rows = list(csv.reader(io.StringIO(w.sink.getvalue(outdir + 'buffered-' + BASETABLENAME + '1.csv').decode('utf-8')), delimiter=';'))
+        self.assertEqual([[str(e) for e in row] for row in TEST_DATA], rows)
+        self.assertFalse(os.path.exists(outdir + 'buffered-' + BASETABLENAME + '1.csv'))
+        w = availableWriters.create('xlsx-multisheets', sink=BufferSink())
+        w.setOutputDir(outdir)
+        w.open('buffered')
+        gen_tables(w, 1)
+        w.close()
+        Test_xlsx.check_table(self, io.BytesIO(w.sink.getvalue()), BASETABLENAME + '1')
+
+    def test_factory(self):
+        import io
+        streams = {}
+        def factory(filename):
+            stream = streams[os.path.basename(filename)] = io.BytesIO()
+            stream.close = lambda: None # keep it readable
+            return stream
+        w = TeXWriter()
+        w.setSink(factory)
+        w.setOutputDir(outdir)
+        w.open('factory')
+        gen_tables(w, 2)
+        w.close()
+        self.assertEqual(2, len(streams))
+        self.assertIn(r'\hline', streams['factory-' + BASETABLENAME + '2.tex'].getvalue().decode('utf-8'))
+
+    def test_compressed(self):
+        import gzip, io, lzma
+        from ioformats.sinks import FileSink, StreamSink
+        w = availableWriters.create('csv')
+        w.setSink(FileSink('gzip'))
+        stats = w.enableStats()
+        w.setOutputDir(outdir)
+        w.open('compressed')
+        gen_tables(w, 1)
+        w.close()
+        filename = outdir + 'compressed-' + BASETABLENAME + '1.csv'
+        with gzip.open(filename + '.gz') as f:
+            self.assertTrue(f.read().decode('utf-8').startswith('Test Table;String'))
+        self.assertEqual(os.path.getsize(filename + '.gz'), stats.bytes[os.path.normpath(filename)])
+        stream = io.BytesIO()
+        w = availableWriters.create('xlsx', sink=StreamSink(stream, 'lzma')) # not seekable: spooled
+        w.setOutputDir(outdir)
+        w.open('stream')
+        gen_tables(w, 1)
+        w.close()
+        Test_xlsx.check_table(self, io.BytesIO(lzma.decompress(stream.getvalue())), BASETABLENAME + '1')
+
+    def test_pipe(self):
+        import threading
+        from ioformats.sinks import StreamSink
+        read, write = os.pipe()
+        chunks = []
+        reader = threading.Thread(target=lambda: chunks.extend(iter(lambda: os.read(read, 4096), b'')))
+        reader.start()
+        w = availableWriters.create('txt-multisheets', sink=StreamSink(write))
+        w.setOutputDir(outdir)
+        w.open('pipe')
+        gen_tables(w, 2)
+        w.close()
+        os.close(write)
+        reader.join()
+        os.close(read)
+        self.assertEqual(2 * len(TEST_DATA), b''.join(chunks).decode('utf-8').count('\n'))
+
+
+class Test_incremental(TestWriterMethods):
+    def render(self, name, data=TEST_DATA):
+        w = availableWriters.create(name)
+        w.setIncremental()
+        w.setOutputDir(outdir)
+        w.open('incremental')
+        if TEXT in w.getSupportedTypes():
+            gen_text(w)
+        gen_sheet(w, TABLE, '1', data=data)
+        gen_sheet(w, TABLE, '2')
+        w.close()
+        return w
+
+    def check_unchanged(self, name, *suffixes):
+        from ioformats.sinks import MANIFEST
+        filenames = [outdir + 'incremental' + suffix for suffix in suffixes]
+        self.render(name)
+        for filename in filenames:
+            os.utime(filename, (1e9, 1e9))
+        w = self.render(name)
+        self.assertEqual({os.path.normpath(f) for f in filenames}, {os.path.normpath(f) for f in w.sink.skipped})
+        self.assertTrue(all(os.path.getmtime(f) == 1e9 for f in filenames))
+        self.assertTrue(os.path.isfile(outdir + MANIFEST))
+        changed = [row[:1] + ['changed'] + row[2:] for row in TEST_DATA]
+        self.render(name, changed)
+        return [os.path.getmtime(f) == 1e9 for f in filenames]
+
+    def test_text(self):
+        self.assertEqual([False, True], self.check_unchanged('csv', '-' + BASETABLENAME + '1.csv', '-' + BASETABLENAME + '2.csv'))
+        self.assertEqual([False], self.check_unchanged('latex-article', '.tex'))
+
+    def test_zip(self):
+        self.assertEqual([False, True], self.check_unchanged('xlsx', '-' + BASETABLENAME + '1.xlsx', '-' + BASETABLENAME + '2.xlsx'))
+        self.assertEqual([False], self.check_unchanged('docx-multisheets', '.docx'))
+
+    def test_sinks(self):
+        from ioformats.sinks import BufferSink, FileSink, IncrementalSink
+        w = availableWriters.create('csv')
+        w.setSink(FileSink('gzip'))
+        w.setIncremental()
+        self.assertIsInstance(w.sink, IncrementalSink)
+        self.assertEqual('gzip', w.sink.compression)
+        w.setIncremental(False)
+        self.assertIs(FileSink, type(w.sink))
+        sink = BufferSink()
+        w.setSink(sink)
+        with self.assertRaises(ValueError):
+            w.setIncremental()
+        w.setIncremental(False)
+        self.assertIs(sink, w.sink)
+
+
+class Test_inmemory(unittest.TestCase):
+    def test_table(self):
+        from array import array
+        w = availableWriters.create('string')
+        w.open('memory')
+        gen_sheet(w, TABLE, '1')
+        gen_sheet(w, TABLE, '2', bulk=True)
+        for name in (BASETABLENAME + '1', BASETABLENAME + '2'):
+            self.assertEqual([tuple(row) for row in TEST_DATA[1:]], list(w.rows(name)))
+            self.assertEqual(TEST_DATA[0], w.sheets[name].header)
+            self.assertEqual(array('q', [42, 666666666666, -1]), w.columns(name)[2])
+            self.assertEqual([3.14, -0.14, 0], w.columns(name)[3])
+            self.assertEqual(''.join(' '.join(str(v) for v in row) + '\n' for row in TEST_DATA), w.to_string(name))
+
+    def test_mixed(self):
+        w = availableWriters.create('string', sep=';')
+        w.open('memory')
+        w.openSheet('mixed', TABLE)
+        w.writerows([[1, 1.5], [2, 2.5]])
+        w.writeln([3, 'three', 'extra'])
+        w.append(2 ** 70)
+        w.startNewLine()
+        w.writerows([[5, 5.5, '']])
+        w.closeSheet()
+        self.assertEqual([(1, 1.5, ''), (2, 2.5, ''), (3, 'three', 'extra'), (2 ** 70, '', ''), (5, 5.5, '')], list(w.rows()))
+        self.assertEqual('1;1.5;\n2;2.5;\n3;three;extra\n' + str(2 ** 70) + ';;\n5;5.5;\n', w.to_string())
+
+    def test_columns(self):
+        w = availableWriters.create('string')
+        w.open('memory')
+        w.openSheet('columns', TABLE)
+        ints = [1, 2, 3]
+        if columnar.getNumpy() is not None:
+            ints = columnar.getNumpy().array(ints, dtype='int32')
+        w.writecolumns({'i': ints, 'f': [0.5, 1.5, 2.5], 's': ['a', 'b', 'a']}, formats={'f': '%.2f'})
+        self.assertEqual([('i', 'f', 's')], [tuple(w.sheets['columns'].header)])
+        self.assertEqual([(1, '0.50', 'a'), (2, '1.50', 'b'), (3, '2.50', 'a')], list(w.rows()))
+        self.assertIs(w.columns()[2][0], w.columns()[2][2]) # interned
+
+    def test_text(self):
+        w = availableWriters.create('num-string')
+        w.open('memory')
+        gen_publist(w, True)
+        lines = list(w.rows())
+        self.assertEqual(len(PUBLIST), len(lines))
+        self.assertEqual(['[0] J20', '[1] DD20'], [line.split(' ')[0] + ' ' + line.split(' ')[1] for line in lines])
+        self.assertEqual('\n'.join(lines) + '\n', w.to_string())
+
+
+class Test_rotation(TestWriterMethods):
+    def render(self, name, bulk, data=TEST_DATA, **limits):
+        w = availableWriters.create(name)
+        w.setRotation(**limits)
+        w.setOutputDir(outdir)
+        w.open('rotated')
+        gen_sheet(w, TABLE, '1', data=data, bulk=bulk)
+        w.close()
+        return w
+
+    def test_csv(self):
+        import json
+        for bulk in (False, True):
+            w = self.render('csv', bulk, maxRows=3)
+            name = 'rotated-' + BASETABLENAME + '1'
+            self.assertEqual({BASETABLENAME + '1': [name + '.csv', name + '-part0002.csv']}, w.parts)
+            for filename, rows in ((name + '.csv', TEST_DATA[:3]), (name + '-part0002.csv', TEST_DATA[:1] + TEST_DATA[3:])):
+                with open(outdir + filename, newline='', encoding='utf-8') as f:
+                    self.assertEqual([row[0] for row in rows], [row[0] for row in csv.reader(f, delimiter=';')])
+            with open(outdir + 'rotated-parts.json', encoding='utf-8') as f:
+                self.assertEqual(w.parts, json.load(f))
+
+    def test_bytes(self):
+        from ioformats.fixtures import SyntheticTable
+        data = SyntheticTable(1000)
+        for bulk in (False, True):
+            w = self.render('txt', bulk, data, maxBytes=5000)
+            files = [outdir + f for f in w.parts[BASETABLENAME + '1']]
+            self.assertGreater(len(files), 5)
+            lines = []
+            for filename in files:
+                self.assertLess(os.path.getsize(filename), 5000 + 200)
+                with open(filename, encoding='utf-8') as f:
+                    part = f.read().splitlines()
+                self.assertEqual(' '.join(data[0]), part[0])
+                lines += part[1:]
+            self.assertEqual(['Line ' + str(i) for i in range(1, 1001)], [l.split(' ')[0] + ' ' + l.split(' ')[1] for l in lines])
+
+    def test_append(self):
+        w = availableWriters.create('txt')
+        w.setRotation(maxRows=3)
+        w.setOutputDir(outdir)
+        w.open('appended')
+        w.openSheet(BASETABLENAME + '1', TABLE)
+        w.writeTitle(TEST_DATA[0])
+        for row in TEST_DATA[1:]:
+            for i, value in enumerate(row):
+                w.append((' ' if i else '') + str(value))
+            w.startNewLine()
+        w.closeSheet()
+        w.close()
+        files = [outdir + f for f in w.parts[BASETABLENAME + '1']]
+        self.assertEqual(2, len(files))
+        parts = []
+        for filename in files:
+            with open(filename, encoding='utf-8') as f:
+                parts.append(f.read().splitlines())
+        self.assertEqual([3, 2], [len(part) for part in parts])
+        self.assertEqual(parts[0][0], parts[1][0])
+
+    def test_xlsx(self):
+        for bulk in (False, True):
+            w = self.render('xlsx-multisheets', bulk, maxRows=2)
+            self.assertEqual([BASETABLENAME + '1', BASETABLENAME + '1 (2)', BASETABLENAME + '1 (3)'], w.parts[BASETABLENAME + '1'])
+            wb = load_workbook(outdir + 'rotated.xlsx')
+            rows = [list(row) for title in w.parts[BASETABLENAME + '1'] for row in wb[title].values]
+            self.assertEqual([TEST_DATA[0], TEST_DATA[1], TEST_DATA[0], TEST_DATA[2], TEST_DATA[0], TEST_DATA[3]],
+                             [[v if v is not None else '' for v in row] for row in rows])
+        self.assertEqual(1048576, availableWriters.create('xlsx').rowCap)
+
+    def test_xlsx_cap(self):
+        for bulk in (False, True):
+            w = availableWriters.create('xlsx-multisheets')
+            w.setRotation()
+            self.assertFalse(w.isRotating())
+            w.rowCap = 2
+            w.setOutputDir(outdir)
+            w.open('capped')
+            gen_sheet(w, TABLE, '1', bulk=bulk)
+            w.close()
+            self.assertEqual([BASETABLENAME + '1', BASETABLENAME + '1 (2)', BASETABLENAME + '1 (3)'], w.parts[BASETABLENAME + '1'])
+            wb = load_workbook(outdir + 'capped.xlsx')
+            rows = [list(row) for title in w.parts[BASETABLENAME + '1'] for row in wb[title].values]
+            self.assertEqual([TEST_DATA[0], TEST_DATA[1], TEST_DATA[0], TEST_DATA[2], TEST_DATA[0], TEST_DATA[3]],
+                             [[v if v is not None else '' for v in row] for row in rows])
+
+    def test_xlsx_per_sheet(self):
+        w = self.render('xlsx', True, maxRows=2)
+        name = 'rotated-' + BASETABLENAME + '1'
+        self.assertFalse(os.path.exists(outdir + name + '-part0003.xlsx'))
+        wb = load_workbook(outdir + name + '.xlsx')
+        self.assertEqual(w.parts[BASETABLENAME + '1'], wb.sheetnames)
+        rows = [list(row) for title in wb.sheetnames for row in wb[title].values]
+        self.assertEqual([TEST_DATA[0], TEST_DATA[1], TEST_DATA[0], TEST_DATA[2], TEST_DATA[0], TEST_DATA[3]],
+                         [[v if v is not None else '' for v in row] for row in rows])
+
+    def test_unsupported(self):
+        with self.assertRaises(ValueError):
+            self.render('tex', False, maxRows=2)
+        with self.assertRaises(ValueError):
+            self.render('xlsx', False, maxBytes=1000)
+
+
+class Test_parallel(TestWriterMethods):
+    def jobs(self):
+        import functools, itertools
+        from ioformats.fixtures import SyntheticTable
+        from ioformats.parallel import SheetJob
+        return [
+            SheetJob(BASETABLENAME + '1', TEST_DATA[1:], title=TEST_DATA[0], numbered=True),
+            SheetJob(BASETABLENAME + '2', functools.partial(itertools.islice, SyntheticTable(50), 1, None),
+                     title=TEST_DATA[0], numbered=True),
+            SheetJob(BASETABLENAME + '3', TEST_DATA[1:], title=TEST_DATA[0], numbered=True, resetCount=False),
+            SheetJob('broken', 42),
+            SheetJob(BASETABLENAME + '4', TEST_DATA[1:], title=TEST_DATA[0]),
+        ]
+
+    def test_chains(self):
+        from ioformats.parallel import getChains
+        self.assertEqual([[0], [1, 2], [3], [4]], [[i for i, _ in c] for c in getChains(self.jobs())])
+
+    def test_render(self):
+        from ioformats.parallel import renderSheets
+        results = renderSheets('xlsx', 'parallel', self.jobs(), outdir, 2)
+        self.assertEqual([BASETABLENAME + '1', BASETABLENAME + '2', BASETABLENAME + '3', 'broken', BASETABLENAME + '4'],
+                         [r.name for r in results])
+        self.assertEqual([4, 51, 55, -1, -1], [r.lines for r in results])
+        self.assertIsInstance(results[3].error, TypeError)
+        for i in (0, 2, 4):
+            self.assertIsNone(results[i].error)
+            Test_xlsx.check_table(self, results[i].filename, results[i].name)
+
+    def test_not_per_sheet(self):
+        from ioformats.parallel import renderSheets
+        with self.assertRaises(ValueError):
+            renderSheets('xlsx-multisheets', 'parallel', self.jobs(), outdir)
+
+
+class Test_recorder(TestWriterMethods):
+    def record(self, w, tablesOnly=False):
+        w.setOutputDir(outdir)
+        w.open('recorded')
+        gen_tables(w, 2, bulk=True)
+        if not tablesOnly:
+            gen_text(w)
+            gen_publist(w, True)
+        w.close()
+        return w
+
+    def test_replay(self):
+        from ioformats.recorder import RecordingWriter, replay
+        log = outdir + 'recorded.log'
+        self.record(RecordingWriter(log))
+        expected = self.record(availableWriters.create('num-string'))
+        for source in (log, open(log, 'rb').read()):
+            w = replay(source, 'num-string')
+            self.assertEqual(list(expected.sheets), list(w.sheets))
+            for name in expected.sheets:
+                self.assertEqual(expected.to_string(name), w.to_string(name))
+
+    def test_bulk(self):
+        from ioformats.recorder import RecordingWriter, replay
+        w = RecordingWriter()
+        w.open('recorded')
+        gen_tables(w, 2, bulk=True)
+        w.openSheet('columns', TABLE)
+        w.writecolumns({'a': [1, 2], 'b': [3, 4]})
+        w.closeSheet()
+        w.close()
+        target = availableWriters.create('num-string')
+        chunks = []
+        writeChunk = target._writeChunk
+        def recordChunk(chunk, **kwargs):
+            chunks.append(len(chunk))
+            writeChunk(chunk, **kwargs)
+        target._writeChunk = recordChunk
+        replay(w.getLog(), target)
+        self.assertEqual([3, 3], chunks) # rows of each table at once, columns written as such
+        self.assertEqual([(1, 3), (2, 4)], list(target.rows('columns')))
+
+    def test_kwargs(self):
+        from ioformats.recorder import RecordingWriter, readLog, replay, ROWS
+        w = self.record(RecordingWriter())
+        calls = list(readLog(w.getLog()))
+        self.assertEqual(('open', ('recorded',), {}), calls[0])
+        self.assertIn((ROWS, (['Bold text'],), {'bold': True}), calls)
+        self.assertEqual(['J20', 'DD20'], [pub.getHalId() for pub in calls[-3][1][0]]) # rendered by each writer
+        self.assertEqual(('close', (), {}), calls[-1])
+        txt = availableWriters.create('txt')
+        txt.setOutputDir(outdir)
+        replay(w.getLog(), txt, 'replayed')
+        direct = availableWriters.create('txt')
+        self.record(direct)
+        for name in ('-'+BASETABLENAME+'1.txt', '-test_'+TEXT+'.txt', '-publications.txt'):
+            with open(outdir+'replayed'+name, encoding='utf-8') as f, open(outdir+'recorded'+name, encoding='utf-8') as g:
+                self.assertEqual(g.read(), f.read())
+
+    def test_parallel(self):
+        from ioformats.recorder import RecordingWriter, replayAll
+        log = outdir + 'recorded.log'
+        self.record(RecordingWriter(log), True)
+        self.assertEqual([None, None], replayAll(log, ['xlsx', 'csv'], outdir, 'parallel-replay'))
+        Test_xlsx.check_table(self, outdir + 'parallel-replay-' + BASETABLENAME + '1.xlsx', BASETABLENAME + '1')
+        with open(outdir + 'parallel-replay-' + BASETABLENAME + '2.csv', newline='', encoding='utf-8') as f:
+            self.assertEqual([row[0] for row in TEST_DATA], [row[0] for row in csv.reader(f, delimiter=';')])
+
+
+class Test_emitter(TestWriterMethods):
+    def test_emitter(self):
+        import io
+        from ioformats.text import Emitter
+        stream = io.BytesIO()
+        e = Emitter(stream, bufferSize=4, newline='\r\n')
+        e.write('abc', 'dé')
+        self.assertEqual(b'', stream.getvalue())
+        e.write(42, '\n')
+        self.assertEqual('abcdé42\r\n'.encode('utf-8'), stream.getvalue())
+        e.write('x')
+        self.assertIs(stream, e.detach())
+        self.assertEqual('abcdé42\r\nx'.encode('utf-8'), stream.getvalue())
+
+    def test_buffer_size(self):
+        for size in (1, 10, 1 << 16):
+            w = TextWriter()
+            w.bufferSize = size
+            run_writer(w, 'txt')
+            self.check_table(outdir + 'txt-' + BASETABLENAME + '1.txt')
+
+    check_table = Test_txt.check_table
+
+    def test_emitter_benchmark(self):
+        import json
+        from ioformats.benchmarks import main
+        output = outdir + 'bench.json'
+        main(['emitter', '--output', output] + BENCHMARK_SIZES)
+        with open(output, encoding='utf-8') as f:
+            results = json.load(f)['results']['emitter']
+        self.assertEqual(6, len(results))
+
+
+class Test_benchmarks(TestWriterMethods):
+    def test_csv_benchmark(self):
+        import json
+        from ioformats.benchmarks import main
+        output = outdir + 'bench.json'
+        main(['csv', '--output', output] + BENCHMARK_SIZES)
+        with open(output, encoding='utf-8') as f:
+            results = json.load(f)['results']['csv']
+        self.assertEqual([None, 'text', 'text', 'csv', 'csv'], [r['writer'] for r in results])
+
+    def test_writers_benchmark(self):
+        import json
+        from ioformats.benchmarks import main
+        output = outdir + 'bench.json'
+        main(['writers', '--writers', 'csv', 'bbl', 'xlsx-edit', '--output', output] + BENCHMARK_SIZES)
+        with open(output, encoding='utf-8') as f:
+            results = json.load(f)['results']['writers']
+        self.assertEqual(12, len(results))
+        for r in results:
+            self.assertGreater(r['output_bytes'], 0)
+            self.assertGreater(r['peak_memory_bytes'], 0)
+
+
 #        self.assertEqual('foo'.upper(), 'FOO')
 
     # def test_isupper(self):
@@ -1,9 +1,10 @@
 import itertools
-from collections import Iterable
+from typing import Iterable
 from datetime import datetime
 import re
 
-from ioformats import availableWriters,TEXT,TABLE,BIBLIOGRAPHY,LIST
+from ioformats import TEXT,TABLE,BIBLIOGRAPHY,LIST
+from ioformats.columnar import formatColumn
 from ioformats.filerw import normalize
 from ioformats.text import TextWriter
 from ioformats.writers import SkipWriter
@@ -18,6 +19,9 @@ class TeXWriter(TextWriter):
     def quote(self,s):
         return str(s).translate(specialTeXchars)
 
+    def supportsRotation(self):
+        return 'TeX documents cannot be split into parts'
+
     def open(self, filename):
         super().open(filename)
         if self.multiSheetOutput:
@@ -55,6 +59,16 @@ class TeXWriter(TextWriter):
     def writeln(self, iterable, **kwargs):
         self.subwriter.writeln(iterable, **kwargs)
 
+    def _writeChunk(self, chunk, **kwargs):
+        self.subwriter._writeChunk(chunk, **kwargs)
+
+    def formatColumn(self, column, format=None):
+        """ the values of column as strings, with TeX special characters escaped as quote() does"""
+        return formatColumn(column, format, specialTeXchars)
+
+    def _writeFormattedChunk(self, chunk, **kwargs):
+        self.subwriter._writeFormattedChunk(chunk, **kwargs)
+
 ARTICLE_TITLE_LEVELS = ['title','section','subsection','subsubsection','paragraph']
 class PlainTextSubwriter():
     def __init__(self, parent=None):
@@ -94,6 +108,10 @@ class PlainTextSubwriter():
         self.append(iterable, ** kwargs)
         self.startNewLine()
 
+    def _writeChunk(self, chunk, **kwargs):
+        for row in chunk:
+            self.writeln(row, **kwargs)
+
     def getExtension(self):
         return '.tex'
 
@@ -132,6 +150,17 @@ class TeXTableSubwriter():
         self.parent.writeEncode(iterable, ** kwargs)
         self.parent.writeRaw(r'\\\hline')
 
+    def _writeChunk(self, chunk, **kwargs):
+        """ same output as writeln on each row, but written at once"""
+        self.col = 0
+        encode = self.parent.encode
+        self.parent.writeRaw(''.join(['\n' + encode(row) + r'\\\hline' for row in chunk]))
+
+    def _writeFormattedChunk(self, chunk, **kwargs):
+        self.col = 0
+        sep = self.parent.sep
+        self.parent.writeRaw(''.join(['\n' + sep.join(row) + r'\\\hline' for row in chunk]))
+
     def closeSheet(self):
         self.startNewLine()
         self.parent.writeRaw(r"\end{tabular}")
@@ -218,9 +247,6 @@ class ListSubwriter(PlainTextSubwriter):
         self.parent.writeRaw(r'\item ')
         super().writeln(iterable,**kwargs)
 
-availableWriters['tex'] = TeXWriter()
-availableWriters['latex-article'] = TeXWriter(multiSheetOutput=True)
-availableWriters['bbl'] = TeXWriter(True,'.',False,False,BIBLIOGRAPHY)
 subwriters = {TEXT:PlainTextSubwriter,TABLE:TeXTableSubwriter,LIST:ListSubwriter,BIBLIOGRAPHY:BblSubwriter}
 
 
@@ -248,17 +274,21 @@ class TeXTableReader():
 
 
 
+_FLOAT = re.compile(r"[-0-9]+\.[0-9]+\Z")
+_INT = re.compile(r"[-0-9]+\Z")
+_ISODATE = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2}\Z")
+_DATE = re.compile(r"[0-9]{2}/[0-9]{2}/([0-9]{2}|[0-9]{4})\Z")
+_BOOL = re.compile(r"(true|false)\Z")
+
 def guess_type(s):
-    if re.match("\A[-0-9]+\.[0-9]+\Z", s):
+    if _FLOAT.match(s):
         return float(s)
-    elif re.match("\A[-0-9]+\Z", s):
+    elif _INT.match(s):
         return int(s)
     # 2019-01-01 or 01/01/2019 or 01/01/19
-    elif re.match("\A[0-9]{4}-[0-9]{2}-[0-9]{2}\Z", s.split(' ')[0]) or \
-            re.match("\A[0-9]{2}/[0-9]{2}/([0-9]{2}|[0-9]{4})\Z", s):
+    elif _ISODATE.match(s.split(' ')[0]) or _DATE.match(s):
         return datetime.fromisoformat(s)
-    elif re.match("\A(true|false)\Z", s):
+    elif _BOOL.match(s):
         return bool(s)
     else:
         return s
-
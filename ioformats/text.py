@@ -1,14 +1,78 @@
-from os import close
+import os
 from typing import Iterable
 
+from ioformats.columnar import formatColumn
 from ioformats.filerw import FileWriter
-from ioformats import availableWriters, TEXT, TABLE, BIBLIOGRAPHY, LIST
+from ioformats import TEXT, TABLE, BIBLIOGRAPHY, LIST
+
+BUFFER_SIZE = 1 << 16 # characters buffered by an Emitter before they are encoded and written
+
+
+class Emitter():
+    """ a buffered writer of text into a binary stream: fragments are collected in a list, then joined and
+    encoded once per chunk of at least bufferSize characters. Like text files, newlines are written as
+    newline, which defaults to os.linesep."""
+    def __init__(self, stream, encoding='utf-8', bufferSize=BUFFER_SIZE, newline=None):
+        self.stream = stream
+        self.encoding = encoding
+        self.bufferSize = bufferSize
+        self.newline = os.linesep if newline is None else newline
+        self.fragments = []
+        self.written = 0 # bytes written into stream
+        self._limit = max(1, min(256, bufferSize)) # number of fragments at which their size is checked
+
+    def write(self, *fragments):
+        """ write fragments, converted with str() when they are not strings, as print() would"""
+        buffer = self.fragments
+        buffer += fragments
+        if len(buffer) >= self._limit:
+            self._check()
+
+    def _check(self):
+        """ flush if the buffer is full, otherwise estimate from the average length of fragments how many
+        more are needed to fill it"""
+        buffer = self.fragments
+        try:
+            size = sum(map(len, buffer))
+        except TypeError:
+            buffer[:] = [f if isinstance(f, str) else str(f) for f in buffer]
+            size = sum(map(len, buffer))
+        if size >= self.bufferSize:
+            self.flush()
+        else:
+            self._limit = len(buffer) + max(16, (self.bufferSize - size) * len(buffer) // max(1, size))
+
+    def flush(self):
+        """ encode and write buffered fragments, without flushing the stream itself"""
+        if self.fragments:
+            try:
+                text = ''.join(self.fragments)
+            except TypeError:
+                text = ''.join(map(str, self.fragments))
+            if self.newline != '\n':
+                text = text.replace('\n', self.newline)
+            self.written += self.stream.write(text.encode(self.encoding))
+            self.fragments = []
+            self._limit = max(1, min(256, self.bufferSize))
+
+    def tell(self):
+        """ bytes written so far, buffered characters counting as one byte each"""
+        return self.written + sum(map(len, map(str, self.fragments)))
+
+    def detach(self):
+        """ flush and return the stream, which is left open"""
+        self.flush()
+        self.stream.flush()
+        return self.stream
 
 
 class TextWriter(FileWriter):
     def __init__(self, numbered=False, outputDir='.', multiSheetOutput=False, editMode=False, extension='.txt', *supported: str):
         super().__init__(numbered, outputDir, multiSheetOutput, editMode, extension, * supported)
         self.sep = ' '
+        self.emitter = Emitter # called with a binary stream to get an object with write(*fragments) and detach()
+        self.bufferSize = BUFFER_SIZE
+        self._lineOpen = False # whether append began a line which startNewLine has not ended yet
 
     def quote(self, s):
         return str(s)
@@ -17,42 +81,103 @@ class TextWriter(FileWriter):
         """ join an iterable of any type to produce a String."""
         return self.sep.join(self.quote(x) for x in iterable)
 
+    def _openText(self, filename):
+        return self.emitter(self.openStream(filename), 'utf-8', self.bufferSize)
+
     def _getopendoc(self):
         if self.multiSheetOutput:
-            return open(self.getFilename(), 'w', encoding='utf-8')
+            return self._openText(self.getFilename())
         return None
 
     def openSheet(self, sheetname, sheetType=TEXT, *args, **kwargs):
         super().openSheet(sheetname, sheetType)
         if not self.multiSheetOutput:
-            self.doc = open(self.getSheetFilename(), 'w', encoding='utf-8')
+            self.doc = self._openText(self.getSheetFilename())
 
     def _savedoc(self, filename):
-        self.doc.close()
+        self.closeStream(self.doc.detach()) # the sink, not the emitter, closes the stream
+
+    def supportsRotation(self):
+        if self.multiSheetOutput:
+            return 'only files of single sheets can be rotated, not those of several sheets'
+        return None
+
+    def getPartSize(self):
+        return self.doc.tell()
+
+    def _closePart(self):
+        self._savedoc(self.getSheetFilename())
+
+    def _openPart(self):
+        self.doc = self._openText(self.getSheetFilename())
+
+    def _writeHeader(self, title):
+        self.writeRaw(self.encode(title), end='\n')
 
     def writeRaw(self, *args: str, end='', **kwargs):
-        print(*(arg for arg in args), file=self.doc, sep='', end=end)
+        if end:
+            self.doc.write(*args, end)
+        else:
+            self.doc.write(*args)
 
-    def writeEncode(self, arg: Iterable, **kwargs): #arg: Union[str,iterable]
+    def encode(self, arg: Iterable): #arg: Union[str,iterable]
+        """ quote a string, or join an iterable of any type, to produce a String."""
         if isinstance(arg,str):
-            self.writeRaw(self.quote(arg), **kwargs)
-        else:
-            self.writeRaw(self.join(arg), **kwargs)
+            return self.quote(arg)
+        return self.join(arg)
+
+    def writeEncode(self, arg: Iterable, **kwargs): #arg: Union[str,iterable]
+        self.writeRaw(self.encode(arg), **kwargs)
 
     def writeTitle(self, arg, **kwargs):
+        if self.isRotating():
+            self._setTitle(arg)
+            self._room()
         self.writeEncode(arg, **kwargs)
         super().writeTitle(arg, **kwargs)
 
     def startNewLine(self):
-        self.writeRaw('\n')
+        if self.isRotating():
+            if not self._lineOpen: # an empty line
+                self._room()
+            self.writeRaw('\n')
+            self._consume(1)
+        else:
+            self.writeRaw('\n')
+        self._lineOpen = False
 
     def append(self, element, **kwargs):
+        if not self._lineOpen:
+            if self.isRotating():
+                self._room()
+            self._lineOpen = True
         self.writeEncode(element, **kwargs)
 
     def writeln(self, iterable, **kwargs):
+        if self.isRotating():
+            self._room()
         self.writeEncode(iterable, **kwargs)
         super().writeln(iterable, **kwargs)
 
+    def _writeChunk(self, chunk, **kwargs):
+        """ encode the whole chunk into a single string written at once"""
+        encode = self.encode
+        self._writeLines([encode(row) for row in chunk])
+
+    def _writeLines(self, lines):
+        if self.isRotating():
+            self._writeRotated(self._emitLines, lines)
+        else:
+            self._emitLines(lines)
+
+    def _emitLines(self, lines):
+        if lines:
+            self.writeRaw('\n'.join(lines), end='\n')
+
+    def formatColumn(self, column, format=None):
+        """ the values of column as strings, quoted as quote() would"""
+        return formatColumn(column, format)
 
-availableWriters['txt'] = TextWriter()
-availableWriters['txt-multisheets'] = TextWriter(multiSheetOutput=True)
+    def _writeFormattedChunk(self, chunk, **kwargs):
+        sep = self.sep
+        self._writeLines([sep.join(row) for row in chunk])
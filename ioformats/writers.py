@@ -1,8 +1,26 @@
+import itertools
 import logging
+import queue
+import threading
+from collections.abc import Iterator
 
 from ioformats import availableWriters,TEXT,TABLE,BIBLIOGRAPHY,LIST
+from ioformats.columnar import formatColumn, isArray, toList
+from ioformats.stats import WriterStats, instrument, uninstrument
 
 ALLTYPES=(TEXT,TABLE,LIST,BIBLIOGRAPHY)
+CHUNK_SIZE=1000 # default number of rows handed at once to the bulk path of writers
+QUEUE_SIZE=100 # default number of pending calls per subwriter in a MultiWriter
+
+
+def chunked(iterable, size=CHUNK_SIZE):
+    """ yield successive lists of at most size elements taken from iterable"""
+    it = iter(iterable)
+    chunk = list(itertools.islice(it, size))
+    while chunk:
+        yield chunk
+        chunk = list(itertools.islice(it, size))
+
 
 class AbstractWriter():
     def __init__(self, numbered: bool, * supported: str):
@@ -14,6 +32,7 @@ class AbstractWriter():
         self.multiSheetOutput = True
         self.numberPrefix = '['
         self.numberSuffix = '] '
+        self.stats = None # WriterStats, when instrumented
         if len(supported) == 0:
             supported = ALLTYPES
         self.setLineNumber(0 if numbered else -1, * supported) #-1 stands for no line count for this type
@@ -27,8 +46,8 @@ class AbstractWriter():
                 self.currentline[t] = value
 
     def resetLineNumber(self, * types):
-        if types is None:
-            types = self.currentline.key()
+        if len(types) == 0: # reset all types
+            types = list(self.currentline.keys())
         for t in types:
             self.currentline[t] = 0 if self.currentline[t] >= 0 else -1 # reset to either 0 if counted, or -1 if
             # not numbered
@@ -51,6 +70,20 @@ class AbstractWriter():
     def setOutputDir(self,outdir):
         pass
 
+    def enableStats(self, * hooks):
+        """ instrument this writer, returning the WriterStats it feeds. hooks are called as hook(event, name, value)"""
+        if self.stats is None:
+            self.stats = instrument(self, WriterStats())
+        for hook in hooks:
+            self.stats.addHook(hook)
+        return self.stats
+
+    def disableStats(self):
+        """ remove instrumentation, returning the stats gathered so far"""
+        result, self.stats = self.stats, None
+        uninstrument(self)
+        return result
+
     def open(self, target: str):
         self.target = target
         self.resetLineNumber()
@@ -68,10 +101,10 @@ class AbstractWriter():
         if not numbered:
             self.currentline[self.sheetType] = -1
 
-    def _incLineCount(self):
-        '''increment line count only if enabled i.e. > -1'''
+    def _incLineCount(self, n=1):
+        '''increment line count by n only if enabled i.e. > -1'''
         if self.currentline[self.sheetType] > -1:
-            self.currentline[self.sheetType] += 1
+            self.currentline[self.sheetType] += n
         
     def writeTitle(self,element,** kwargs): # always=false,level=1,insertMode=False,style=None
         self.startNewLine()
@@ -82,6 +115,46 @@ class AbstractWriter():
     def writeln(self,element,** kwargs): 
         self.startNewLine()
 
+    def writerows(self, rows, chunk_size=CHUNK_SIZE, **kwargs):
+        """ write each row of rows as writeln would, handing them chunk_size at a time to _writeChunk"""
+        for chunk in chunked(rows, chunk_size):
+            self._writeChunk(chunk, **kwargs)
+
+    def _writeChunk(self, chunk, **kwargs):
+        """ write a list of rows. To be overridden by writers having a faster bulk path"""
+        for row in chunk:
+            self.writeln(row, **kwargs)
+
+    def writecolumns(self, columns, header=True, formats=None, chunk_size=CHUNK_SIZE, **kwargs):
+        """ write onto a TABLE sheet columns, a dict of equal-length columns (lists or NumPy arrays).
+        header is either True to write the keys of columns as a title line, an iterable of titles, or None.
+        formats maps column keys onto printf-like formats (e.g. '%.2f') or strftime ones for dates,
+        used by writers producing text. Each column is formatted at once, then rows go through the bulk path."""
+        if self.sheetType != TABLE:
+            raise ValueError('writecolumns is only meant for '+TABLE+' sheets, not '+str(self.sheetType))
+        names = list(columns)
+        lengths = set(len(columns[n]) for n in names)
+        if len(lengths) > 1:
+            raise ValueError('columns of different lengths: '+str(sorted(lengths)))
+        if header is True:
+            header = names
+        if header:
+            self.writeTitle(header)
+        formats = formats or {}
+        cells = [self.formatColumn(columns[n], formats.get(n)) for n in names]
+        for chunk in chunked(zip(* cells), chunk_size):
+            self._writeFormattedChunk(chunk, **kwargs)
+
+    def formatColumn(self, column, format=None):
+        """ return the cells of a column, as expected by _writeFormattedChunk"""
+        if format is None:
+            return toList(column)
+        return formatColumn(column, format)
+
+    def _writeFormattedChunk(self, chunk, **kwargs):
+        """ write a list of rows whose cells come from formatColumn"""
+        self._writeChunk(chunk, **kwargs)
+
     def startNewLine(self): 
         self._incLineCount()
     
@@ -113,6 +186,15 @@ class SkipWriter(AbstractWriter):
     def writeln(self,iterable,** kwargs):
         pass
 
+    def writerows(self, rows, chunk_size=CHUNK_SIZE, **kwargs):
+        pass
+
+    def _writeChunk(self, chunk, **kwargs):
+        pass
+
+    def writecolumns(self, columns, **kwargs):
+        pass
+
 
 class ConsoleWriter(AbstractWriter):
     def __init__(self, numbered=False): 
@@ -136,58 +218,143 @@ class ConsoleWriter(AbstractWriter):
         self._incLineCount()
         print(self.getLinePrefix()+'\t'.join(str(x) for x in iterable))
 
-availableWriters['console'] = ConsoleWriter()
  
 
+class MultiWriterError(Exception):
+    """ raised by MultiWriter.close() when some of its subwriters failed"""
+    def __init__(self, errors):
+        super().__init__('; '.join(type(w).__name__+': '+repr(e) for w,e in errors))
+        self.errors = errors # list of (subwriter, exception)
+
+
+def _materialize(element):
+    """ freeze one-shot iterators and mutable rows, so that every subwriter sees the same values"""
+    if isinstance(element, (list, Iterator)):
+        return tuple(element)
+    return element
+
+
+class _Channel():
+    """ a bounded queue of calls, forwarded to a subwriter by a dedicated thread"""
+    def __init__(self, writer, size):
+        self.writer = writer
+        self.error = None
+        self.queue = queue.Queue(size)
+        self.thread = threading.Thread(target=self._run, name='MultiWriter-'+type(writer).__name__, daemon=True)
+        self.thread.start()
+
+    def put(self, method, *args, **kwargs):
+        self.queue.put((method, args, kwargs))
+
+    def _run(self):
+        while True:
+            call = self.queue.get()
+            if call is None:
+                return
+            if self.error is None: # after a failure, keep draining the queue so that the producer never blocks
+                method, args, kwargs = call
+                try:
+                    getattr(self.writer, method)(*args, **kwargs)
+                except Exception as e:
+                    logging.error('MultiWriter: '+type(self.writer).__name__+'.'+method+' failed: '+repr(e))
+                    self.error = e
+
+    def join(self):
+        self.queue.put(None)
+        self.thread.join()
+
+
 class MultiWriter(AbstractWriter):
-    """ multiplex several other writers"""
-    def __init__(self, numbered=False, * subwriterNames):
+    """ multiplex several other writers. Each subwriter is fed through its own bounded queue
+    by its own thread, so that a slow subwriter does not hold up the others"""
+    def __init__(self, numbered=False, * subwriters, queueSize=QUEUE_SIZE):
         super().__init__(numbered)
-        self._subwriters = map(lambda key: availableWriters[key],subwriterNames)
+        self.queueSize = queueSize
+        self._subwriters = []
+        self._channels = []
+        self.add(* subwriters)
 
     def add(self, * subwriters):
-        self._subwriters.extend(subwriters)
+        """ add subwriters, given either as writer instances or as keys in availableWriters"""
+        for s in subwriters:
+            w = availableWriters.create(s) if isinstance(s, str) else s
+            self._subwriters.append(w)
+            if self._channels: # already open
+                self._channels.append(_Channel(w, self.queueSize))
+
+    def _dispatch(self, method, *args, **kwargs):
+        for c in self._channels:
+            c.put(method, *args, **kwargs)
+
+    def setOutputDir(self, outdir):
+        for s in self._subwriters:
+            s.setOutputDir(outdir)
 
     def open(self, target):
+        """ open all subwriters, each fed by a new thread. Raise ValueError if already open, since its threads
+        would be left running without ever being joined: close it first"""
+        if self._channels:
+            raise ValueError('MultiWriter is already open: close it before opening '+str(target))
         super().open(target)
-        map(lambda s: s.open(target), self._subwriters)
+        self._channels = [_Channel(s, self.queueSize) for s in self._subwriters]
+        self._dispatch('open', target)
 
     def openSheet(self, *args, **kargs):
         super().openSheet(*args, **kargs)
-        map(lambda s: s.openSheet(*args, **kargs), self._subwriters)
+        self._dispatch('openSheet', *args, **kargs)
 
     def writeTitle(self, element, **kwargs):
-        super().writeTitle(element, **kwargs)
-        map(lambda s: s.writeTitle(element, **kwargs), self._subwriters)
+        self._incLineCount()
+        self._dispatch('writeTitle', _materialize(element), **kwargs)
 
-    def append(self, *element, **kwargs):
-        super().append(*element, **kwargs)
-        map(lambda s: s.append(*element, **kwargs), self._subwriters)
+    def append(self, element, **kwargs):
+        self._dispatch('append', _materialize(element), **kwargs)
 
     def startNewLine(self):
         super().startNewLine()
-        map(lambda s: s.startNewLine(), self._subwriters)
+        self._dispatch('startNewLine')
 
     def writeln(self,iterable,**kwargs):
-        cache = list(iterable) #to avoid recomputations
-        super().writeln(iterable, **kwargs)
-        map(lambda s: s.writeln(cache, **kwargs), self._subwriters)
-        
+        self._incLineCount()
+        self._dispatch('writeln', _materialize(iterable), **kwargs)
+
+    def _writeChunk(self, chunk, **kwargs):
+        self._incLineCount(len(chunk))
+        self._dispatch('_writeChunk', [_materialize(row) for row in chunk], **kwargs)
+
+    def writecolumns(self, columns, header=True, formats=None, chunk_size=CHUNK_SIZE, **kwargs):
+        """ as AbstractWriter.writecolumns, but raw columns and formats go to each subwriter, which formats them
+        as it does, e.g. xlsx ones keeping numbers and dates typed"""
+        if self.sheetType != TABLE:
+            raise ValueError('writecolumns is only meant for '+TABLE+' sheets, not '+str(self.sheetType))
+        lengths = set(len(c) for c in columns.values())
+        if len(lengths) > 1:
+            raise ValueError('columns of different lengths: '+str(sorted(lengths)))
+        columns = {n: c.copy() if isArray(c) else _materialize(c) for n, c in columns.items()}
+        self._incLineCount((1 if header else 0) + (lengths.pop() if lengths else 0))
+        self._dispatch('writecolumns', columns, _materialize(header), formats, chunk_size, **kwargs)
+
     def closeSheet(self):
-        map(lambda s: s.closeSheet(), self._subwriters)
+        self._dispatch('closeSheet')
         super().closeSheet()
-        
+
     def close(self):
-        map(lambda s: s.close(), self._subwriters)
+        """ close all subwriters, wait for them to finish and raise a MultiWriterError if any failed"""
+        self._dispatch('close')
+        for c in self._channels:
+            c.join()
+        errors = [(c.writer, c.error) for c in self._channels if c.error is not None]
+        self._channels = []
         super().close()
+        if errors:
+            raise MultiWriterError(errors)
  
 # availableWriters['multi'] = MultiWriter()
 
 
 def getWriter(key,**kwargs):
-    w = availableWriters[key]
-    for att,value in kwargs.item():
-        setattr(w, att, value)
-    return w
+    """ return a new writer registered as key, with attributes set from kwargs.
+    Each call returns a distinct writer, so that concurrent jobs never share their state"""
+    return availableWriters.create(key,**kwargs)
 
 
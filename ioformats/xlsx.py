@@ -1,31 +1,127 @@
 import logging
+import os
+from collections import namedtuple
+from itertools import islice
+from operator import itemgetter
 import unicodedata
 import sys
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from multiprocessing import Manager
+from queue import Empty
 from openpyxl import Workbook, load_workbook
 from openpyxl.formula.translate import Translator
+from ioformats import columnar
+from ioformats.columnar import toList
 from ioformats.filerw import FileWriter, normalize
-from ioformats import availableWriters,TABLE,BIBLIOGRAPHY
+from ioformats.xlsxpatch import WorkbookPatch, Unpatchable, getStyleCounts
+from ioformats.writers import CHUNK_SIZE, chunked
+from ioformats import TABLE,BIBLIOGRAPHY
+
+MAX_ROWS = 1048576 # rows of an Excel sheet
+MAX_TITLE = 31 # characters of the title of an Excel sheet
+
+ENGINES = ('openpyxl', 'stream')
 
 class XlsxWriter(FileWriter):
-    def __init__(self,numbered=False,outputDir='.',multiSheetOutput=False,editMode=False):
+    """ a writer of xlsx files. Unless editing files, the engine writing them is either openpyxl, or 'stream' for
+    the faster StreamWorkbook of xlsxstream, whose memory does not grow with the number of rows; with the latter,
+    strings are shared if sharedStrings, else written inline. When editing files with partialSave, only the sheets
+    opened are written again, the rest of the file being copied as it is, see xlsxpatch"""
+    def __init__(self,numbered=False,outputDir='.',multiSheetOutput=False,editMode=False,engine='openpyxl',sharedStrings=False,
+                 partialSave=False):
         super().__init__(numbered,outputDir,multiSheetOutput,editMode,'.xlsx',TABLE)
+        if engine not in ENGINES:
+            raise ValueError('Unknown xlsx engine '+str(engine)+'; available: '+', '.join(ENGINES))
+        if editMode and engine != 'openpyxl':
+            raise ValueError('xlsx files can only be edited with openpyxl, not '+engine)
+        self.engine = engine
+        self.sharedStrings = sharedStrings
         self.col = 1
+        self.rowCap = MAX_ROWS # larger sheets are continued into new sheets, as when rotating
+        self.templates = {} # column -> CellTemplate of the last cell inserted in this column
+        self.insertedLine = -1 # line of the last row inserted
+        self.inserting = [] # rows to be inserted from insertingLine on, see _writeln
+        self.insertingLine = -1
+        self.partialSave = partialSave
+        self.source = None # file the edited workbook was loaded from
+        self.styleCounts = None # see xlsxpatch.getStyleCounts
+        self.touched = [] # names of the sheets opened in edit mode
 
     def _getopendoc(self,name=None):
-        if name is None:
-            return Workbook(write_only=True) # return a fresh one
-        return load_workbook(name)
+        if name is None: # return a fresh one
+            if self.engine == 'stream':
+                from ioformats.xlsxstream import StreamWorkbook
+                return StreamWorkbook(self.sharedStrings)
+            return Workbook(write_only=True)
+        doc = load_workbook(name)
+        self.source = name
+        self.styleCounts = getStyleCounts(doc)
+        self.touched = []
+        return doc
     
     def _savedoc(self,filename):
-        self.doc.save(filename)
+        if self.inserting:
+            self._insertRows()
+        if self.editMode and self.partialSave and self._savePartially(filename):
+            return
+        self._saveStream(filename, self.doc.save)
+        if self.engine == 'stream':
+            self.doc.close() # remove the rows spooled to disk
+
+    def _savePartially(self, filename):
+        """ save the edited workbook by patching its source file, returning False if it cannot be"""
+        target = self.sink.getFilename(filename) if hasattr(self.sink, 'getFilename') else filename
+        overwriting = os.path.exists(target) and os.path.samefile(self.source, target)
+        try:
+            patch = WorkbookPatch(self.doc, self.source, self.touched, self.styleCounts, overwriting)
+        except Unpatchable as e:
+            logging.info('Saving the whole of '+filename+': '+str(e))
+            return False
+        try:
+            self._saveStream(filename, patch.save)
+        finally:
+            patch.close()
+        return True
 
     def openSheet(self,sheetname,sheetType=TABLE,*args,**kwargs):
+        if self.inserting:
+            self._insertRows()
         super().openSheet(sheetname,sheetType,*args,**kwargs)
         if self.editMode:
             self.currentSheet = self.doc[sheetname]
+            if sheetname not in self.touched:
+                self.touched.append(sheetname)
+            self.templates = {}
+            self.insertedLine = -1
         else:
             self.currentSheet = self.doc.create_sheet(sheetname)
 
+    def supportsRotation(self):
+        if self.maxBytes is not None:
+            return 'the size of xlsx sheets is unknown until they are saved: they can only be rotated by rows'
+        return None
+
+    def getSheetFilename(self):
+        """ as FileWriter.getSheetFilename, without suffix since the parts of a sheet are sheets of the same file"""
+        part, self.part = self.part, 1
+        try:
+            return super().getSheetFilename()
+        finally:
+            self.part = part
+
+    def getPartName(self):
+        """ the title of the sheet of the current part: sheetName, then 'sheetName (2)' and so on"""
+        if self.part == 1:
+            return self.sheetName
+        suffix = ' ('+str(self.part)+')'
+        return self.sheetName[:MAX_TITLE - len(suffix)] + suffix
+
+    def _openPart(self):
+        self.currentSheet = self.doc.create_sheet(self.getPartName())
+
+    def _writeHeader(self, title):
+        self.currentSheet.append(title)
+
     def startNewLine(self): 
         self._incLineCount()
         self.col = 1
@@ -33,35 +129,133 @@ class XlsxWriter(FileWriter):
     def writeTitle(self,iterable,always=False,**kwargs):
         """ write a title line. if 'always', does it even in editing mode"""
         if always or not self.editMode:
+            self._setTitle(iterable) # repeated in the next parts, if any
             self.writeln(iterable)
     
     def writeln(self,iterable,insertMode=False,** kwargs):
         if self.editMode:
             self._writeln(iterable, insertMode)
-        else:
+        elif self.isRotating() or self._partRows >= self.rowCap:
+            self._room()
+            self.currentSheet.append(iterable)
+            self._consume(1)
+        else: # rows are only counted, sheets being continued into new ones when full
             self.currentSheet.append(iterable)
+            self._partRows += 1
         self._incLineCount()
 
+    def _writeChunk(self,chunk,insertMode=False,** kwargs):
+        """ write-only sheets are appended row after row without any further bookkeeping"""
+        if self.editMode:
+            super()._writeChunk(chunk,insertMode=insertMode,** kwargs)
+        elif self.isRotating() or self._partRows + len(chunk) > self.rowCap:
+            self._writeRotated(self._appendRows, chunk)
+        else:
+            self._appendRows(chunk)
+            self._partRows += len(chunk)
+
+    def _appendRows(self, rows):
+        append = self.currentSheet.append
+        for row in rows:
+            append(row)
+        self._incLineCount(len(rows))
+
+    def formatColumn(self,column,format=None):
+        """ cells keep their type: number formats are up to the workbook"""
+        return toList(column)
+
     def append(self,element,insertMode=False,** kwargs):
-        line = self.getCurrentLine()
-        cell = self.currentSheet.cell(row=line,column=self.col)
+        if self.inserting:
+            self._insertRows()
+        self._writeCell(self.getCurrentLine(),self.col,element,insertMode)
+        self.col += 1
+
+    def _writeCell(self,line,col,element,insertMode):
+        cell = self.currentSheet.cell(row=line,column=col)
         if insertMode: #copy previous line's cell value
-            above = self.currentSheet.cell(row=line-1,column=self.col)
-            cell._style = above._style
-            cell.number_format = above.number_format
-            if element == '' and type(above.value) is str and above.value.startswith('='): # need to translate formula
-                cell.value = Translator(above.value, origin=above.coordinate).translate_formula(cell.coordinate)
-        if element != '' and not cell.protection.locked:
+            template = self._getTemplate(line, col)
+            cell._style = template.style
+            translated = element == '' and template.isFormula() # need to translate formula
+            if translated:
+                cell.value = template.translate(cell.coordinate)
+            locked = template.locked
+        else:
+            self.templates.pop(col, None)
+            locked = cell.protection.locked
+        if element != '' and not locked:
             cell.value = element
-        self.col += 1
-      
+        if insertMode:
+            template.moveDown(cell.value, translated)
+            self.templates[col] = template
+
+    def _getTemplate(self, line, col):
+        """ the template of the cell above (line, col): the last one of the column if it is on the line above"""
+        template = self.templates.get(col)
+        if template is None or template.row != line - 1:
+            template = CellTemplate(self.currentSheet.cell(row=line-1,column=col))
+        return template
+
     def _writeln(self,iterable,insertMode=False):
         line = self.getCurrentLine()
-        self.col = 1
-        if insertMode:
-            self.currentSheet.insert_rows(line)
-        for v in iterable:
-            self.append(v,insertMode=insertMode)
+        if insertMode: # rows are only inserted once the block of consecutive inserted rows is complete
+            if self.inserting and line != self.insertingLine + len(self.inserting):
+                self._insertRows()
+            if not self.inserting:
+                self.insertingLine = line
+            row = list(iterable)
+            self.inserting.append(row)
+            self.col = len(row) + 1
+        else:
+            self.col = 1
+            for v in iterable:
+                self.append(v)
+
+    def _insertRows(self):
+        """ insert the block of rows buffered by _writeln, moving the cells below down once for the whole block.
+        As with one row at a time, openpyxl neither moves merged cells nor updates formulas referring to moved cells"""
+        rows, self.inserting = self.inserting, []
+        line = self.insertingLine
+        if line != self.insertedLine + 1: # templates of rows shifted by a previous insertion would be wrong
+            self.templates = {}
+        self.currentSheet.insert_rows(line, amount=len(rows))
+        for row in rows:
+            for col, v in enumerate(row, 1):
+                self._writeCell(line, col, v, True)
+            line += 1
+        self.insertedLine = line - 1
+
+    def closeSheet(self):
+        if self.inserting:
+            self._insertRows()
+        super().closeSheet()
+
+
+class CellTemplate():
+    """ what a cell inserted below cell copies from it: its style (number format included), whether it is locked,
+    and its formula, translated by a Translator parsing it once for all the cells inserted below. Translating a
+    formula from its origin to any row below gives the same as translating it one row after the other."""
+    def __init__(self, cell):
+        self.row = cell.row
+        self.column = cell.column_letter
+        self.style = cell._style
+        self.locked = cell.protection.locked
+        self.value = cell.value
+        self.translator = None # of the formula in value, built when first needed
+
+    def isFormula(self):
+        return type(self.value) is str and self.value.startswith('=')
+
+    def translate(self, coordinate):
+        if self.translator is None:
+            self.translator = Translator(self.value, origin=self.column+str(self.row))
+        return self.translator.translate_formula(coordinate)
+
+    def moveDown(self, value, translated):
+        """ become the template of the cell inserted below, holding value, translated from our formula or not"""
+        self.row += 1
+        self.value = value
+        if not translated:
+            self.translator = None
 
 
 # @deprecated("Use XlsxWriter")
@@ -107,9 +301,18 @@ class XlsxWriter(FileWriter):
 #     def close(self):
 #         self.doc.save(self.outputDir+"/"+self.target+self.extension)
 
-availableWriters['xlsx'] = XlsxWriter()
-availableWriters['xlsx-edit'] = XlsxWriter(editMode=True,multiSheetOutput=True)
-availableWriters['xlsx-multisheets'] = XlsxWriter(multiSheetOutput=True)
+
+
+def iterRows(f, sheet_index=0, sheet_name=None):
+    """ lazily yield the rows of a sheet as tuples of values, blank cells being '' as with DictReader.
+    The workbook is opened in read-only mode, so that it is never fully loaded in memory."""
+    wb = load_workbook(f, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name] if sheet_name is not None else wb.worksheets[sheet_index]
+        for row in ws.iter_rows(values_only=True):
+            yield tuple('' if v is None else v for v in row)
+    finally:
+        wb.close()
 
 
 from openpyxl.cell import Cell
@@ -117,16 +320,34 @@ from openpyxl.cell import Cell
 Cell.__init__.__defaults__ = (None, None, '', None)   # Change the default value for the Cell from None to `` the same way as in csv.DictReader
 
 
+ROW_TYPES = ('dict', 'tuple', 'namedtuple')
+
+
 class DictReader(object):
+    """ read a sheet, given by sheet_index or sheet_name, as dicts mapping fieldnames onto values.
+    If read_only the workbook is streamed rather than loaded in memory, and must then be closed once read.
+    usecols restricts rows to some columns, given by fieldname or index from 0, the other ones never being read
+    into values. rows is 'dict', or 'tuple' or 'namedtuple' for rows holding the values of fields in the order of
+    fieldnames, short rows being padded with restval, values beyond fieldnames being dropped."""
     def __init__(self, f, sheet_index = 0, title_line = 1,
-                 fieldnames=None, normalize_fieldnames=False, restkey=None, restval=None):
+                 fieldnames=None, normalize_fieldnames=False, restkey=None, restval=None,
+                 read_only=False, sheet_name=None, usecols=None, rows='dict'):
+        if rows not in ROW_TYPES:
+            raise ValueError('Unknown type of rows '+str(rows)+'; available: '+', '.join(ROW_TYPES))
         self._fieldnames = fieldnames   # list of keys for the dict
         self.normalize_fieldnames = normalize_fieldnames # whether firld names should be normalized (converted to ascii)
         self.restkey  = restkey         # key to catch long rows
         self.restval  = restval         # default value for short rows
-        self.reader   = load_workbook(f, data_only=True).worksheets[sheet_index].iter_rows(values_only=True)
+        self.workbook = load_workbook(f, read_only=read_only, data_only=True)
+        self.sheet = self.workbook[sheet_name] if sheet_name is not None else self.workbook.worksheets[sheet_index]
+        self.usecols = usecols
+        self.rows = rows
+        self.reader   = self.sheet.iter_rows(values_only=True) # until fieldnames are known, see _project
         self.title_line = title_line    # location of the title line
         self.line_num = 0
+        self._getter = None # of the values of used columns, in a row of the window of the sheet read
+        self._tuple = None # tuple or namedtuple class of rows, unless dicts
+        self._projected = False
 
     def __iter__(self):
         return self
@@ -138,7 +359,8 @@ class DictReader(object):
                 next(self.reader) # skip all lines before the title
                 self.line_num += 1
             try:
-                self._fieldnames = list(map(normalize,next(self.reader))) if self.normalize_fieldnames else next(self.reader)
+                title = next(self.reader)
+                self._fieldnames = list(map(normalize,title)) if self.normalize_fieldnames else title
                 logging.info("xlsx Dictreader: "+str(self._fieldnames))
                 self.line_num += 1
             except StopIteration:
@@ -150,10 +372,30 @@ class DictReader(object):
     def fieldnames(self, value):
         self._fieldnames = value
 
+    def _project(self):
+        """ once fieldnames are known, restrict the fields and the columns read to usecols"""
+        fieldnames = self.fieldnames
+        self._projected = True
+        if self.usecols is not None:
+            indexes = [c if isinstance(c, int) else fieldnames.index(c) for c in self.usecols]
+            self._fieldnames = fieldnames = [fieldnames[i] if i < len(fieldnames) else str(i) for i in indexes]
+            start = min(indexes)
+            self.reader = self.sheet.iter_rows(min_row=self.line_num + 1, min_col=start + 1, max_col=max(indexes) + 1,
+                                               values_only=True)
+            positions = [i - start for i in indexes]
+            if len(positions) == 1:
+                position = positions[0]
+                self._getter = lambda row: (row[position],)
+            else:
+                self._getter = itemgetter(*positions)
+        if self.rows == 'namedtuple':
+            self._tuple = namedtuple('Row', fieldnames, rename=True)
+        elif self.rows == 'tuple':
+            self._tuple = tuple
+
     def __next__(self):
-        if self.line_num == 0:
-            # Used only for its side effect.
-            self.fieldnames
+        if not self._projected:
+            self._project()
 
         row = next(self.reader)
         self.line_num += 1
@@ -161,13 +403,23 @@ class DictReader(object):
         # unlike the basic reader, we prefer not to return blanks,
         # because we will typically wind up with a dict full of None
         # values
-        while row == ():
+        while not row:
             row = next(self.reader)
+            self.line_num += 1
 
-        d = dict(zip(self.fieldnames, row))
+        if self._getter is not None:
+            row = self._getter(row)
         lf = len(self.fieldnames)
         lr = len(row)
 
+        if self._tuple is not None:
+            if lf > lr:
+                row = row + (self.restval,) * (lf - lr)
+            elif lf < lr:
+                row = row[:lf]
+            return row if self._tuple is tuple else self._tuple._make(row)
+
+        d = dict(zip(self.fieldnames, row))
         if lf < lr:
             d[self.restkey] = row[lf:]
         elif lf > lr:
@@ -175,5 +427,162 @@ class DictReader(object):
                 d[key] = self.restval
 
         return d
-    
-    
\ No newline at end of file
+
+    def read_batches(self, batch_size=CHUNK_SIZE, arrays=False):
+        """ yield the remaining rows batch_size at a time, as dicts mapping each field onto the list of its values,
+        or if arrays (requires NumPy) onto a NumPy array of the dtype holding all of them in the batch, see toArray.
+        Short rows are padded with restval, which thus counts in the dtype of their columns; values beyond
+        fieldnames are gathered under restkey, as a list for each row (empty for rows without such values), if any
+        row of the batch has some."""
+        if arrays and columnar.getNumpy() is None:
+            raise ImportError('arrays=True requires numpy')
+        if not self._projected:
+            self._project()
+        fieldnames = self.fieldnames
+        width = len(fieldnames)
+        while True:
+            rows = list(islice(self.reader, batch_size))
+            if not rows:
+                return
+            self.line_num += len(rows)
+            if self._getter is not None:
+                rows = list(map(self._getter, rows))
+            rows = [row for row in rows if row] # blank rows are skipped, as by __next__
+            rest = []
+            if any(len(row) != width for row in rows):
+                if any(len(row) > width for row in rows):
+                    rest = [list(row[width:]) for row in rows]
+                rows = [row[:width] if len(row) >= width else row + (self.restval,) * (width - len(row)) for row in rows]
+            columns = list(zip(*rows)) if rows else [() for _ in fieldnames]
+            batch = {name: columnar.toArray(list(column)) if arrays else list(column) for name, column in zip(fieldnames, columns)}
+            if rest:
+                batch[self.restkey] = rest
+            yield batch
+
+    def close(self):
+        """ release the workbook, whose file is kept open when read only"""
+        self.workbook.close()
+
+
+POLL_SECONDS = 1 # time waited for a message from a worker before checking that it is still alive
+
+
+def _readSheet(f, name, queue, batch_size, batches, arrays, options):
+    """ stream the sheet name of f into queue: its fieldnames, lists of rows or batches, then the end or an error"""
+    try:
+        if options.get('rows') == 'namedtuple': # namedtuple classes made on the fly cannot be pickled
+            options = dict(options, rows='tuple')
+        reader = DictReader(f, read_only=True, sheet_name=name, **options)
+        try:
+            reader._project()
+            queue.put(('fieldnames', reader.fieldnames))
+            items = reader.read_batches(batch_size, arrays) if batches else chunked(reader, batch_size)
+            for item in items:
+                queue.put(('data', item))
+        finally:
+            reader.close()
+        queue.put(('end', None))
+    except Exception as e:
+        queue.put(('error', e))
+
+
+class SheetIterator():
+    """ an iterator over the rows, or the batches, of a sheet read by a worker process of a SheetsReader"""
+    def __init__(self, name: str, queue, future, batches=False, namedtuples=False):
+        self.name = name
+        self.queue = queue
+        self.future = future
+        self.batches = batches
+        self.namedtuples = namedtuples
+        self._fieldnames = None
+        self._items = self._read()
+
+    def _get(self):
+        """ the next message of the worker, or its error if it stopped without sending one"""
+        while True:
+            try:
+                return self.queue.get(timeout=POLL_SECONDS)
+            except Empty:
+                if self.future.done():
+                    break
+        try: # sent just before the worker stopped
+            return self.queue.get_nowait()
+        except Empty:
+            pass
+        if self.future.cancelled():
+            raise CancelledError('reading the sheet '+self.name+' was cancelled')
+        error = self.future.exception()
+        if error is not None: # e.g. the worker process died
+            raise error
+        raise RuntimeError('the worker reading the sheet '+self.name+' stopped without ending it')
+
+    @property
+    def fieldnames(self):
+        if self._fieldnames is None:
+            kind, value = self._get()
+            if kind == 'error':
+                raise value
+            self._fieldnames = value
+        return self._fieldnames
+
+    def _read(self):
+        fieldnames = self.fieldnames
+        make = namedtuple('Row', fieldnames, rename=True)._make if self.namedtuples else None
+        while True:
+            kind, value = self._get()
+            if kind == 'end':
+                return
+            if kind == 'error':
+                raise value
+            if self.batches:
+                yield value
+            elif make is not None:
+                yield from map(make, value)
+            else:
+                yield from value
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._items)
+
+
+class SheetsReader():
+    """ read several sheets of f at once, each one by DictReader in read-only mode in its own worker process.
+    sheets maps the name of each sheet (all of them by default) onto a SheetIterator over its rows, or over
+    batches of columns as returned by DictReader.read_batches if batches. options are passed to DictReader,
+    e.g. normalize_fieldnames, usecols or rows. Workers send rows batch_size at a time into queues which are
+    not bounded, so that sheets can be read in any order: a sheet not read yet is gathered in memory.
+    Once read, close the SheetsReader, or use it as a context manager."""
+    def __init__(self, f, sheet_names=None, processes=None, batch_size=CHUNK_SIZE, batches=False, arrays=False, **options):
+        if sheet_names is None:
+            wb = load_workbook(f, read_only=True)
+            sheet_names = wb.sheetnames
+            wb.close()
+        self.manager = Manager()
+        self.pool = ProcessPoolExecutor(processes)
+        self.sheets = {}
+        for name in sheet_names:
+            queue = self.manager.Queue()
+            future = self.pool.submit(_readSheet, f, name, queue, batch_size, batches, arrays, options)
+            self.sheets[name] = SheetIterator(name, queue, future, batches, options.get('rows') == 'namedtuple')
+
+    def __getitem__(self, name: str):
+        return self.sheets[name]
+
+    def __iter__(self):
+        return iter(self.sheets)
+
+    def items(self):
+        return self.sheets.items()
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+        self.manager.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,181 @@
+""" Saving a workbook edited with openpyxl by patching the xlsx package it was loaded from.
+
+Only the worksheets which were edited are serialized again by openpyxl; every other member of the package
+(styles, shared strings, other sheets, images, charts, macros...) is copied as it is, through the public API of
+zipfile: uncompressed and compressed again.
+openpyxl writes strings inline in the cells of the worksheets, so the table of shared strings, referenced by index
+from the other sheets, does not change. The calculation chain, listing the cells with formulas, is dropped since
+edited sheets may have moved them: Excel rebuilds it.
+
+A package cannot be patched, which raises Unpatchable before anything is written, when the edits need other parts
+to change: new cell styles, sheets added, removed or renamed, or edited sheets with relationships of their own
+(hyperlinks, comments, drawings, tables...). So does a version of openpyxl whose serializer of worksheets, which
+is not public, lacks what is used here.
+"""
+import copy
+import posixpath
+import re
+import shutil
+import tempfile
+import zipfile
+from xml.etree import ElementTree
+
+from openpyxl.worksheet.worksheet import Worksheet
+
+try: # not public: checked by _checkWriter before use
+    from openpyxl.worksheet._writer import WorksheetWriter
+except ImportError:
+    WorksheetWriter = None
+
+MAIN = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+RELATIONSHIPS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PACKAGE = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+CONTENT_TYPES = '[Content_Types].xml'
+OFFICE_DOCUMENT = '/officeDocument' # end of the type of the relationship to the workbook
+CALC_CHAIN = '/calcChain'
+STYLES = ('_cell_styles', '_fonts', '_fills', '_borders', '_number_formats', '_alignments', '_protections',
+          '_named_styles') # style lists of a workbook, only growing when styles are added
+WRITER_METHODS = ('write', 'close', 'cleanup') # used from WorksheetWriter, with its attributes out and _rels
+
+
+class Unpatchable(Exception):
+    """ raised when a workbook cannot be saved by patching its package"""
+
+
+def getStyleCounts(wb):
+    """ the lengths of the style lists of wb, to be compared after editing it"""
+    return tuple(len(getattr(wb, name)) for name in STYLES) + (len(wb._differential_styles.styles),)
+
+
+def _relsName(part: str):
+    """ the member holding the relationships of part"""
+    return posixpath.join(posixpath.dirname(part), '_rels', posixpath.basename(part) + '.rels')
+
+
+def _target(part: str, target: str):
+    """ the member which is target, relative to part unless absolute"""
+    if target.startswith('/'):
+        return target[1:]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(part), target))
+
+
+def _relationships(archive, part: str):
+    """ the relationships of part, as (Id, Type, Target) tuples"""
+    try:
+        root = ElementTree.fromstring(archive.read(_relsName(part)))
+    except KeyError:
+        return []
+    return [(r.get('Id'), r.get('Type', ''), r.get('Target', '')) for r in root.iter(PACKAGE+'Relationship')]
+
+
+def _removeElement(data: bytes, tag: str, attribute: str, value: str):
+    """ data without the empty elements tag whose attribute is value"""
+    pattern = (r'<(?:\w+:)?' + tag + r'\b[^>]*\s' + attribute + r'\s*=\s*["\']' + re.escape(value) + r'["\'][^>]*/>')
+    return re.sub(pattern.encode('utf-8'), b'', data)
+
+
+def _checkWriter(writer=None):
+    """ raise Unpatchable unless WorksheetWriter, or writer one of its instances, has what is used here"""
+    if WorksheetWriter is None or not all(callable(getattr(WorksheetWriter, name, None)) for name in WRITER_METHODS):
+        raise Unpatchable('worksheets cannot be serialized alone by this version of openpyxl')
+    if writer is not None and not (isinstance(getattr(writer, 'out', None), str) and hasattr(writer, '_rels')):
+        raise Unpatchable('worksheets cannot be serialized alone by this version of openpyxl')
+
+
+def _copy(source, info, archive):
+    """ copy the member info of the zip file source into archive, with the same name, date and compression"""
+    with source.open(info) as data, archive.open(copy.copy(info), 'w') as member:
+        shutil.copyfileobj(data, member, 1 << 20)
+
+
+class WorkbookPatch():
+    """ the sheets named titles of wb, a workbook loaded by openpyxl from source (a filename or a binary stream),
+    serialized at once, to be saved with the other members of source. styleCounts are those of wb when it was
+    loaded, see getStyleCounts. If copySource, source is first copied into a temporary file, e.g. since it is about
+    to be overwritten. Raise Unpatchable if wb cannot be saved this way."""
+    def __init__(self, wb, source, titles, styleCounts, copySource=False):
+        self.wb = wb
+        self.sheets = {} # member -> WorksheetWriter of its new content
+        self.copy = None
+        if copySource:
+            self.copy = tempfile.TemporaryFile()
+            with open(source, 'rb') as f:
+                shutil.copyfileobj(f, self.copy)
+            source = self.copy
+        self.source = zipfile.ZipFile(source)
+        try:
+            self._prepare(titles, styleCounts)
+        except BaseException:
+            self.close()
+            raise
+
+    def _prepare(self, titles, styleCounts):
+        _checkWriter()
+        if any(info.file_size >= zipfile.ZIP64_LIMIT or info.compress_size >= zipfile.ZIP64_LIMIT
+               for info in self.source.infolist()):
+            raise Unpatchable('members larger than 4 GiB')
+        relationships = _relationships(self.source, '')
+        workbooks = [_target('', target) for _, type, target in relationships if type.endswith(OFFICE_DOCUMENT)]
+        if not workbooks:
+            raise Unpatchable('no workbook in the package')
+        self.workbook = workbooks[0]
+        self.workbookRelationships = _relationships(self.source, self.workbook)
+        targets = {id: _target(self.workbook, target) for id, _, target in self.workbookRelationships}
+        root = ElementTree.fromstring(self.source.read(self.workbook))
+        parts = {sheet.get('name'): targets.get(sheet.get(RELATIONSHIPS+'id')) for sheet in root.iter(MAIN+'sheet')}
+        if list(parts) != self.wb.sheetnames:
+            raise Unpatchable('sheets were added, removed or renamed')
+        members = set(self.source.namelist())
+        for title in titles:
+            ws = self.wb[title]
+            part = parts[title]
+            if not isinstance(ws, Worksheet) or part not in members:
+                raise Unpatchable(title+' is not a worksheet')
+            if _relsName(part) in members:
+                raise Unpatchable(title+' has relationships (hyperlinks, comments, drawings, tables...)')
+            writer = WorksheetWriter(ws)
+            self.sheets[part] = writer
+            _checkWriter(writer)
+            writer.write()
+            if len(writer._rels) or ws._comments or ws.legacy_drawing is not None:
+                raise Unpatchable(title+' has new hyperlinks, comments, drawings or tables')
+        if getStyleCounts(self.wb) != styleCounts:
+            raise Unpatchable('new styles were added')
+        if len(self.wb.shared_strings):
+            raise Unpatchable('strings were shared by openpyxl')
+
+    def save(self, stream):
+        """ write the patched package into stream, a seekable binary stream or a filename"""
+        calcChains = [(id, _target(self.workbook, target)) for id, type, target in self.workbookRelationships
+                      if type.endswith(CALC_CHAIN)]
+        dropped = {part for _, part in calcChains}
+        with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for info in self.source.infolist():
+                name = info.filename
+                if name in dropped:
+                    continue
+                if name in self.sheets:
+                    writer = self.sheets[name]
+                    writer.close()
+                    with open(writer.out, 'rb') as xml, archive.open(name, 'w', force_zip64=True) as member:
+                        shutil.copyfileobj(xml, member, 1 << 20)
+                elif calcChains and name == CONTENT_TYPES:
+                    data = self.source.read(name)
+                    for _, part in calcChains:
+                        data = _removeElement(data, 'Override', 'PartName', '/'+part)
+                    archive.writestr(copy.copy(info), data)
+                elif calcChains and name == _relsName(self.workbook):
+                    data = self.source.read(name)
+                    for id, _ in calcChains:
+                        data = _removeElement(data, 'Relationship', 'Id', id)
+                    archive.writestr(copy.copy(info), data)
+                else:
+                    _copy(self.source, info, archive)
+
+    def close(self):
+        for writer in self.sheets.values():
+            writer.cleanup()
+        self.sheets = {}
+        self.source.close()
+        if self.copy is not None:
+            self.copy.close()
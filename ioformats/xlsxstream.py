@@ -0,0 +1,266 @@
+""" A streaming xlsx engine, writing worksheet XML directly with the standard library only.
+
+StreamWorkbook has the subset of the interface of an openpyxl write-only Workbook used by XlsxWriter:
+create_sheet(title) returns a sheet whose append(row) turns row into XML at once, and save(stream) writes the
+xlsx file. Rows are written into a temporary file per sheet, since the members of a zip file are written one
+after the other, so that memory does not grow with the number of rows, unless strings are shared: the table of
+shared strings is then kept in memory, each distinct string once.
+
+Cells are numbers, booleans, strings, and dates, times and datetimes given a number format.
+None, '', NaN and infinite numbers are blank cells. NumPy scalars are converted to the Python values they hold.
+Titles of sheets follow the rules of openpyxl and Excel, see checkTitle.
+"""
+import itertools
+import math
+import numbers
+import re
+import shutil
+import string
+import tempfile
+import zipfile
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from xml.sax.saxutils import escape, quoteattr
+
+BUFFER_ROWS = 1000 # rows turned into XML before writing them at once
+EPOCH = datetime(1899, 12, 30) # day 0 of Excel, as day 60 is the 29th of February 1900 which did not exist
+ILLEGAL = re.compile(r'[\000-\010]|[\013-\014]|[\016-\037]') # characters XML 1.0 does not allow
+INVALID_TITLE = re.compile(r'[\\*?:/\[\]]') # characters not allowed in the title of a sheet
+MAX_TITLE = 31 # characters of the title of a sheet
+MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+RELATIONSHIPS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE = 'http://schemas.openxmlformats.org/package/2006/relationships'
+HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+# cell styles, by index in cellXfs: the number format of each one
+DATE_STYLE = 1 # yyyy-mm-dd
+DATETIME_STYLE = 2 # yyyy-mm-dd h:mm:ss
+TIME_STYLE = 3 # h:mm:ss
+NUMBER_FORMATS = {164: 'yyyy-mm-dd', 165: 'yyyy-mm-dd h:mm:ss', 166: 'h:mm:ss'}
+STYLES = (0, 164, 165, 166) # numFmtId of each style
+
+MAX_COLUMNS = 16384 # columns of an Excel sheet
+
+
+def _columnLetters(count: int):
+    """ the letters of the first count columns: A to Z, then AA to ZZ, then AAA..."""
+    letters = []
+    for length in itertools.count(1):
+        letters.extend(map(''.join, itertools.product(string.ascii_uppercase, repeat=length)))
+        if len(letters) >= count:
+            return letters[:count]
+
+
+_columns = _columnLetters(MAX_COLUMNS) # column letters, by index from 0, built once so that threads share them as is
+
+
+def getColumnLetter(index: int):
+    """ the letters of the column of index, counted from 0"""
+    return _columns[index]
+
+
+def toExcel(value):
+    """ the serial number of value, a date, datetime, time or timedelta, in days since EPOCH"""
+    if isinstance(value, time):
+        return (value.hour * 3600 + value.minute * 60 + value.second + value.microsecond / 1e6) / 86400
+    if isinstance(value, timedelta):
+        return value.total_seconds() / 86400
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, time())
+    delta = value.replace(tzinfo=None) - EPOCH
+    days = delta.days
+    if 0 < days <= 60: # before the 1st of March 1900, Excel counting the 29th of February
+        days -= 1
+    return days + delta.seconds / 86400 + delta.microseconds / 86400e6
+
+
+def checkTitle(title: str, titles):
+    """ title, made unique among titles by appending a number as openpyxl does.
+    Raise ValueError if it is empty, too long or has characters not allowed"""
+    if not title:
+        raise ValueError('Title of sheet must have at least one character')
+    m = INVALID_TITLE.search(title)
+    if m:
+        raise ValueError('Invalid character '+m.group(0)+' found in sheet title '+repr(title))
+    existing = {t.lower() for t in titles}
+    unique, n = title, 0
+    while unique.lower() in existing:
+        n += 1
+        unique = title + str(n)
+    if len(unique) > MAX_TITLE:
+        raise ValueError('Title of sheet longer than '+str(MAX_TITLE)+' characters: '+repr(unique))
+    return unique
+
+
+class SharedStrings():
+    """ the strings of a workbook, each stored once, by index of first occurrence"""
+    def __init__(self):
+        self.indexes = {}
+        self.count = 0 # references to strings, repeated ones included
+
+    def add(self, s: str):
+        self.count += 1
+        index = self.indexes.get(s)
+        if index is None:
+            index = self.indexes[s] = len(self.indexes)
+        return index
+
+    def write(self, archive):
+        with archive.open('xl/sharedStrings.xml', 'w', force_zip64=True) as member:
+            member.write((HEADER + '<sst xmlns="'+MAIN+'" count="'+str(self.count)+'" uniqueCount="'
+                          + str(len(self.indexes))+'">').encode('utf-8'))
+            chunk = []
+            for s in self.indexes:
+                chunk.append('<si><t xml:space="preserve">'+escape(s)+'</t></si>')
+                if len(chunk) >= 1000:
+                    member.write(''.join(chunk).encode('utf-8'))
+                    chunk = []
+            member.write((''.join(chunk) + '</sst>').encode('utf-8'))
+
+
+class StreamSheet():
+    """ a worksheet whose rows are turned into XML as soon as they are appended, then written into a temporary file"""
+    def __init__(self, title: str, strings: SharedStrings = None):
+        self.title = title
+        self.strings = strings # None for inline strings
+        self.rows = 0
+        self.pending = [] # XML of the rows not written into file yet
+        self.file = tempfile.TemporaryFile()
+
+    def append(self, row):
+        if not isinstance(row, (list, tuple)):
+            row = list(row)
+        if len(row) > MAX_COLUMNS:
+            raise ValueError('Rows of xlsx sheets have at most '+str(MAX_COLUMNS)+' cells, not '+str(len(row)))
+        self.rows += 1
+        r = str(self.rows)
+        cells = [self._cell(_columns[i] + r, value) for i, value in enumerate(row) if value is not None and value != '']
+        self.pending.append('<row r="'+r+'">'+''.join(cells)+'</row>')
+        if len(self.pending) >= BUFFER_ROWS:
+            self._flush()
+
+    def _flush(self):
+        self.file.write(''.join(self.pending).encode('utf-8'))
+        self.pending = []
+
+    def _cell(self, ref, value):
+        t = type(value)
+        if t is str:
+            if ILLEGAL.search(value):
+                raise ValueError('Characters not allowed in xlsx cell '+ref+': '+repr(value))
+            if self.strings is None:
+                return '<c r="'+ref+'" t="inlineStr"><is><t xml:space="preserve">'+escape(value)+'</t></is></c>'
+            return '<c r="'+ref+'" t="s"><v>'+str(self.strings.add(value))+'</v></c>'
+        if t is int:
+            return '<c r="'+ref+'"><v>'+repr(value)+'</v></c>'
+        if t is float:
+            return '<c r="'+ref+'"><v>'+repr(value)+'</v></c>' if math.isfinite(value) else ''
+        if t is bool:
+            return '<c r="'+ref+'" t="b"><v>'+('1' if value else '0')+'</v></c>'
+        if isinstance(value, datetime):
+            return '<c r="'+ref+'" s="'+str(DATETIME_STYLE)+'"><v>'+repr(toExcel(value))+'</v></c>'
+        if isinstance(value, date):
+            return '<c r="'+ref+'" s="'+str(DATE_STYLE)+'"><v>'+repr(toExcel(value))+'</v></c>'
+        if isinstance(value, (time, timedelta)):
+            return '<c r="'+ref+'" s="'+str(TIME_STYLE)+'"><v>'+repr(toExcel(value))+'</v></c>'
+        if type(value).__module__ == 'numpy' and hasattr(value, 'item'): # NumPy scalars
+            return self._cell(ref, value.item())
+        if isinstance(value, numbers.Integral):
+            return '<c r="'+ref+'"><v>'+str(int(value))+'</v></c>'
+        if isinstance(value, Decimal):
+            return '<c r="'+ref+'"><v>'+str(value)+'</v></c>' if value.is_finite() else ''
+        if isinstance(value, numbers.Real):
+            return self._cell(ref, float(value))
+        if isinstance(value, str):
+            return self._cell(ref, str(value))
+        raise ValueError('Cannot convert '+repr(value)+' to an xlsx cell')
+
+    def write(self, archive, name):
+        with archive.open(name, 'w', force_zip64=True) as member:
+            member.write((HEADER + '<worksheet xmlns="'+MAIN+'"><sheetData>').encode('utf-8'))
+            self._flush()
+            self.file.seek(0)
+            shutil.copyfileobj(self.file, member)
+            member.write(b'</sheetData></worksheet>')
+
+    def close(self):
+        self.file.close()
+
+
+class StreamWorkbook():
+    """ a workbook written without openpyxl, strings being either inline, or shared (smaller files for repeated
+    strings, but a table of strings in memory)"""
+    def __init__(self, sharedStrings=False, compresslevel=None):
+        self.sheets = []
+        self.strings = SharedStrings() if sharedStrings else None
+        self.compresslevel = compresslevel
+
+    def create_sheet(self, title: str):
+        """ a new sheet, whose title is made unique as by openpyxl, see checkTitle"""
+        sheet = StreamSheet(checkTitle(title, [sheet.title for sheet in self.sheets]), self.strings)
+        self.sheets.append(sheet)
+        return sheet
+
+    def save(self, stream):
+        """ write the xlsx file into stream, a binary stream or a filename"""
+        with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED, compresslevel=self.compresslevel) as archive:
+            archive.writestr('[Content_Types].xml', self._contentTypes())
+            archive.writestr('_rels/.rels', HEADER + '<Relationships xmlns="'+PACKAGE+'">'
+                             '<Relationship Id="rId1" Type="'+RELATIONSHIPS+'/officeDocument" Target="xl/workbook.xml"/>'
+                             '</Relationships>')
+            archive.writestr('xl/workbook.xml', self._workbook())
+            archive.writestr('xl/_rels/workbook.xml.rels', self._workbookRelationships())
+            archive.writestr('xl/styles.xml', self._styles())
+            for i, sheet in enumerate(self.sheets, 1):
+                sheet.write(archive, 'xl/worksheets/sheet'+str(i)+'.xml')
+            if self.strings is not None:
+                self.strings.write(archive)
+
+    def close(self):
+        for sheet in self.sheets:
+            sheet.close()
+
+    def _contentTypes(self):
+        types = ['<Override PartName="/xl/worksheets/sheet'+str(i)+'.xml" ContentType="application/'
+                 'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>' for i in range(1, len(self.sheets) + 1)]
+        if self.strings is not None:
+            types.append('<Override PartName="/xl/sharedStrings.xml" ContentType="application/'
+                         'vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>')
+        return (HEADER + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                '<Default Extension="xml" ContentType="application/xml"/>'
+                '<Override PartName="/xl/workbook.xml" ContentType="application/'
+                'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+                '<Override PartName="/xl/styles.xml" ContentType="application/'
+                'vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>' + ''.join(types) + '</Types>')
+
+    def _workbook(self):
+        sheets = ['<sheet name='+quoteattr(sheet.title)+' sheetId="'+str(i)+'" r:id="rId'+str(i)+'"/>'
+                  for i, sheet in enumerate(self.sheets, 1)]
+        return (HEADER + '<workbook xmlns="'+MAIN+'" xmlns:r="'+RELATIONSHIPS+'"><sheets>' + ''.join(sheets)
+                + '</sheets></workbook>')
+
+    def _workbookRelationships(self):
+        relationships = ['<Relationship Id="rId'+str(i)+'" Type="'+RELATIONSHIPS+'/worksheet" Target="worksheets/sheet'
+                         + str(i)+'.xml"/>' for i in range(1, len(self.sheets) + 1)]
+        n = len(self.sheets)
+        relationships.append('<Relationship Id="rId'+str(n + 1)+'" Type="'+RELATIONSHIPS+'/styles" Target="styles.xml"/>')
+        if self.strings is not None:
+            relationships.append('<Relationship Id="rId'+str(n + 2)+'" Type="'+RELATIONSHIPS
+                                 + '/sharedStrings" Target="sharedStrings.xml"/>')
+        return HEADER + '<Relationships xmlns="'+PACKAGE+'">' + ''.join(relationships) + '</Relationships>'
+
+    def _styles(self):
+        formats = ['<numFmt numFmtId="'+str(i)+'" formatCode='+quoteattr(code)+'/>' for i, code in NUMBER_FORMATS.items()]
+        xfs = ['<xf numFmtId="'+str(i)+'" fontId="0" fillId="0" borderId="0" xfId="0"'
+               + (' applyNumberFormat="1"' if i else '')+'/>' for i in STYLES]
+        return (HEADER + '<styleSheet xmlns="'+MAIN+'">'
+                '<numFmts count="'+str(len(formats))+'">' + ''.join(formats) + '</numFmts>'
+                '<fonts count="1"><font><sz val="11"/><name val="Calibri"/><family val="2"/></font></fonts>'
+                '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+                '<fill><patternFill patternType="gray125"/></fill></fills>'
+                '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+                '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+                '<cellXfs count="'+str(len(xfs))+'">' + ''.join(xfs) + '</cellXfs>'
+                '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+                '</styleSheet>')